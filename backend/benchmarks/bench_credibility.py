@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark: credibility scoring throughput, suffix table vs. the substring loop
+
+Scores a mix of URLs (listed domains, subdomains, unlisted hosts, look-alikes
+such as notwikipedia.org or wikipedia.org.example.com) with the previous
+hardcoded loop, with the bundled list, and with a synthetic reputation list of
+--entries domains - loaded from text and from a compiled, memory-mapped table.
+Every host is distinct per run unless noted: "repeated hosts" draws the URLs
+from a few thousand hosts, as search results do, so the per-table host cache
+answers most of them. The old loop is also run over the large list to show
+what a linear scan costs at that size.
+
+Usage (from backend/):
+    python benchmarks/bench_credibility.py
+    python benchmarks/bench_credibility.py --entries 1000000   # bigger synthetic list
+    python benchmarks/bench_credibility.py --json              # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.credibility import DEFAULT_LIST, CredibilityEngine, read_list
+
+TRUSTED = [
+    "nytimes.com", "washingtonpost.com", "wsj.com",
+    "wikipedia.org", "github.com", "stackoverflow.com",
+    "reddit.com", "medium.com", "techcrunch.com"
+]
+TLDS = ["com", "org", "net", "io", "co.uk", "de", "edu", "gov", "xyz", "info"]
+
+
+def legacy_score(url: str, trusted=TRUSTED) -> int:
+    """The previous SearchEngine._calculate_credibility"""
+    score = 50
+    for domain in trusted:
+        if domain in url.lower():
+            score += 20
+            break
+    if ".edu" in url or ".gov" in url:
+        score += 15
+    if any(x in url for x in [".xyz", ".tk", ".ml"]):
+        score -= 20
+    return min(100, max(0, score))
+
+
+def random_label(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(4, 14)))
+
+
+def synthetic_list(rng: random.Random, entries: int):
+    domains = {f"{random_label(rng)}.{rng.choice(TLDS)}": rng.randint(0, 100) for _ in range(entries)}
+    domains.update(read_list(DEFAULT_LIST))
+    return domains
+
+
+def sample_urls(rng: random.Random, listed, count: int):
+    urls = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.3:
+            host = rng.choice(listed)
+        elif kind < 0.5:
+            host = f"{rng.choice(['www', 'en', 'blog', 'docs'])}.{rng.choice(listed)}"
+        elif kind < 0.55:
+            host = f"not{rng.choice(TRUSTED)}"
+        elif kind < 0.6:
+            host = f"{rng.choice(TRUSTED)}.{random_label(rng)}.com"
+        else:
+            host = f"{random_label(rng)}.{rng.choice(TLDS)}"
+        urls.append(f"https://{host}/{random_label(rng)}/{random_label(rng)}?q={random_label(rng)}")
+    return urls
+
+
+def throughput(score, urls) -> float:
+    # Fresh cache per run, so earlier runs don't warm it
+    engine = getattr(score, "__self__", None)
+    if isinstance(engine, CredibilityEngine):
+        engine.table.host_scores.clear()
+    start = time.perf_counter()
+    for url in urls:
+        score(url)
+    return len(urls) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=500_000, help="synthetic list size (default 500000)")
+    parser.add_argument("--urls", type=int, default=100_000, help="URLs scored per run (default 100000)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    os.environ["CREDIBILITY_RELOAD_INTERVAL"] = "3600"
+    bundled = CredibilityEngine()
+    domains = synthetic_list(rng, args.entries)
+    listed = list(domains)
+    urls = sample_urls(rng, listed, args.urls)
+    lookalikes = [url for url in urls if "://not" in url or any(f"{domain}." in url for domain in TRUSTED)]
+    repeated = [rng.choice(urls[:2000]) for _ in range(len(urls))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, "list.tsv")
+        with open(text_path, "w") as f:
+            f.writelines(f"{domain}\t{score}\n" for domain, score in domains.items())
+        start = time.perf_counter()
+        large = CredibilityEngine(text_path)
+        text_load = time.perf_counter() - start
+
+        compiled_path = os.path.join(tmp, "list.bin")
+        large.table.save(compiled_path)
+        start = time.perf_counter()
+        mapped = CredibilityEngine(compiled_path)
+        mapped_load = time.perf_counter() - start
+        compiled_bytes = os.path.getsize(compiled_path)
+
+        disagreements = sum(large.score(url) != mapped.score(url) for url in urls[:10_000])
+        linear_urls = urls[:200]
+        results = {
+            "entries": large.table.count,
+            "urls": len(urls),
+            "textLoadSeconds": text_load,
+            "mmapLoadSeconds": mapped_load,
+            "compiledBytes": compiled_bytes,
+            "urlsPerSecond": {
+                "legacyLoop9": throughput(legacy_score, urls),
+                "tableBundled": throughput(bundled.score, urls),
+                "tableLarge": throughput(large.score, urls),
+                "tableLargeMmap": throughput(mapped.score, urls),
+                "tableLargeRepeated": throughput(large.score, repeated),
+                "legacyLoopLarge": throughput(lambda url: legacy_score(url, listed), linear_urls),
+            },
+            "mmapMismatches": disagreements,
+            "lookalikes": len(lookalikes),
+            "lookalikesTrustedByLegacy": sum(legacy_score(url) >= 70 for url in lookalikes),
+            "lookalikesTrustedByTable": sum(bundled.score(url) >= 70 for url in lookalikes),
+        }
+        del mapped  # release the mapping before the temp dir goes
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{results['entries']} list entries, {results['urls']} URLs")
+    print(f"Load: text {results['textLoadSeconds']:.2f}s, compiled + mmap {results['mmapLoadSeconds'] * 1000:.2f} ms "
+          f"({results['compiledBytes'] / 1e6:.1f} MB)")
+    print()
+    labels = {
+        "legacyLoop9": "substring loop, 9 domains",
+        "tableBundled": "suffix table, bundled list",
+        "tableLarge": "suffix table, large list",
+        "tableLargeMmap": "suffix table, large list (mmap)",
+        "tableLargeRepeated": "suffix table, large list, repeated hosts",
+        "legacyLoopLarge": "substring loop, large list",
+    }
+    for key, label in labels.items():
+        print(f"{label:<42} {results['urlsPerSecond'][key]:>12,.0f} URLs/s")
+    print()
+    print(f"Look-alike hosts scored as trusted (>= 70) out of {results['lookalikes']}: "
+          f"substring loop {results['lookalikesTrustedByLegacy']}, bundled list {results['lookalikesTrustedByTable']}")
+    print(f"Text vs mmap table mismatches: {results['mmapMismatches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming page extraction vs. full BeautifulSoup parse
+
+Runs both extractors over a corpus of saved pages and reports time per page,
+bytes actually consumed and how often the two agree on title/snippet.
+
+Usage (from backend/):
+    python benchmarks/bench_html_extract.py                  # synthetic corpus
+    python benchmarks/bench_html_extract.py --corpus pages/  # directory of saved *.html files
+    python benchmarks/bench_html_extract.py --json           # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from services.html_extract import PageInfoExtractor
+
+CHUNK_SIZE = 16 * 1024
+
+
+def extract_with_soup(body: bytes, url: str) -> dict:
+    """The previous _fetch_source_info parsing path"""
+    soup = BeautifulSoup(body, "html.parser")
+    title = soup.find("title")
+    title_text = title.string if title else url
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    snippet = meta_desc.get("content", "") if meta_desc else ""
+    if not snippet:
+        first_p = soup.find("p")
+        snippet = first_p.get_text()[:200] if first_p else ""
+    return {"title": title_text or url, "snippet": snippet[:300]}
+
+
+def extract_streaming(body: bytes, url: str, content_type: str, max_bytes: int):
+    extractor = PageInfoExtractor(content_type)
+    for start in range(0, min(len(body), max_bytes), CHUNK_SIZE):
+        chunk = body[start:min(start + CHUNK_SIZE, max_bytes)]
+        if extractor.feed(chunk):
+            break
+    extractor.close()
+    fields = extractor.result()
+    return {"title": fields["title"] or url, "snippet": fields["snippet"][:300]}, extractor.bytes_fed
+
+
+def synthetic_corpus():
+    """Pages shaped like typical search results: small articles, huge SPAs, legacy encodings"""
+    filler = "<div class='c'>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20 + "</div>\n"
+    script = "<script>" + "var x = {a: 1, b: [1, 2, 3]};" * 200 + "</script>\n"
+    pages = []
+    for kb in (8, 200, 2048):
+        repeat = max(1, kb * 1024 // len(filler))
+        body = filler * repeat
+        pages.append((f"meta-{kb}kb.html", "text/html; charset=utf-8", (
+            "<html><head><meta charset='utf-8'><title>Article about things</title>"
+            "<meta name='description' content='A short description of the article.'>"
+            f"{script}</head><body><p>First paragraph.</p>{body}</body></html>"
+        ).encode("utf-8")))
+        pages.append((f"nometa-{kb}kb.html", "text/html", (
+            "<html><head><title>Docs &amp; Guides</title>"
+            f"{script}</head><body><nav>menu</nav><p>The <b>first</b> paragraph of the docs.</p>{body}</body></html>"
+        ).encode("utf-8")))
+    pages.append(("cp1251.html", "text/html", (
+        "<html><head><meta http-equiv='Content-Type' content='text/html; charset=windows-1251'>"
+        "<title>Новости</title><meta name='description' content='Последние новости дня'></head>"
+        f"<body><p>Текст</p>{filler * 50}</body></html>"
+    ).encode("cp1251")))
+    return pages
+
+
+def load_corpus(directory: str):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append((name, None, f.read()))
+    return pages
+
+
+def time_it(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of saved .html pages (default: synthetic pages)")
+    parser.add_argument("--max-bytes", type=int, default=int(os.getenv("FETCH_MAX_BYTES", str(512 * 1024))))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    rows = []
+    for name, content_type, body in pages:
+        url = f"https://example.com/{name}"
+        soup_fields = extract_with_soup(body, url)
+        stream_fields, bytes_read = extract_streaming(body, url, content_type, args.max_bytes)
+        rows.append({
+            "page": name,
+            "size": len(body),
+            "bytesRead": bytes_read,
+            "soupMs": time_it(lambda: extract_with_soup(body, url), args.repeat) * 1000,
+            "streamMs": time_it(lambda: extract_streaming(body, url, content_type, args.max_bytes), args.repeat) * 1000,
+            "titleMatch": (soup_fields["title"] or "").strip() == (stream_fields["title"] or "").strip(),
+            "snippetMatch": soup_fields["snippet"].strip() == stream_fields["snippet"].strip(),
+        })
+
+    total_soup = sum(r["soupMs"] for r in rows)
+    total_stream = sum(r["streamMs"] for r in rows)
+    summary = {
+        "pages": len(rows),
+        "soupMsTotal": round(total_soup, 3),
+        "streamMsTotal": round(total_stream, 3),
+        "speedup": round(total_soup / total_stream, 2) if total_stream else None,
+        "bytesTotal": sum(r["size"] for r in rows),
+        "bytesReadTotal": sum(r["bytesRead"] for r in rows),
+        "titleAgreement": sum(r["titleMatch"] for r in rows) / len(rows) if rows else 0,
+        "snippetAgreement": sum(r["snippetMatch"] for r in rows) / len(rows) if rows else 0,
+    }
+
+    if args.json:
+        print(json.dumps({"summary": summary, "pages": rows}, indent=2))
+        return
+
+    print(f"{'page':<28} {'size':>10} {'read':>10} {'soup ms':>9} {'stream ms':>10}  match")
+    for r in rows:
+        match = ("T" if r["titleMatch"] else "-") + ("S" if r["snippetMatch"] else "-")
+        print(f"{r['page'][:28]:<28} {r['size']:>10} {r['bytesRead']:>10} {r['soupMs']:>9.2f} {r['streamMs']:>10.2f}  {match}")
+    print()
+    print(f"Total: soup {summary['soupMsTotal']:.1f} ms, streaming {summary['streamMsTotal']:.1f} ms "
+          f"({summary['speedup']}x), read {summary['bytesReadTotal']} of {summary['bytesTotal']} bytes")
+    print(f"Agreement: title {summary['titleAgreement']:.0%}, snippet {summary['snippetAgreement']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: LanguageDetector vs. calling langdetect.detect() directly
+
+Runs both over a labelled set of search descriptions and reports accuracy,
+time per call (first call, uncached, cached) and how many texts got more than
+one answer across repeated calls.
+
+Usage (from backend/):
+    python benchmarks/bench_language_detection.py                  # bundled accuracy set
+    python benchmarks/bench_language_detection.py --data my.tsv    # <code>\t<text> per line
+    python benchmarks/bench_language_detection.py --json           # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import langdetect
+from langdetect import LangDetectException
+
+from services.language_detector import LanguageDetector
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "language_samples.tsv")
+
+
+def load_samples(path: str):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            language, text = line.split("\t", 1)
+            samples.append((language, text))
+    return samples
+
+
+def langdetect_baseline(text: str):
+    """The previous detect_request_language path"""
+    try:
+        language = langdetect.detect(text)
+    except LangDetectException:
+        return None
+    return "zh" if language.startswith("zh") else language
+
+
+def measure(detect, samples, repeat: int):
+    """Median per-call ms over the set, accuracy of the first answer, and texts whose answer changed"""
+    answers = [[] for _ in samples]
+    timings = []
+    for _ in range(repeat):
+        for i, (_, text) in enumerate(samples):
+            start = time.perf_counter()
+            answers[i].append(detect(text))
+            timings.append(time.perf_counter() - start)
+    correct = sum(1 for (expected, _), got in zip(samples, answers) if got[0] == expected)
+    unstable = [text for (_, text), got in zip(samples, answers) if len(set(got)) > 1]
+    return {
+        "accuracy": correct / len(samples),
+        "medianMs": statistics.median(timings) * 1000,
+        "meanMs": statistics.mean(timings) * 1000,
+        "unstable": len(unstable),
+    }, [got[0] for got in answers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="TSV of <language>\\t<text> (default: bundled set)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the set (instability needs > 1)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    samples = load_samples(args.data)
+
+    # First call pays for langdetect's lazy profile load
+    start = time.perf_counter()
+    langdetect_baseline(samples[0][1])
+    baseline_first_ms = (time.perf_counter() - start) * 1000
+    baseline, baseline_answers = measure(langdetect_baseline, samples, args.repeat)
+    baseline["firstCallMs"] = baseline_first_ms
+
+    detector = LanguageDetector()
+    start = time.perf_counter()
+    detector.load()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    def uncached(text):
+        detector._cache.clear()
+        return detector.detect(text)
+
+    uncached_result, answers = measure(uncached, samples, args.repeat)
+    cached_result, _ = measure(detector.detect, samples, args.repeat)
+    stats = detector.stats()
+
+    summary = {
+        "samples": len(samples),
+        "languages": len({language for language, _ in samples}),
+        "langdetect": baseline,
+        "detector": {
+            "loadMs": load_ms,
+            "accuracy": uncached_result["accuracy"],
+            "uncachedMedianMs": uncached_result["medianMs"],
+            "cachedMedianMs": cached_result["medianMs"],
+            "unstable": uncached_result["unstable"],
+            "scriptFastPathShare": stats["scriptFastPath"] / (stats["scriptFastPath"] + stats["ngramCalls"]),
+        },
+    }
+    misses = [
+        {"expected": expected, "langdetect": base, "detector": got, "text": text}
+        for (expected, text), base, got in zip(samples, baseline_answers, answers)
+        if got != expected or base != expected
+    ]
+
+    if args.json:
+        print(json.dumps({"summary": summary, "misses": misses}, indent=2, ensure_ascii=False))
+        return
+
+    d = summary["detector"]
+    print(f"{len(samples)} samples, {summary['languages']} languages, {args.repeat} passes")
+    print()
+    print(f"{'':<16} {'accuracy':>9} {'first ms':>9} {'median ms':>10} {'cached ms':>10} {'unstable':>9}")
+    print(f"{'langdetect':<16} {baseline['accuracy']:>9.1%} {baseline['firstCallMs']:>9.1f} "
+          f"{baseline['medianMs']:>10.3f} {'-':>10} {baseline['unstable']:>9}")
+    print(f"{'LanguageDetector':<16} {d['accuracy']:>9.1%} {'(startup)':>9} "
+          f"{d['uncachedMedianMs']:>10.3f} {d['cachedMedianMs']:>10.4f} {d['unstable']:>9}")
+    print()
+    print(f"Profiles loaded at startup in {d['loadMs']:.0f} ms; "
+          f"{d['scriptFastPathShare']:.0%} of texts resolved by the script fast path")
+    if misses:
+        print()
+        print("Misclassified (expected / langdetect / detector):")
+        for miss in misses:
+            print(f"  {miss['expected']:<3} {str(miss['langdetect']):<6} {str(miss['detector']):<6} {miss['text'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
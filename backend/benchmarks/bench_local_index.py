@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: local source index - indexing rate, reopen time and query latency
+
+Fills a LocalIndex in a temporary directory with synthetic sources (titles
+and snippets drawn from a Zipf-like vocabulary, so some terms are common and
+most are rare, as in real text), then times reopening it from disk and
+querying it with 2-6 term queries.
+
+Usage (from backend/):
+    python benchmarks/bench_local_index.py
+    python benchmarks/bench_local_index.py --docs 200000   # bigger corpus
+    python benchmarks/bench_local_index.py --json          # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def vocabulary_sampler(rng: random.Random, size: int):
+    words = [f"term{i}" for i in range(size)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+    return lambda k: rng.choices(words, cum_weights=cumulative, k=k)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50_000, help="sources indexed (default 50000)")
+    parser.add_argument("--queries", type=int, default=500, help="queries timed (default 500)")
+    parser.add_argument("--vocabulary", type=int, default=20_000, help="distinct terms (default 20000)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sample = vocabulary_sampler(rng, args.vocabulary)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LOCAL_INDEX_DIR"] = tmp
+        from services.local_index import LocalIndex
+
+        index = LocalIndex()
+        sources = [
+            {
+                "url": f"https://site{i % 5000}.example.com/{i}",
+                "title": " ".join(sample(rng.randint(4, 10))),
+                "snippet": " ".join(sample(rng.randint(20, 50))),
+            }
+            for i in range(args.docs)
+        ]
+        start = time.perf_counter()
+        for source in sources:
+            index.add(source)
+        add_seconds = time.perf_counter() - start
+        while index._flushing:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        index.close()
+        final_flush = time.perf_counter() - start
+        written = index.stats()
+
+        start = time.perf_counter()
+        reopened = LocalIndex()
+        open_seconds = time.perf_counter() - start
+
+        timings = []
+        hits = []
+        for _ in range(args.queries):
+            query = " ".join(sample(rng.randint(2, 6)))
+            start = time.perf_counter()
+            results = reopened.search(query, 10)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits.append(len(results))
+
+        results = {
+            "docs": args.docs,
+            "addsPerSecond": args.docs / add_seconds,
+            "finalFlushSeconds": final_flush,
+            "reopenSeconds": open_seconds,
+            "queryMs": {
+                "p50": statistics.median(timings),
+                "p95": percentile(timings, 0.95),
+                "max": max(timings),
+            },
+            "meanHits": statistics.mean(hits),
+            "index": {key: written[key] for key in ("sources", "segments", "terms", "bytes", "flushes", "merges")},
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    index_stats = results["index"]
+    print(f"{results['docs']} sources -> {index_stats['segments']} segments, {index_stats['terms']} terms, "
+          f"{index_stats['bytes'] / 1e6:.1f} MB ({index_stats['flushes']} flushes, {index_stats['merges']} merges)")
+    print(f"Indexing: {results['addsPerSecond']:,.0f} sources/s (final flush {results['finalFlushSeconds']:.2f}s)")
+    print(f"Reopen from disk: {results['reopenSeconds']:.2f}s")
+    print(f"Query: p50 {results['queryMs']['p50']:.2f} ms, p95 {results['queryMs']['p95']:.2f} ms, "
+          f"max {results['queryMs']['max']:.2f} ms, {results['meanHits']:.1f} hits on average")
+
+
+if __name__ == "__main__":
+    main()
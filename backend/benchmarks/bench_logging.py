@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark: logging cost on the calling thread (the event loop, in the server)
+
+Times one typical request log line written the previous way (f-string message,
+SafeFormatter and a synchronous StreamHandler on the caller) against the queued
+pipeline from services.logging_config (lazy %-style message, records without
+thread/process fields, merged, formatted and written by the listener thread),
+in text and JSON format, plus the cost of a per-URL debug line while DEBUG is
+off. Each figure is the best of --repeat runs. Output goes to a temporary file;
+--write-latency-ms adds a delay to every write, the way a pipe to a log
+shipper that has fallen behind blocks it. "CPU" is the calling thread's own
+CPU time per line (what shows up in a profile of the event loop), "wall" also
+counts time blocked in writes and waiting for the GIL.
+
+Usage (from backend/):
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --lines 200000   # longer run
+    python benchmarks/bench_logging.py --write-latency-ms 0.05   # slow log sink
+    python benchmarks/bench_logging.py --json           # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import tempfile
+import logging.handlers
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.logging_config import (
+    DATE_FORMAT, TEXT_FORMAT, DebugSampler, JSONFormatter, NonBlockingQueueHandler, RequestIDFilter, SafeFormatter,
+    lean_log_records
+)
+
+
+class SlowStream:
+    """File whose writes take at least `latency` seconds (sleeping, so the GIL is released)"""
+
+    def __init__(self, path: str, latency: float):
+        self.file = open(path, "w")
+        self.latency = latency
+
+    def write(self, text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def isolated_logger(name: str, handler: logging.Handler, level: int = logging.INFO) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def per_line_us(log_line, lines: int, repeat: int) -> dict:
+    best = {"wall": float("inf"), "cpu": float("inf")}
+    for _ in range(repeat):
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        for i in range(lines):
+            log_line(i)
+        best["wall"] = min(best["wall"], (time.perf_counter() - start) / lines * 1e6)
+        best["cpu"] = min(best["cpu"], (time.thread_time() - cpu_start) / lines * 1e6)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50_000, help="log lines per run (default 50000)")
+    parser.add_argument("--write-latency-ms", type=float, default=0.0, help="delay added to every write (default 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per figure, best kept (default 3)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    url = "https://example.com/articles/some-long-slug-for-a-page"
+    extra = {"request_id": "1a2b3c4d"}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        latency = args.write_latency_ms / 1000
+        sync_stream = SlowStream(os.path.join(tmp, "sync.log"), latency)
+        sync_handler = logging.StreamHandler(sync_stream)
+        sync_handler.setFormatter(SafeFormatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT))
+        sync_handler.addFilter(RequestIDFilter())
+        sync = isolated_logger("sync", sync_handler)
+
+        def sync_line(i):
+            sync.info(f"✓ Found {i} sources in {i / 1000:.3f}s", extra=extra)
+
+        def sync_debug(i):
+            sync.debug(f"  [{i}/10] ✓ {url[:60]}...", extra=extra)
+
+        results["syncText"] = per_line_us(sync_line, args.lines, args.repeat)
+        results["debugOffFString"] = per_line_us(sync_debug, args.lines, args.repeat)
+
+        lean_log_records()  # what configure_logging() does along with installing the queue
+
+        for name, formatter in (("queuedText", SafeFormatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)),
+                                ("queuedJson", JSONFormatter())):
+            stream = SlowStream(os.path.join(tmp, f"{name}.log"), latency)
+            writer = logging.StreamHandler(stream)
+            writer.setFormatter(formatter)
+            front = NonBlockingQueueHandler(queue.SimpleQueue(), max_size=args.lines * args.repeat + 1)
+            front.addFilter(RequestIDFilter())
+            front.addFilter(DebugSampler(1.0))
+            listener = logging.handlers.QueueListener(front.queue, writer)
+            listener.start()
+            queued = isolated_logger(name, front)
+
+            def queued_line(i):
+                queued.info("✓ Found %s sources in %.3fs", i, i / 1000,
+                            extra={**extra, "stage": "gather", "seconds": i / 1000})
+
+            def queued_debug(i):
+                queued.debug("  [%s/10] ✓ %s...", i, url[:60], extra=extra)
+
+            results[name] = per_line_us(queued_line, args.lines, args.repeat)
+            if name == "queuedText":
+                results["debugOffLazy"] = per_line_us(queued_debug, args.lines, args.repeat)
+            start = time.perf_counter()
+            listener.stop()
+            results[f"{name}DrainSeconds"] = time.perf_counter() - start
+            stream.close()
+        sync_stream.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    def row(label, key):
+        print(f"  {label:<42} CPU {results[key]['cpu']:>7.2f} us   wall {results[key]['wall']:>7.2f} us")
+
+    print(f"Per log line on the calling thread ({args.lines} lines, +{args.write_latency_ms} ms per write):")
+    row("f-string + synchronous StreamHandler", "syncText")
+    row("lazy %-style + queue (text)", "queuedText")
+    row("lazy %-style + queue (JSON, with fields)", "queuedJson")
+    print("Per debug line with DEBUG off:")
+    row("f-string", "debugOffFString")
+    row("lazy %-style", "debugOffLazy")
+    print(f"Listener caught up {results['queuedTextDrainSeconds']:.2f}s (text) / "
+          f"{results['queuedJsonDrainSeconds']:.2f}s (JSON) after the last line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SearchResultPayload serving cost - validated model vs. pre-serialized bytes
+
+Serves one realistic cached result (6 steps, 4 decision factors, 5 sources)
+from two in-process FastAPI routes, driven sequentially over ASGI on a single
+core so the number is requests/s per core:
+
+    model  the previous cache-hit path: parse the cached JSON into a model and
+           return it, so FastAPI validates it again against response_model and
+           serializes it with the stdlib encoder
+    raw    the current path: the cached bytes written straight into the response
+
+Also times the pieces on their own (decode, FastAPI-style serialization,
+dump_json) and one /v1/search/batch NDJSON line both ways.
+
+Usage (from backend/):
+    python benchmarks/bench_payload.py
+    python benchmarks/bench_payload.py --requests 20000   # longer run
+    python benchmarks/bench_payload.py --json             # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+
+from models.search_models import SearchResultPayload, SolutionStep, DecisionFactor, SourceLink
+from services.fast_json import RawJSON, dump_json, orjson
+
+
+def sample_result() -> SearchResultPayload:
+    return SearchResultPayload(
+        summary="A short overview of the answer, written by the model. " * 8,
+        steps=[
+            SolutionStep(id=f"step-{i}", title=f"Step {i}: do the next thing", description="Detailed instructions. " * 12)
+            for i in range(6)
+        ],
+        decisionFactors=[
+            DecisionFactor(id=f"factor-{i}", label=f"Factor {i}", detail="Why this matters for the choice. " * 6)
+            for i in range(4)
+        ],
+        sources=[
+            SourceLink(
+                id=f"src-{i}",
+                title=f"Source page title number {i} – with ünïcode",
+                url=f"https://example{i}.com/articles/some-long-slug-{i}",
+                credibility=60 + i,
+                snippet="A snippet of the source page text. " * 8,
+            )
+            for i in range(5)
+        ],
+        estimatedTimeMinutes=15,
+        difficulty="medium",
+        recommendedActions=["Do this first", "Then check that", "Ask a professional if unsure", "Keep records"],
+    )
+
+
+def per_call_us(function, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def build_app(payload: bytes) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/model", response_model=SearchResultPayload)
+    async def model_route():
+        return SearchResultPayload.model_validate_json(payload)
+
+    @app.get("/raw", response_model=SearchResultPayload)
+    async def raw_route():
+        return Response(content=payload, media_type="application/json")
+
+    return app
+
+
+async def requests_per_second(app: FastAPI, path: str, count: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(200, count)):
+            await client.get(path)  # warm up
+        start = time.perf_counter()
+        for _ in range(count):
+            response = await client.get(path)
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per route (default 5000)")
+    parser.add_argument("--iterations", type=int, default=20000, help="calls per micro-timing (default 20000)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    result = sample_result()
+    payload = dump_json(result)
+    item = {"index": 0, "id": "q-1", "cache": "HIT", "status": 200}
+    n = args.iterations
+
+    app = build_app(payload)
+    model_rps = asyncio.run(requests_per_second(app, "/model", args.requests))
+    raw_rps = asyncio.run(requests_per_second(app, "/raw", args.requests))
+
+    results = {
+        "payloadBytes": len(payload),
+        "orjson": orjson is not None,
+        "requestsPerSecond": {"model": model_rps, "raw": raw_rps, "speedup": raw_rps / model_rps},
+        "microseconds": {
+            "decodeValidated": per_call_us(lambda: SearchResultPayload.model_validate_json(payload), n),
+            "fastapiSerialize": per_call_us(
+                lambda: json.dumps(jsonable_encoder(SearchResultPayload.model_validate(result.model_dump()))), n
+            ),
+            "dumpJson": per_call_us(lambda: dump_json(result), n),
+            "batchLineModelDump": per_call_us(
+                lambda: json.dumps({**item, "result": SearchResultPayload.model_validate_json(payload).model_dump()},
+                                   ensure_ascii=False), n
+            ),
+            "batchLineRaw": per_call_us(lambda: dump_json({**item, "result": RawJSON(payload)}), n),
+        },
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    rps = results["requestsPerSecond"]
+    us = results["microseconds"]
+    print(f"Cached result: {results['payloadBytes']} bytes (orjson {'installed' if results['orjson'] else 'not installed'})")
+    print()
+    print(f"Cache-hit requests/s on one core: model {rps['model']:,.0f}, raw bytes {rps['raw']:,.0f} "
+          f"({rps['speedup']:.1f}x)")
+    print()
+    print(f"{'decode cached JSON into a model':<44} {us['decodeValidated']:>8.1f} us")
+    print(f"{'FastAPI response_model check + stdlib JSON':<44} {us['fastapiSerialize']:>8.1f} us")
+    print(f"{'dump_json (compiled model serializer)':<44} {us['dumpJson']:>8.1f} us")
+    print(f"{'batch line, decode + model_dump + json':<44} {us['batchLineModelDump']:>8.1f} us")
+    print(f"{'batch line, cached bytes spliced in':<44} {us['batchLineRaw']:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark: packed research prompt vs. joining the top 10 sources whole
+
+Builds both prompts for synthetic source sets shaped like real search results
+(long meta descriptions, syndicated copies, fallback boilerplate) and reports
+prompt tokens, how many sources made it into the prompt, and build time.
+Tokens are counted with tiktoken when it's installed, estimated otherwise.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_packing.py
+    python benchmarks/bench_prompt_packing.py --budget 600     # PROMPT_SOURCE_TOKENS
+    python benchmarks/bench_prompt_packing.py --json           # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from models.search_models import SearchRequestPayload
+from services.ai_service import AIService, _language_instruction, _prompt_instructions
+
+QUERIES = [
+    ("washing machine won't drain error E21", "home"),
+    ("laptop battery drains fast after update", "technology"),
+    ("car grinding noise when braking", "automotive"),
+    ("toddler fever when to see a doctor", "health"),
+]
+
+FILLER = [
+    "Our experts reviewed dozens of models so you don't have to.",
+    "Sign up for our newsletter to get the latest tips delivered to your inbox.",
+    "This article contains affiliate links; we may earn a commission.",
+    "Updated for this year with new information and pictures.",
+]
+
+
+def legacy_prompt(request: SearchRequestPayload, sources) -> str:
+    """The previous _build_research_prompt: top 10 sources joined whole"""
+    sources_text = "\n".join([
+        f"- {s['title']}: {s['snippet']} ({s['url']})"
+        for s in sources[:10]
+    ])
+    return f"""
+Research Request: {request.description}
+Category: {request.category}
+Priority: {request.priority}
+{_language_instruction(request.language)}
+
+Available Sources:
+{sources_text}
+{_prompt_instructions(request.language)}"""
+
+
+def search_results(rng: random.Random, query: str, category: str):
+    """10-12 results: a few relevant articles, syndicated copies of one, and generic pages"""
+    words = query.split()
+    sources = []
+    for i in range(rng.randint(10, 12)):
+        kind = rng.random()
+        if i > 0 and kind < 0.25:
+            original = rng.choice(sources)
+            sources.append({**original, "url": f"https://mirror{i}.example.net/{i}", "credibility": rng.randint(20, 50)})
+            continue
+        relevant = kind < 0.7
+        topic = " ".join(rng.sample(words, min(3, len(words)))) if relevant else rng.choice(["gardening", "recipes", "travel"])
+        body = " ".join(
+            f"Step {n}: when dealing with {topic}, check the {rng.choice(words)} and compare {rng.choice(['prices', 'models', 'options'])}."
+            for n in range(rng.randint(1, 4))
+        ) + " " + " ".join(rng.sample(FILLER, 2))
+        sources.append({
+            "title": f"{topic.title()} - complete guide {i}" + (" | " + "Best Reviews " * rng.randint(0, 4) if rng.random() < 0.3 else ""),
+            "url": f"https://site{i}.example.com/{category}/{'-'.join(topic.split())}",
+            "snippet": body[:300],
+            "credibility": rng.randint(40, 95),
+        })
+    return sources
+
+
+def fallback_results(query: str, category: str):
+    from services.search_engine import SearchEngine
+    return SearchEngine._get_fallback_sources(None, query, category)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, help="PROMPT_SOURCE_TOKENS (default: the service default)")
+    parser.add_argument("--sets", type=int, default=200, help="source sets per query (default 200)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.budget:
+        os.environ["PROMPT_SOURCE_TOKENS"] = str(args.budget)
+    service = AIService()
+    counter = service.prompt_packer.counter
+    rng = random.Random(0)
+
+    rows = {"search": [], "fallback": []}
+    for description, category in QUERIES:
+        request = SearchRequestPayload(id="bench", description=description, category=category,
+                                       priority="normal", createdAt="", language="en")
+        cases = [("search", search_results(rng, description, category)) for _ in range(args.sets)]
+        cases.append(("fallback", fallback_results(description, category)))
+        for kind, sources in cases:
+            start = time.perf_counter()
+            old = legacy_prompt(request, sources)
+            old_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            new, packed = service._build_research_prompt(request, sources)
+            new_ms = (time.perf_counter() - start) * 1000
+            urls = {s["url"] for s in sources}
+            rows[kind].append({
+                "legacyTokens": counter.count(old),
+                "packedTokens": counter.count(new),
+                "legacySources": sum(url in old for url in urls),
+                "packedSources": sum(url in new for url in urls),
+                "duplicates": packed.duplicates,
+                "legacyMs": old_ms,
+                "packedMs": new_ms,
+            })
+
+    summary = {
+        kind: {
+            "cases": len(items),
+            **{key: statistics.mean(item[key] for item in items) for key in items[0]},
+        }
+        for kind, items in rows.items()
+    }
+    summary["tokenizer"] = "tiktoken" if counter.exact else "estimate"
+    summary["budget"] = service.prompt_packer.budget
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"Source token budget {summary['budget']}, tokens counted by {summary['tokenizer']}")
+    print()
+    print(f"{'':<10} {'cases':>6} {'legacy tok':>11} {'packed tok':>11} {'saved':>7} {'sources':>8} {'packed':>7} {'dupes':>6} {'pack ms':>8}")
+    for kind in ("search", "fallback"):
+        s = summary[kind]
+        saved = 1 - s["packedTokens"] / s["legacyTokens"]
+        print(f"{kind:<10} {s['cases']:>6} {s['legacyTokens']:>11.0f} {s['packedTokens']:>11.0f} {saved:>7.1%} "
+              f"{s['legacySources']:>8.1f} {s['packedSources']:>7.1f} {s['duplicates']:>6.1f} {s['packedMs']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation: near-duplicate query matching for the result cache
+
+Scores labelled query pairs (same question / different question) with the
+QueryIndex similarity and reports precision and recall per threshold, next to
+the exact normalized-key match the cache used before. Also checks how often
+LSH surfaces the pairs the threshold accepts, and times lookups against a
+filled index.
+
+Usage (from backend/):
+    python benchmarks/eval_similar_queries.py                   # bundled pairs
+    python benchmarks/eval_similar_queries.py --data pairs.tsv  # <0|1>\t<query a>\t<query b> per line
+    python benchmarks/eval_similar_queries.py --json            # machine-readable output
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.query_index import QueryIndex, different_question, features, jaccard, word_order
+from services.result_cache import ResultCache
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "query_pairs.tsv")
+THRESHOLDS = (0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+
+
+def load_pairs(path: str):
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            label, a, b = line.split("\t")
+            pairs.append((label == "1", a, b))
+    return pairs
+
+
+def similarity(a: str, b: str) -> float:
+    """What QueryIndex.lookup compares, without the LSH candidate step"""
+    shingles_a, pinned_a = features(a)
+    shingles_b, pinned_b = features(b)
+    if pinned_a != pinned_b or different_question(word_order(a), word_order(b)):
+        return 0.0
+    return jaccard(shingles_a, shingles_b)
+
+
+def precision_recall(predicted, labels):
+    tp = sum(1 for p, l in zip(predicted, labels) if p and l)
+    fp = sum(1 for p, l in zip(predicted, labels) if p and not l)
+    fn = sum(1 for p, l in zip(predicted, labels) if not p and l)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return precision, recall, fp
+
+
+def lsh_recall(pairs, threshold: float) -> float:
+    """Share of pairs at or above threshold that LSH makes candidates of each other"""
+    accepted = [(a, b) for _, a, b in pairs if similarity(a, b) >= threshold]
+    if not accepted:
+        return 1.0
+    found = 0
+    for a, b in accepted:
+        index = QueryIndex(threshold=threshold)
+        index.add("a", a)
+        found += "a" in index.candidates(b)
+    return found / len(accepted)
+
+
+def lookup_timing(pairs, size: int):
+    """Median lookup ms against an index of `size` synthetic queries built from the pair vocabulary"""
+    rng = random.Random(0)
+    vocabulary = sorted({w for _, a, b in pairs for w in (a + " " + b).lower().split()})
+    index = QueryIndex()
+    for i in range(size):
+        index.add(i, " ".join(rng.sample(vocabulary, rng.randint(3, 8))))
+    timings = []
+    for _, a, _ in pairs:
+        start = time.perf_counter()
+        index.lookup(a)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, index.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="TSV of <0|1>\\t<query a>\\t<query b> (default: bundled set)")
+    parser.add_argument("--index-size", type=int, default=5000, help="entries in the index for the timing run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.data)
+    labels = [label for label, _, _ in pairs]
+    scores = [similarity(a, b) for _, a, b in pairs]
+
+    exact = [ResultCache.normalize(a) == ResultCache.normalize(b) for _, a, b in pairs]
+    exact_precision, exact_recall, _ = precision_recall(exact, labels)
+
+    rows = []
+    for threshold in THRESHOLDS:
+        precision, recall, false_positives = precision_recall([s >= threshold for s in scores], labels)
+        rows.append({"threshold": threshold, "precision": precision, "recall": recall, "falsePositives": false_positives})
+
+    default_threshold = QueryIndex().threshold
+    lookup_ms, index_stats = lookup_timing(pairs, args.index_size)
+    summary = {
+        "pairs": len(pairs),
+        "positives": sum(labels),
+        "exactKey": {"precision": exact_precision, "recall": exact_recall},
+        "thresholds": rows,
+        "defaultThreshold": default_threshold,
+        "lshRecallAtDefault": lsh_recall(pairs, default_threshold),
+        "lookupMedianMs": lookup_ms,
+        "index": index_stats,
+    }
+    false_positives = [
+        {"similarity": round(score, 3), "a": a, "b": b}
+        for (label, a, b), score in zip(pairs, scores) if not label and score >= default_threshold
+    ]
+    missed = [
+        {"similarity": round(score, 3), "a": a, "b": b}
+        for (label, a, b), score in zip(pairs, scores) if label and score < default_threshold
+    ]
+
+    if args.json:
+        print(json.dumps({"summary": summary, "falsePositives": false_positives, "missed": missed}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{len(pairs)} pairs ({sum(labels)} same question)")
+    print()
+    print(f"{'':<18} {'precision':>10} {'recall':>8} {'false +':>8}")
+    print(f"{'exact key':<18} {exact_precision:>10.1%} {exact_recall:>8.1%} {'':>8}")
+    for row in rows:
+        marker = " <- default" if row["threshold"] == default_threshold else ""
+        print(f"{'jaccard >= ' + format(row['threshold'], '.2f'):<18} {row['precision']:>10.1%} {row['recall']:>8.1%} "
+              f"{row['falsePositives']:>8}{marker}")
+    print()
+    print(f"LSH surfaces {summary['lshRecallAtDefault']:.1%} of the pairs accepted at {default_threshold}")
+    print(f"Lookup against {args.index_size} entries: {lookup_ms:.3f} ms median (numpy: {index_stats['numpy']})")
+    if false_positives:
+        print()
+        print("Accepted at the default threshold but labelled different:")
+        for item in false_positives:
+            print(f"  {item['similarity']:.2f}  {item['a']}  |  {item['b']}")
+    if missed:
+        print()
+        print("Labelled the same but below the default threshold:")
+        for item in missed:
+            print(f"  {item['similarity']:.2f}  {item['a']}  |  {item['b']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Load test: drive POST /v1/search against local stub services
+
+Starts the stub search provider, page server and OpenAI endpoint from
+stub_services.py, runs the backend under uvicorn pointed at them, and replays
+captured search requests at a fixed concurrency. Reports latency percentiles,
+throughput and per-stage timings (from the backend's own trace spans) as JSON,
+optionally compared against a previous report.
+
+Usage (from backend/):
+    python benchmarks/load_test.py                                  # bundled traffic, 8 concurrent
+    python benchmarks/load_test.py --concurrency 32 --count 500 --output run.json
+    python benchmarks/load_test.py --baseline run.json              # compare against an earlier run
+    python benchmarks/load_test.py --requests captured.jsonl        # one SearchRequestPayload per line
+    python benchmarks/load_test.py --env ADMISSION_MAX_CONCURRENCY=32 --with-caches
+
+Caches are off by default so every request runs the whole pipeline.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_services
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REQUESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "search_requests.jsonl")
+
+CACHE_SWITCHES = ("RESULT_CACHE_ENABLED", "SOURCE_CACHE_ENABLED", "SEARCH_CACHE_ENABLED")
+
+# Compared against the baseline; lower is better for all but throughput
+COMPARED = [("throughputRps", ("throughputRps",)), ("p50 ms", ("latencyMs", "p50")),
+            ("p95 ms", ("latencyMs", "p95")), ("p99 ms", ("latencyMs", "p99"))]
+
+
+def load_requests(path: str) -> List[Dict]:
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                requests.append(json.loads(line))
+    if not requests:
+        raise SystemExit(f"No requests in {path}")
+    return requests
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear interpolation between closest ranks (q in 0..100)"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "max": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(env: Dict[str, str], port: int, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited with {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"Backend didn't become healthy within 30s; see {log_path}")
+
+
+async def drive(base_url: str, requests: List[Dict], count: int, concurrency: int, prefix: str) -> List[Dict]:
+    """Closed loop: concurrency workers, each sending its next request as soon as the last one returns"""
+    results: List[Dict] = []
+    next_index = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=httpx.Timeout(180.0)) as client:
+        async def worker():
+            nonlocal next_index
+            while next_index < count:
+                i = next_index
+                next_index += 1
+                payload = {
+                    **requests[i % len(requests)],
+                    "id": f"{prefix}-{i}",
+                    "createdAt": datetime.now(timezone.utc).isoformat(),
+                }
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/v1/search", json=payload)
+                    status, trace_id = response.status_code, response.headers.get("x-trace-id")
+                except httpx.HTTPError as e:
+                    status, trace_id = type(e).__name__, None
+                results.append({
+                    "status": status,
+                    "ms": (time.perf_counter() - start) * 1000,
+                    "traceId": trace_id,
+                })
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def stage_timings(trace_file: str, trace_ids: set) -> Dict[str, Dict]:
+    """Span durations by span name, over the traces of the measured requests"""
+    durations: Dict[str, List[float]] = {}
+    if not os.path.exists(trace_file):
+        return {}
+    with open(trace_file, encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if span["traceId"] in trace_ids:
+                durations.setdefault(span["name"], []).append(span["durationMs"])
+    return {name: summarize(values) for name, values in sorted(durations.items())}
+
+
+def build_report(args, results: List[Dict], elapsed: float, stages: Dict, upstream: Dict) -> Dict:
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    ok = [result["ms"] for result in results if result["status"] == 200]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "requestsFile": args.requests,
+            "count": args.count,
+            "concurrency": args.concurrency,
+            "caches": args.with_caches,
+            "env": dict(args.env),
+            "stubs": {
+                "searchLatencyMs": args.search_latency,
+                "pageLatencyMs": args.page_latency,
+                "pageSizesKb": args.page_sizes,
+                "pagePool": args.page_pool,
+                "pageHosts": args.page_hosts,
+                "openaiLatencyMs": args.openai_latency,
+                "jitter": args.jitter,
+            },
+        },
+        "requests": {"sent": len(results), "ok": len(ok), "statuses": statuses},
+        "durationSeconds": round(elapsed, 3),
+        "throughputRps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latencyMs": summarize(ok),
+        "stagesMs": stages,
+        "upstreamRequests": upstream,
+    }
+
+
+def _lookup(report: Dict, path) -> Optional[float]:
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    rows = [(label, path) for label, path in COMPARED]
+    for stage in report["stagesMs"]:
+        rows.append((f"{stage} p50 ms", ("stagesMs", stage, "p50")))
+        rows.append((f"{stage} p95 ms", ("stagesMs", stage, "p95")))
+    comparison = []
+    for label, path in rows:
+        current, previous = _lookup(report, path), _lookup(baseline, path)
+        change = (current - previous) / previous if current is not None and previous else None
+        comparison.append({"metric": label, "baseline": previous, "current": current,
+                           "change": round(change, 4) if change is not None else None})
+    return comparison
+
+
+def print_report(report: Dict, comparison: Optional[List[Dict]]):
+    latency = report["latencyMs"]
+    requests = report["requests"]
+    print(f"{requests['sent']} requests ({requests['ok']} ok) at concurrency {report['config']['concurrency']} "
+          f"in {report['durationSeconds']:.1f}s: {report['throughputRps']:.2f} req/s")
+    print(f"statuses: {requests['statuses']}")
+    print(f"latency ms: p50 {latency['p50']:.0f}  p95 {latency['p95']:.0f}  p99 {latency['p99']:.0f}  max {latency['max']:.0f}")
+    print()
+    print(f"{'stage':<24} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stage in report["stagesMs"].items():
+        print(f"{name:<24} {stage['count']:>7} {stage['p50']:>9.1f} {stage['p95']:>9.1f} {stage['p99']:>9.1f}")
+    print()
+    print(f"upstream requests: {report['upstreamRequests']}")
+    if comparison:
+        print()
+        print(f"{'vs. baseline':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+        for row in comparison:
+            if row["baseline"] is None or row["current"] is None:
+                continue
+            change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+            print(f"{row['metric']:<32} {row['baseline']:>10.2f} {row['current']:>10.2f} {change:>8}")
+
+
+def parse_env(value: str):
+    key, sep, val = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {value!r}")
+    return key, val
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=DEFAULT_REQUESTS, help="JSONL of search requests to replay (default: bundled set)")
+    parser.add_argument("--count", type=int, default=200, help="requests to send, cycling through the file (default 200)")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once (default 8)")
+    parser.add_argument("--warmup", type=int, default=10, help="requests sent first and left out of the report (default 10)")
+    parser.add_argument("--with-caches", action="store_true", help="keep the result/source/search caches on")
+    parser.add_argument("--env", type=parse_env, action="append", default=[], metavar="KEY=VALUE",
+                        help="extra backend environment (repeatable), e.g. to compare settings")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    stub_services.add_arguments(parser)
+    args = parser.parse_args()
+
+    requests = load_requests(args.requests)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="searchbot-load-") as workdir, stub_services.from_arguments(args) as stubs:
+        trace_file = os.path.join(workdir, "traces.jsonl")
+        env = {
+            **stubs.env(),
+            "TRACE_SAMPLE_RATE": "1",
+            "TRACE_EXPORTER": "jsonl",
+            "TRACE_FILE": trace_file,
+            "TRACE_EXPORT_INTERVAL": "0.5",
+            "TRACE_MAX_QUEUE": "1000000",
+            "RESULT_CACHE_SQLITE_PATH": "",
+        }
+        if not args.with_caches:
+            env.update({switch: "false" for switch in CACHE_SWITCHES})
+        env.update(dict(args.env))
+
+        port = free_port()
+        log_path = os.path.join(workdir, "backend.log")
+        backend = start_backend(env, port, log_path)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            if args.warmup:
+                asyncio.run(drive(base_url, requests, args.warmup, min(args.concurrency, args.warmup), "warmup"))
+            upstream_before = dict(stubs.requests)
+            start = time.perf_counter()
+            results = asyncio.run(drive(base_url, requests, args.count, args.concurrency, "load"))
+            elapsed = time.perf_counter() - start
+            upstream = {kind: stubs.requests[kind] - upstream_before[kind] for kind in stubs.requests}
+        finally:
+            # SIGTERM lets uvicorn run the shutdown hooks, which flush the trace buffer
+            backend.terminate()
+            try:
+                backend.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                backend.kill()
+
+        trace_ids = {result["traceId"] for result in results if result["traceId"]}
+        report = build_report(args, results, elapsed, stage_timings(trace_file, trace_ids), upstream)
+
+    comparison = compare(report, baseline) if baseline else None
+    if comparison:
+        report["comparison"] = comparison
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report, comparison)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the services a search touches, so load tests never hit
+live search engines, live sites or OpenAI:
+
+- a SerpAPI-compatible search endpoint (GET /search.json) whose results link
+  to the page server; each query maps to a deterministic set of pages drawn
+  from a fixed pool, so popular pages are shared between queries like on the
+  real web
+- a page server (GET /page/<n>) with configurable latency and page sizes,
+  listening on several loopback addresses (127.0.1.x) so pages come from
+  distinct hosts and the per-host fetch limit behaves as it does in production
+- an OpenAI-compatible chat completion endpoint (POST /v1/chat/completions,
+  plain and streamed), reached through OPENAI_BASE_URL
+
+Usage (from backend/):
+    python benchmarks/stub_services.py                   # print the env to point the app at them
+    python benchmarks/stub_services.py --page-latency 200 --openai-latency 3000
+"""
+
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from typing import Dict, List
+
+COMPLETION = {
+    "summary": "Start by identifying the exact model, then follow the steps below.",
+    "steps": [
+        {"id": "1", "title": "Identify the problem", "description": "Note what happens and when it started."},
+        {"id": "2", "title": "Try the simple fix", "description": "Restart the device and check the connections."},
+        {"id": "3", "title": "Check the manual", "description": "Look up the error code in the manufacturer's guide."},
+    ],
+    "decisionFactors": [
+        {"id": "1", "label": "Cost", "detail": "Repairs above half the replacement price rarely pay off."},
+        {"id": "2", "label": "Warranty", "detail": "Opening the device may void the warranty."},
+    ],
+    "estimatedTimeMinutes": 20,
+    "difficulty": "easy",
+    "recommendedActions": ["Write down the error code", "Contact support if the problem persists"],
+}
+
+FILLER = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt.</p>\n"
+
+
+def _sleep_ms(mean_ms: float, jitter: float):
+    """Sleep around mean_ms, +/- jitter (a fraction of the mean)"""
+    if mean_ms > 0:
+        time.sleep(max(0.0, random.uniform(1 - jitter, 1 + jitter)) * mean_ms / 1000)
+
+
+def _stable_int(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stubs: "StubServices" = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/search.json":
+            self.stubs.count("search")
+            query = parse_qs(url.query).get("q", [""])[0]
+            num = int(parse_qs(url.query).get("num", ["10"])[0])
+            _sleep_ms(self.stubs.search_latency_ms, self.stubs.jitter)
+            body = json.dumps({"organic_results": [{"link": link} for link in self.stubs.results_for(query, num)]})
+            self._send(200, body.encode(), "application/json")
+        elif url.path.startswith("/page/"):
+            self.stubs.count("page")
+            _sleep_ms(self.stubs.page_latency_ms, self.stubs.jitter)
+            self._send(200, self.stubs.page(url.path[len("/page/"):]), "text/html; charset=utf-8")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/v1/chat/completions":
+            self._send(404, b"not found", "text/plain")
+            return
+        self.stubs.count("openai")
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        content = json.dumps(COMPLETION)
+        completion_tokens = len(content) // 4
+        _sleep_ms(self.stubs.openai_latency_ms, self.stubs.jitter)
+
+        if not request.get("stream"):
+            body = json.dumps({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            self._send(200, body.encode(), "application/json")
+            return
+
+        # Stream ~4 characters per token at openai_tokens_per_second
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        delay = 1.0 / self.stubs.openai_tokens_per_second if self.stubs.openai_tokens_per_second > 0 else 0.0
+        for start in range(0, len(content), 16):
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(delay * 4)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", "stub"),
+                "choices": [],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class StubServices:
+    """
+    The search and OpenAI stubs share one port (they're told apart by path);
+    pages are also served on page_hosts extra loopback addresses. Latencies
+    are means in milliseconds, varied by +/- jitter; page sizes are picked per
+    page from page_sizes_kb, so the same page always has the same size.
+    """
+
+    def __init__(
+        self,
+        search_latency_ms: float = 300.0,
+        page_latency_ms: float = 100.0,
+        page_sizes_kb: List[int] = (8, 32, 128),
+        page_pool: int = 200,
+        page_hosts: int = 16,
+        openai_latency_ms: float = 1500.0,
+        openai_tokens_per_second: float = 200.0,
+        jitter: float = 0.3,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        self.search_latency_ms = search_latency_ms
+        self.page_latency_ms = page_latency_ms
+        self.page_sizes_kb = list(page_sizes_kb)
+        self.page_pool = page_pool
+        self.openai_latency_ms = openai_latency_ms
+        self.openai_tokens_per_second = openai_tokens_per_second
+        self.jitter = jitter
+
+        handler = type("StubHandler", (_Handler,), {"stubs": self})
+        self._server = self._bind(handler, host, port)
+        self._servers = [self._server]
+        for i in range(page_hosts):
+            try:
+                self._servers.append(self._bind(handler, f"127.0.1.{i + 1}", self._server.server_address[1]))
+            except OSError:
+                # Only Linux routes all of 127/8 to loopback; elsewhere every page shares one host
+                break
+        self.page_urls = [f"http://{server.server_address[0]}:{server.server_address[1]}" for server in self._servers[1:]]
+        self.page_urls = self.page_urls or [self.base_url]
+        self._threads: List[threading.Thread] = []
+        self._pages: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.requests = {"search": 0, "page": 0, "openai": 0}
+
+    @staticmethod
+    def _bind(handler, host: str, port: int) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        return server
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def results_for(self, query: str, num: int) -> List[str]:
+        rng = random.Random(_stable_int(query))
+        pages = rng.sample(range(self.page_pool), min(num, self.page_pool))
+        return [f"{self.page_urls[n % len(self.page_urls)]}/page/{n}" for n in pages]
+
+    def page(self, name: str) -> bytes:
+        body = self._pages.get(name)
+        if body is None:
+            size = self.page_sizes_kb[_stable_int(name) % len(self.page_sizes_kb)] * 1024
+            head = (
+                f"<html><head><meta charset='utf-8'><title>Stub page {name}</title>"
+                f"<meta name='description' content='How to fix common problems, part {name}.'></head><body>\n"
+            )
+            body = (head + FILLER * max(1, (size - len(head)) // len(FILLER)) + "</body></html>").encode("utf-8")
+            self._pages[name] = body
+        return body
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the backend at these stubs"""
+        return {
+            "SEARCH_PROVIDERS": "serpapi",
+            "SERPAPI_BASE_URL": self.base_url,
+            "SERP_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "stub",
+        }
+
+    def start(self) -> "StubServices":
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Stub options shared with the load test"""
+    group = parser.add_argument_group("stub services")
+    group.add_argument("--search-latency", type=float, default=300.0, help="search API latency, ms (default 300)")
+    group.add_argument("--page-latency", type=float, default=100.0, help="page server latency, ms (default 100)")
+    group.add_argument("--page-sizes", default="8,32,128", help="page sizes in KB, comma separated (default 8,32,128)")
+    group.add_argument("--page-pool", type=int, default=200, help="distinct pages search results draw from (default 200)")
+    group.add_argument("--page-hosts", type=int, default=16, help="loopback hosts the pages are spread over (default 16)")
+    group.add_argument("--openai-latency", type=float, default=1500.0, help="completion latency, ms (default 1500)")
+    group.add_argument("--openai-tps", type=float, default=200.0, help="streamed tokens per second (default 200)")
+    group.add_argument("--jitter", type=float, default=0.3, help="latency varies by +/- this fraction (default 0.3)")
+
+
+def from_arguments(args: argparse.Namespace, port: int = 0) -> StubServices:
+    return StubServices(
+        search_latency_ms=args.search_latency,
+        page_latency_ms=args.page_latency,
+        page_sizes_kb=[int(kb) for kb in args.page_sizes.split(",") if kb.strip()],
+        page_pool=args.page_pool,
+        page_hosts=args.page_hosts,
+        openai_latency_ms=args.openai_latency,
+        openai_tokens_per_second=args.openai_tps,
+        jitter=args.jitter,
+        port=port,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900, help="port to listen on (default 8900)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    stubs = from_arguments(args, port=args.port).start()
+    print(f"Stub services listening on {stubs.base_url} (pages on {len(stubs.page_urls)} hosts); point the backend at them with:")
+    for key, value in stubs.env().items():
+        print(f"  export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()
+        print(json.dumps({"requests": stubs.requests}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,72 +3,50 @@ SearchBot Backend API
 FastAPI server for processing research requests
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, APIRouter, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, APIRouter, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import os
 import time
+import asyncio
 import logging
 import uuid
+from functools import partial
+from typing import Callable, List, Optional, Tuple
 from dotenv import load_dotenv
-from langdetect import detect, LangDetectException
 
 from services.search_engine import SearchEngine
-from services.ai_service import AIService
+from services.ai_service import AIService, AIServiceBusy, AIServiceTimeout
+from services.result_cache import ResultCache
+from services.single_flight import SingleFlight
+from services.admission import PRIORITIES, AdmissionController, AdmissionRejected
+from services.deadline import DEADLINE_HEADER, DeadlinePolicy, current_deadline, deadline_scope
+from services.batch_memo import BatchMemo
+from services.language_detector import LanguageDetector
+from services.metrics import (
+    REGISTRY as metrics_registry,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUEST_SECONDS,
+    PIPELINES_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    OPENAI_REQUESTS_IN_FLIGHT,
+    HOST_CIRCUITS_OPEN,
+    GATHER_SOURCES_SECONDS,
+)
+from services.tracing import tracer, parse_traceparent
+from services.fast_json import RawJSON, dump_json
+from services.logging_config import configure_logging, logging_stats
+from services.search_jobs import SearchJob, SearchJobManager, JobFailed, JobQueueFull
 from models.search_models import SearchRequestPayload, SearchResultPayload
 
 load_dotenv()
 
-# Custom filter to add request ID to logs
-class RequestIDFilter(logging.Filter):
-    def filter(self, record):
-        # Always ensure request_id exists, default to 'system' for non-request logs
-        if not hasattr(record, 'request_id'):
-            record.request_id = 'system'
-        return True
-
-# Configure logging with filter applied to root logger
-root_logger = logging.getLogger()
-root_logger.addFilter(RequestIDFilter())
-
-# Use a custom formatter that handles missing request_id gracefully
-class SafeFormatter(logging.Formatter):
-    def format(self, record):
-        # Ensure request_id exists before formatting (double-check in case filter didn't run)
-        if not hasattr(record, 'request_id'):
-            record.request_id = 'system'
-        try:
-            return super().format(record)
-        except (KeyError, ValueError) as e:
-            # Fallback format if request_id still causes issues
-            record.request_id = 'system'
-            return f"{self.formatTime(record, self.datefmt)} - {record.name} - {record.levelname} - [system] - {record.getMessage()}"
-
-# Configure logging - only if not already configured
-if not root_logger.handlers:
-    handler = logging.StreamHandler()
-    handler.setFormatter(SafeFormatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    ))
-    root_logger.addHandler(handler)
-    root_logger.setLevel(logging.INFO)
-else:
-    # If handlers exist (from uvicorn), update their formatters
-    for handler in root_logger.handlers:
-        if isinstance(handler, logging.StreamHandler):
-            handler.setFormatter(SafeFormatter(
-                fmt='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s',
-                datefmt='%Y-%m-%d %H:%M:%S'
-            ))
+# Queued, off-loop log writing; text or JSON lines (see services/logging_config.py)
+configure_logging()
 
 # Create logger for request tracing
 logger = logging.getLogger(__name__)
 
-# Suppress verbose httpx/httpcore logging (it's too noisy and causes format errors)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
-logging.getLogger("openai").setLevel(logging.WARNING)  # Also suppress OpenAI's verbose logs
-
 app = FastAPI(title="SearchBot API", version="1.0.0")
 
 # Create API router with /v1 prefix
@@ -92,39 +70,76 @@ app.add_middleware(
 async def trace_requests(request: Request, call_next):
     request_id = str(uuid.uuid4())[:8]
     start_time = time.time()
+    status_code = 500
+    HTTP_REQUESTS_IN_FLIGHT.inc()
     
     # Add request ID to request state
     request.state.request_id = request_id
     
+    # Root span of the request's trace; everything below (including tasks it spawns) nests under it
+    span = tracer.start_span(
+        "http.request",
+        {"http.method": request.method, "http.path": request.url.path, "request_id": request_id},
+        traceparent=parse_traceparent(request.headers.get("traceparent"))
+    )
+    
     # Log incoming request
     logger.info(
-        f"→ Incoming request: {request.method} {request.url.path}",
+        "→ Incoming request: %s %s",
+        request.method, request.url.path,
         extra={"request_id": request_id}
     )
     
     try:
-        response = await call_next(request)
+        with tracer.activate(span):
+            response = await call_next(request)
         process_time = time.time() - start_time
+        status_code = response.status_code
         
         # Log response
         logger.info(
-            f"← Response: {response.status_code} | Time: {process_time:.3f}s",
-            extra={"request_id": request_id}
+            "← Response: %s | Time: %.3fs",
+            response.status_code, process_time,
+            extra={"request_id": request_id, "stage": "request", "status": response.status_code, "seconds": round(process_time, 3)}
         )
         
+        if span.sampled:
+            response.headers["X-Trace-Id"] = span.trace_id
         return response
     except Exception as e:
+        span.set_error(e)
         process_time = time.time() - start_time
         logger.error(
-            f"✗ Request failed: {str(e)} | Time: {process_time:.3f}s",
+            "✗ Request failed: %s | Time: %.3fs",
+            e, process_time,
             extra={"request_id": request_id},
             exc_info=True
         )
         raise
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by route template (/v1/search/jobs/{job_id}), not the raw path, to keep series bounded
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route_path, status_code).observe(time.time() - start_time)
+        
+        span.set_attribute("http.route", route_path)
+        span.set_attribute("http.status_code", status_code)
+        span.end()
 
 # Initialize services lazily to handle missing API keys gracefully
 search_engine = None
 ai_service = None
+result_cache = None
+language_detector = None
+pipeline_flight = SingleFlight("pipeline")
+admission = AdmissionController()
+deadline_policy = DeadlinePolicy()
+PIPELINES_IN_FLIGHT.set_function(lambda: admission.active)
+for _priority in PRIORITIES:
+    ADMISSION_QUEUE_DEPTH.set_function(partial(admission.queue_depth, _priority), _priority)
+OPENAI_REQUESTS_IN_FLIGHT.set_function(lambda: ai_service._in_flight if ai_service is not None else 0)
+HOST_CIRCUITS_OPEN.set_function(lambda: search_engine.host_health.open_hosts() if search_engine is not None else 0)
 
 def get_search_engine():
     global search_engine
@@ -144,6 +159,43 @@ def get_ai_service():
         ai_service = AIService()
     return ai_service
 
+def get_result_cache():
+    global result_cache
+    if result_cache is None:
+        result_cache = ResultCache()
+    return result_cache
+
+def get_language_detector():
+    global language_detector
+    if language_detector is None:
+        language_detector = LanguageDetector()
+    return language_detector
+
+def wants_cache_bypass(http_request: Request) -> bool:
+    """X-Cache-Bypass: 1 (or Cache-Control: no-cache) skips the cache lookup; the fresh result is still stored"""
+    bypass = http_request.headers.get("x-cache-bypass", "").lower()
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    return bypass in ("1", "true", "yes") or "no-cache" in cache_control
+
+
+@app.on_event("startup")
+async def load_language_profiles():
+    """Load the language profiles now rather than on the first request that needs them"""
+    get_language_detector().load()
+
+
+@app.on_event("shutdown")
+async def close_services():
+    """Close pooled HTTP connections held by the services"""
+    if search_engine is not None:
+        await search_engine.aclose()
+    if ai_service is not None:
+        await ai_service.aclose()
+    await search_jobs.aclose()
+    if result_cache is not None:
+        result_cache.close()
+    await tracer.aclose()
+
 
 @app.get("/health")
 async def health_check():
@@ -151,100 +203,722 @@ async def health_check():
     return {"status": "ok", "service": "searchbot-api"}
 
 
-@api_router.post("/search", response_model=SearchResultPayload)
-async def search(request: SearchRequestPayload, http_request: Request):
-    """
-    Main search endpoint - processes research requests and returns structured results
-    """
-    request_id = getattr(http_request.state, 'request_id', 'unknown')
-    
-    # Detect language if not provided
+def detect_request_language(request: SearchRequestPayload, request_id: str) -> str:
+    """Fill in request.language from the description when the client didn't send one"""
     detected_language = request.language
     if not detected_language:
-        try:
-            # Detect language from description
-            detected_language = detect(request.description)
+        # Detect language from description
+        with tracer.span("language.detect") as span:
+            detected_language = get_language_detector().detect(request.description)
+            span.set_attribute("language", detected_language)
+        if detected_language:
             logger.info(
-                f"🌐 Detected language: {detected_language}",
+                "🌐 Detected language: %s",
+                detected_language,
                 extra={"request_id": request_id}
             )
-        except LangDetectException:
+        else:
             # Fallback to English if detection fails
             detected_language = "en"
             logger.warning(
-                f"⚠️ Language detection failed, defaulting to 'en'",
+                "⚠️ Language detection failed, defaulting to 'en'",
                 extra={"request_id": request_id}
             )
     
     # Update request with detected language
     request.language = detected_language
+    return detected_language
+
+
+async def run_search_pipeline(
+    request: SearchRequestPayload,
+    request_id: str,
+    on_source: Optional[Callable[[dict], None]] = None
+) -> SearchResultPayload:
+    """
+    Gather web sources, then generate the structured research result
+    """
+    # 1. Gather information from web sources
+    logger.info(
+        "📡 Step 1/2: Gathering web sources...",
+        extra={"request_id": request_id}
+    )
+    search_start = time.time()
+    
+    search_engine = get_search_engine()
+    sources = await search_engine.gather_sources(
+        query=request.description,
+        category=request.category,
+        request_id=request_id,
+        on_source=on_source
+    )
     
+    search_time = time.time() - search_start
     logger.info(
-        f"🔍 Starting search: query='{request.description[:50]}...' category={request.category} priority={request.priority} language={detected_language}",
+        "✓ Found %s sources in %.3fs",
+        len(sources), search_time,
+        extra={"request_id": request_id, "stage": "gather", "sources": len(sources), "seconds": round(search_time, 3)}
+    )
+    
+    # 2. Use AI to generate structured research results
+    logger.info(
+        "🤖 Step 2/2: Generating AI research result...",
         extra={"request_id": request_id}
     )
+    ai_start = time.time()
     
-    try:
-        # Process the search request
-        # 1. Gather information from web sources
+    ai_service = get_ai_service()
+    result = await ai_service.generate_research_result(
+        request=request,
+        sources=sources,
+        request_id=request_id
+    )
+    
+    ai_time = time.time() - ai_start
+    total_time = time.time() - search_start
+    
+    logger.info(
+        "✓ Search completed: %s steps, %s sources | "
+        "AI: %.3fs | Total: %.3fs",
+        len(result.steps), len(result.sources), ai_time, total_time,
+        extra={
+            "request_id": request_id,
+            "stage": "pipeline",
+            "gather_seconds": round(search_time, 3),
+            "ai_seconds": round(ai_time, 3),
+            "seconds": round(total_time, 3),
+        }
+    )
+    
+    return result
+
+
+async def run_and_cache_pipeline(
+    request: SearchRequestPayload,
+    request_id: str,
+    cache_key: str,
+    on_source: Optional[Callable[[dict], None]] = None
+) -> SearchResultPayload:
+    # Wait for a pipeline slot in the queue for this request's priority
+    async with admission.admit(request.priority):
+        result = await run_search_pipeline(request, request_id, on_source=on_source)
+    await cache_unless_degraded(cache_key, request, result, request_id)
+    return result
+
+
+async def run_shared_pipeline(
+    request: SearchRequestPayload,
+    request_id: str,
+    cache_key: str,
+    on_source: Optional[Callable[[dict], None]] = None
+) -> Tuple[SearchResultPayload, List[str]]:
+    """
+    run_and_cache_pipeline, shared by identical searches in flight (same cache
+    key). Callers that joined a run share the budget of the request that
+    started it, so whatever it cut short comes back with the result and is
+    recorded on each caller's own deadline too. on_source only sees sources
+    as they're fetched if this caller started the run; one that joined gets
+    them with the result.
+    """
+    async def run() -> Tuple[SearchResultPayload, List[str]]:
+        result = await run_and_cache_pipeline(request, request_id, cache_key, on_source=on_source)
+        deadline = current_deadline()
+        return result, list(deadline.degraded) if deadline is not None else []
+    
+    result, degraded = await pipeline_flight.do(cache_key, run)
+    deadline = current_deadline()
+    if deadline is not None:
+        for reason in degraded:
+            deadline.mark_degraded(reason)
+    return result, degraded
+
+
+async def cache_unless_degraded(cache_key: str, request: SearchRequestPayload, result: SearchResultPayload, request_id: str):
+    """Cache the result, unless it was built from partial sources to meet the request's deadline"""
+    deadline = current_deadline()
+    if deadline is not None and deadline.degraded:
         logger.info(
-            f"📡 Step 1/2: Gathering web sources...",
+            "⏱ Not caching partial result (degraded: %s)",
+            ", ".join(deadline.degraded),
             extra={"request_id": request_id}
         )
-        search_start = time.time()
-        
-        search_engine = get_search_engine()
-        sources = await search_engine.gather_sources(
-            query=request.description,
-            category=request.category,
-            request_id=request_id
-        )
+        return
+    await get_result_cache().set(cache_key, request.category, result, request)
+
+
+def json_bytes_response(payload: bytes, response: Response) -> Response:
+    """
+    Serialized SearchResultPayload as the response, carrying the headers set on
+    `response` so far. Returning a Response skips FastAPI's re-validation and
+    re-serialization against response_model; the result was validated when built.
+    """
+    headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+async def cancel_on_disconnect(http_request: Request, coro, request_id: str, poll_interval: float = 0.5):
+    """
+    Run coro, cancelling it if the client goes away so queued/in-flight work
+    (e.g. an OpenAI completion slot) is released instead of finishing for nobody
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.warning(
+                    "⚠ Client disconnected, cancelling search",
+                    extra={"request_id": request_id}
+                )
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+@api_router.post("/search", response_model=SearchResultPayload)
+async def search(request: SearchRequestPayload, http_request: Request, response: Response):
+    """
+    Main search endpoint - processes research requests and returns structured results
+    """
+    request_id = getattr(http_request.state, 'request_id', 'unknown')
+    
+    detected_language = detect_request_language(request, request_id)
+    
+    cache = get_result_cache()
+    cache_key = cache.make_key(request)
+    if wants_cache_bypass(http_request):
+        cache.record_bypass()
+        response.headers["X-Cache"] = "BYPASS"
+    else:
+        cached = await cache.get_raw(cache_key, request)
+        if cached is not None:
+            logger.info(
+                "⚡ Result cache hit: query='%s...' category=%s",
+                request.description[:50], request.category,
+                extra={"request_id": request_id}
+            )
+            response.headers["X-Cache"] = "HIT"
+            return json_bytes_response(cached, response)
+        response.headers["X-Cache"] = "MISS"
+    
+    logger.info(
+        "🔍 Starting search: query='%s...' category=%s priority=%s language=%s",
+        request.description[:50], request.category, request.priority, detected_language,
+        extra={"request_id": request_id}
+    )
+    
+    deadline = deadline_policy.for_request(request.priority, http_request.headers.get(DEADLINE_HEADER))
+    try:
+        # Identical searches already in flight (same cache key) share one pipeline run,
+        # and with it the budget of the request that started it
+        with deadline_scope(deadline):
+            result, degraded = await cancel_on_disconnect(
+                http_request,
+                run_shared_pipeline(request, request_id, cache_key),
+                request_id
+            )
+        if degraded:
+            response.headers["X-Degraded"] = ",".join(degraded)
+        return json_bytes_response(dump_json(result), response)
         
-        search_time = time.time() - search_start
-        logger.info(
-            f"✓ Found {len(sources)} sources in {search_time:.3f}s",
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        logger.warning(
+            "⚠ Search shed (%s): %s",
+            request.priority, e,
             extra={"request_id": request_id}
         )
-        
-        # 2. Use AI to generate structured research results
-        logger.info(
-            f"🤖 Step 2/2: Generating AI research result...",
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except AIServiceBusy as e:
+        logger.warning(
+            "⚠ Search rejected: %s",
+            e,
             extra={"request_id": request_id}
         )
-        ai_start = time.time()
-        
-        ai_service = get_ai_service()
-        result = await ai_service.generate_research_result(
-            request=request,
-            sources=sources,
-            request_id=request_id
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
+    except AIServiceTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        error_details = str(e)
+        logger.error(
+            "✗ Search processing failed: %s",
+            error_details,
+            extra={"request_id": request_id},
+            exc_info=True
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Search processing failed: {error_details}"
+        )
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {dump_json(data).decode('utf-8')}\n\n"
+
+
+async def stream_search_events(
+    request: SearchRequestPayload,
+    request_id: str,
+    cache_key: str,
+    cached: Optional[SearchResultPayload] = None,
+    deadline=None
+):
+    """
+    Same pipeline as run_search_pipeline, emitted as SSE events while it runs:
+    language -> source (one per fetched page) -> step / decision_factor /
+    recommended_action (as the model writes them) -> result
+    """
+    try:
+        yield format_sse("language", {"language": request.language})
         
-        ai_time = time.time() - ai_start
-        total_time = time.time() - search_start
+        if cached is not None:
+            logger.info(
+                "⚡ Result cache hit (streaming): query='%s...' category=%s",
+                request.description[:50], request.category,
+                extra={"request_id": request_id}
+            )
+            for source in cached.sources:
+                yield format_sse("source", source)
+            yield format_sse("result", cached)
+            return
         
-        logger.info(
-            f"✓ Search completed: {len(result.steps)} steps, {len(result.sources)} sources | "
-            f"AI: {ai_time:.3f}s | Total: {total_time:.3f}s",
-            extra={"request_id": request_id}
+        # Activated per step rather than around the loop: a contextvar set in an
+        # async generator would leak into the consumer across each yield
+        with deadline_scope(deadline):
+            admitted_at = await admission.acquire(request.priority)
+        events = stream_pipeline_events(request, request_id, cache_key, deadline)
+        try:
+            while True:
+                with deadline_scope(deadline):
+                    try:
+                        event = await events.__anext__()
+                    except StopAsyncIteration:
+                        break
+                yield event
+        finally:
+            await events.aclose()
+            admission.release(admitted_at)
+        
+    except AdmissionRejected as e:
+        yield format_sse("error", {"status": 503, "detail": str(e), "retryAfter": e.retry_after})
+    except AIServiceBusy as e:
+        yield format_sse("error", {"status": 503, "detail": str(e), "retryAfter": e.retry_after})
+    except AIServiceTimeout as e:
+        yield format_sse("error", {"status": 504, "detail": str(e)})
+    except Exception as e:
+        logger.error(
+            "✗ Streamed search failed: %s",
+            e,
+            extra={"request_id": request_id},
+            exc_info=True
         )
+        yield format_sse("error", {"status": 500, "detail": f"Search processing failed: {str(e)}"})
+
+
+async def stream_pipeline_events(request: SearchRequestPayload, request_id: str, cache_key: str, deadline=None):
+    search_start = time.time()
+    
+    search_engine = get_search_engine()
+    sources = []
+    async for source in search_engine.iter_sources(
+        query=request.description,
+        category=request.category,
+        request_id=request_id
+    ):
+        sources.append(source)
+        yield format_sse("source", source)
+    sources = search_engine.rank_sources(sources)
+    
+    search_time = time.time() - search_start
+    GATHER_SOURCES_SECONDS.labels("stream").observe(search_time)
+    logger.info(
+        "✓ Streamed %s sources in %.3fs",
+        len(sources), search_time,
+        extra={"request_id": request_id, "stage": "gather", "sources": len(sources), "seconds": round(search_time, 3)}
+    )
+    if deadline is not None and deadline.degraded:
+        yield format_sse("degraded", deadline.to_dict())
+    
+    ai_service = get_ai_service()
+    async for event, value in ai_service.stream_research_result(
+        request=request,
+        sources=sources,
+        request_id=request_id
+    ):
+        if event == "result":
+            await cache_unless_degraded(cache_key, request, value, request_id)
+        yield format_sse(event, value)
+    
+    total_time = time.time() - search_start
+    logger.info(
+        "✓ Streamed search completed | Total: %.3fs",
+        total_time,
+        extra={"request_id": request_id, "stage": "pipeline", "seconds": round(total_time, 3)}
+    )
+
+
+@api_router.post("/search/stream")
+async def search_stream(request: SearchRequestPayload, http_request: Request):
+    """
+    Streaming search endpoint (Server-Sent Events) - emits sources and AI output
+    incrementally; the final "result" event carries the same SearchResultPayload
+    as /v1/search
+    """
+    request_id = getattr(http_request.state, 'request_id', 'unknown')
+    
+    # Fail fast (as a normal HTTP error) if the AI service isn't configured
+    get_ai_service()
+    
+    detected_language = detect_request_language(request, request_id)
+    
+    cache = get_result_cache()
+    cache_key = cache.make_key(request)
+    cached = None
+    if wants_cache_bypass(http_request):
+        cache.record_bypass()
+    else:
+        cached = await cache.get(cache_key, request)
+    
+    # Shed load with a real 503 before the stream starts if this priority's queue is full
+    if cached is None:
+        try:
+            admission.check_capacity(request.priority)
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    logger.info(
+        "🔍 Starting streamed search: query='%s...' category=%s priority=%s language=%s",
+        request.description[:50], request.category, request.priority, detected_language,
+        extra={"request_id": request_id}
+    )
+    
+    deadline = deadline_policy.for_request(request.priority, http_request.headers.get(DEADLINE_HEADER))
+    return StreamingResponse(
+        stream_search_events(request, request_id, cache_key, cached=cached, deadline=deadline),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "8"))
+
+
+async def run_batch_item(index: int, request: SearchRequestPayload, request_id: str, bypass_cache: bool) -> dict:
+    """One item of a batch through the same cache / coalescing / admission path as /v1/search"""
+    item = {"index": index, "id": request.id}
+    try:
+        detect_request_language(request, request_id)
         
-        return result
+        cache = get_result_cache()
+        cache_key = cache.make_key(request)
+        cached = None
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            cached = await cache.get_raw(cache_key, request)
+        if cached is not None:
+            # Spliced into the NDJSON line as stored, without parsing it
+            result, item["cache"] = RawJSON(cached), "HIT"
+        else:
+            deadline = deadline_policy.for_request(request.priority)
+            with deadline_scope(deadline):
+                shared, degraded = await run_shared_pipeline(request, request_id, cache_key)
+            result = RawJSON(dump_json(shared))
+            item["cache"] = "BYPASS" if bypass_cache else "MISS"
+            if degraded:
+                item["degraded"] = degraded
         
-    except HTTPException:
-        raise
+        item.update(status=200, result=result)
+    except AdmissionRejected as e:
+        item.update(status=503, error=str(e), retryAfter=e.retry_after)
+    except AIServiceBusy as e:
+        item.update(status=503, error=str(e), retryAfter=e.retry_after)
+    except AIServiceTimeout as e:
+        item.update(status=504, error=str(e))
     except Exception as e:
-        import traceback
-        error_details = str(e)
         logger.error(
-            f"✗ Search processing failed: {error_details}",
+            "✗ Batch item %s failed: %s",
+            index, e,
             extra={"request_id": request_id},
             exc_info=True
         )
-        raise HTTPException(
-            status_code=500,
-            detail=f"Search processing failed: {error_details}"
+        item.update(status=500, error=f"Search processing failed: {str(e)}")
+    return item
+
+
+async def stream_batch_results(requests: List[SearchRequestPayload], request_id: str, bypass_cache: bool):
+    """
+    Run the batch with at most BATCH_MAX_PARALLELISM items in flight and emit one
+    NDJSON line per item as it completes, then a summary line
+    """
+    batch_start = time.time()
+    slots = asyncio.Semaphore(BATCH_MAX_PARALLELISM)
+    
+    async def run(index: int, request: SearchRequestPayload) -> dict:
+        async with slots:
+            return await run_batch_item(index, request, f"{request_id}-{index}", bypass_cache)
+    
+    # Tasks copy the context they're created in, so every item shares the batch memo
+    batch = BatchMemo()
+    with batch.activate():
+        tasks = [asyncio.ensure_future(run(index, request)) for index, request in enumerate(requests)]
+    
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["status"] != 200:
+                failed += 1
+            yield dump_json(item) + b"\n"
+        
+        summary = {
+            "done": True,
+            "items": len(requests),
+            "succeeded": len(requests) - failed,
+            "failed": failed,
+            "elapsedSeconds": round(time.time() - batch_start, 3),
+            "dedup": batch.stats(),
+        }
+        logger.info(
+            "✓ Batch completed: %s/%s succeeded in %.3fs | dedup=%s",
+            summary["succeeded"], len(requests), summary["elapsedSeconds"], summary["dedup"],
+            extra={"request_id": request_id}
+        )
+        yield dump_json(summary) + b"\n"
+    finally:
+        # Client went away (or we're done): don't leave items running
+        for task in tasks:
+            task.cancel()
+
+
+@api_router.post("/search/batch")
+async def search_batch(requests: List[SearchRequestPayload], http_request: Request):
+    """
+    Batch search endpoint - runs a list of requests with bounded parallelism,
+    sharing search-provider calls and page fetches across the whole batch.
+    Streams NDJSON: one line per item in completion order
+    ({"index", "id", "status", "cache", "result"} or {"index", "id", "status", "error"}),
+    then a {"done": true, ...} summary line
+    """
+    request_id = getattr(http_request.state, 'request_id', 'unknown')
+    
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one request")
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(requests)} requests; the limit is {BATCH_MAX_ITEMS}")
+    
+    # Fail fast (as a normal HTTP error) if the AI service isn't configured
+    get_ai_service()
+    
+    logger.info(
+        "📦 Starting batch: %s requests, parallelism=%s",
+        len(requests), BATCH_MAX_PARALLELISM,
+        extra={"request_id": request_id}
+    )
+    
+    return StreamingResponse(
+        stream_batch_results(requests, request_id, wants_cache_bypass(http_request)),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_search_job(job: SearchJob) -> SearchResultPayload:
+    """
+    Worker side of /v1/search/jobs: the usual pipeline, shared with identical
+    searches in flight, with sources published on the job as they're fetched.
+    A job shed by overload waits and tries again rather than failing outright,
+    since nobody is holding a connection open for it
+    """
+    request, request_id = job.request, job.request_id
+    detect_request_language(request, request_id)
+    
+    cache = get_result_cache()
+    cache_key = cache.make_key(request)
+    cached = await cache.get(cache_key, request)
+    if cached is not None:
+        logger.info(
+            "⚡ Result cache hit (job): query='%s...' category=%s",
+            request.description[:50], request.category,
+            extra={"request_id": request_id}
+        )
+        return cached
+    
+    for attempt in range(1, search_jobs.max_attempts + 1):
+        try:
+            result, _ = await run_shared_pipeline(request, request_id, cache_key, on_source=job.add_source)
+            return result
+        except (AdmissionRejected, AIServiceBusy) as e:
+            if attempt == search_jobs.max_attempts:
+                raise JobFailed(str(e), status=503, retry_after=e.retry_after)
+            logger.warning(
+                "⚠ Job %s shed (attempt %s/%s), retrying in %ss: %s",
+                job.id, attempt, search_jobs.max_attempts, e.retry_after, e,
+                extra={"request_id": request_id}
+            )
+            job.sources.clear()
+            await asyncio.sleep(e.retry_after)
+        except AIServiceTimeout as e:
+            raise JobFailed(str(e), status=504)
+
+
+search_jobs = SearchJobManager(run_search_job)
+
+
+@api_router.post("/search/jobs", status_code=202)
+async def submit_search_job(request: SearchRequestPayload, http_request: Request, response: Response):
+    """
+    Start a search in the background and return its job straight away (202).
+    Jobs are keyed by the payload's id: resubmitting the same id returns the
+    existing job (200) instead of running the search again
+    """
+    request_id = getattr(http_request.state, 'request_id', 'unknown')
+    
+    # Fail fast (as a normal HTTP error) if the AI service isn't configured
+    get_ai_service()
+    
+    try:
+        job, created = search_jobs.submit(request, request_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    if created:
+        logger.info(
+            "📨 Queued search job %s: query='%s...' category=%s priority=%s",
+            job.id, request.description[:50], request.category, request.priority,
+            extra={"request_id": request_id}
+        )
+    else:
+        logger.info(
+            "♻ Search job %s already exists (%s), not resubmitting",
+            job.id, job.status,
+            extra={"request_id": request_id}
         )
+        response.status_code = 200
+    
+    response.headers["Location"] = f"/v1/search/jobs/{job.id}"
+    return job.to_dict(search_jobs.ttl)
+
+
+@api_router.get("/search/jobs/{job_id}")
+async def get_search_job(job_id: str, response: Response):
+    """
+    Job status ("queued" | "running" | "succeeded" | "failed"), the sources
+    fetched so far, and the SearchResultPayload once it has succeeded
+    """
+    job = search_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Search job '{job_id}' not found (unknown or expired)")
+    if not job.finished:
+        response.headers["Retry-After"] = "2"
+    return job.to_dict(search_jobs.ttl)
+
+
+@api_router.get("/jobs/stats")
+async def job_stats():
+    """Search job queue depth, worker count and outcomes"""
+    return search_jobs.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the in-process metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@api_router.get("/tracing/stats")
+async def tracing_stats():
+    """Sample rate and spans started, exported and dropped"""
+    return tracer.stats()
+
+
+@api_router.get("/credibility/stats")
+async def credibility_stats():
+    """Domain reputation list in use, its size and reloads"""
+    return get_search_engine().credibility.stats()
+
+
+@api_router.get("/logging/stats")
+async def log_stats():
+    """Log format and level, and the writer queue's depth and dropped records"""
+    return logging_stats()
+
+
+@api_router.get("/language/stats")
+async def language_stats():
+    """Language detection cache, fast-path and n-gram counters"""
+    return get_language_detector().stats()
+
+
+@api_router.get("/cache/stats")
+async def cache_stats():
+    """Result and source cache hit/miss counters and memory usage, and the local source index"""
+    return {
+        "results": get_result_cache().stats(),
+        "sources": get_search_engine().source_cache.stats(),
+        "searches": get_search_engine().query_cache.stats(),
+        "localIndex": get_search_engine().local_index.stats(),
+    }
+
+
+@api_router.get("/coalescing/stats")
+async def coalescing_stats():
+    """How many callers shared an in-flight pipeline run, search call or page fetch"""
+    search_engine = get_search_engine()
+    return {
+        "pipeline": pipeline_flight.stats(),
+        "search": search_engine.search_flight.stats(),
+        "fetch": search_engine.fetch_flight.stats(),
+    }
+
+
+@api_router.get("/admission/stats")
+async def admission_stats():
+    """Pipeline slots in use, queue depth and wait times per priority"""
+    return admission.stats()
+
+
+@api_router.get("/providers/stats")
+async def provider_stats():
+    """Calls, wins, failures, failovers and hedges per search provider"""
+    search_engine = get_search_engine()
+    return {
+        "providers": [p.name for p in search_engine.providers],
+        "hedging": search_engine.hedging,
+        "hedgeDelaySeconds": search_engine.hedge_delay,
+        "stats": search_engine.provider_stats,
+    }
+
+
+@api_router.get("/hosts/health")
+async def host_health(state: Optional[str] = None, limit: int = 100):
+    """Circuit state, latency and error rate per source host, least healthy first (?state=open|half_open|slow|closed)"""
+    registry = get_search_engine().host_health
+    return {
+        **registry.stats(),
+        "hostStates": registry.hosts(state=state, limit=max(1, min(limit, 1000))),
+    }
+
+
+@api_router.get("/rate-limits/stats")
+async def rate_limit_stats():
+    """Token bucket state per search provider"""
+    return get_search_engine().rate_limiters.stats()
 
 
 @api_router.post("/search/upload-image")
@@ -0,0 +1,216 @@
+"""
+Admission Control
+Priority-aware scheduling in front of the search pipeline: bounded per-priority
+queues, weighted dequeuing, queue-time deadlines and early load shedding
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from services.tracing import tracer
+from services.deadline import current_deadline
+from services.metrics import ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("urgent", "normal", "low")
+
+DEFAULT_QUEUE_SIZES = {"urgent": 32, "normal": 64, "low": 64}
+DEFAULT_WEIGHTS = {"urgent": 6, "normal": 3, "low": 1}
+DEFAULT_DEADLINES = {"urgent": 5.0, "normal": 15.0, "low": 30.0}  # max seconds spent queued
+
+
+class AdmissionRejected(Exception):
+    """The request was shed: its queue was full or it waited past its queue deadline"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _parse_weights(spec: str) -> Dict[str, int]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in spec.split(","):
+        if "=" in item:
+            priority, weight = item.split("=", 1)
+            if priority.strip() in weights and weight.strip().isdigit():
+                weights[priority.strip()] = max(1, int(weight))
+    return weights
+
+
+class AdmissionController:
+    """
+    At most ADMISSION_MAX_CONCURRENCY pipelines run at once. Beyond that,
+    requests wait in a bounded FIFO queue for their priority. When a slot
+    frees up the next queue is chosen by smooth weighted round-robin over
+    the non-empty queues, so urgent requests jump ahead without starving
+    low-priority ones. A full queue is rejected straight away with a
+    Retry-After estimate rather than accepting work we can't finish.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+        self.weights = _parse_weights(os.getenv("ADMISSION_WEIGHTS", ""))
+        self.queue_sizes = {
+            p: int(os.getenv(f"ADMISSION_QUEUE_SIZE_{p.upper()}", str(DEFAULT_QUEUE_SIZES[p])))
+            for p in PRIORITIES
+        }
+        self.deadlines = {
+            p: float(os.getenv(f"ADMISSION_QUEUE_DEADLINE_{p.upper()}", str(DEFAULT_DEADLINES[p])))
+            for p in PRIORITIES
+        }
+
+        self.active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {p: deque() for p in PRIORITIES}
+        self._current_weights = {p: 0 for p in PRIORITIES}
+        self._service_time_ewma = 10.0  # seconds per pipeline run, refined as requests finish
+
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.rejected = {p: 0 for p in PRIORITIES}
+        self.expired = {p: 0 for p in PRIORITIES}
+        self.total_wait = {p: 0.0 for p in PRIORITIES}
+        self.max_wait = {p: 0.0 for p in PRIORITIES}
+
+    @staticmethod
+    def normalize_priority(priority: Optional[str]) -> str:
+        priority = (priority or "").lower()
+        return priority if priority in PRIORITIES else "normal"
+
+    def queue_depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    def retry_after(self) -> int:
+        """Rough seconds until a newly queued request could start"""
+        queued = sum(len(q) for q in self._queues.values())
+        estimate = self._service_time_ewma * (queued + 1) / max(1, self.max_concurrency)
+        return int(min(120, max(1, math.ceil(estimate))))
+
+    def check_capacity(self, priority: str):
+        """Raise AdmissionRejected now if acquire() would be rejected for a full queue"""
+        priority = self.normalize_priority(priority)
+        if self._has_free_slot():
+            return
+        if len(self._queues[priority]) >= self.queue_sizes[priority]:
+            self.rejected[priority] += 1
+            raise AdmissionRejected(f"Search queue for '{priority}' priority is full", self.retry_after())
+
+    def _has_free_slot(self) -> bool:
+        return self.active < self.max_concurrency and not any(self._queues.values())
+
+    async def acquire(self, priority: str) -> float:
+        """Wait for a pipeline slot; returns the admission time. Raises AdmissionRejected."""
+        priority = self.normalize_priority(priority)
+        queued_at = time.monotonic()
+
+        if self._has_free_slot():
+            self.active += 1
+            self._record_admit(priority, 0.0)
+            return queued_at
+
+        self.check_capacity(priority)
+
+        # Queue no longer than the request's own deadline leaves room for
+        timeout = self.deadlines[priority]
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = deadline.cap(timeout)
+        
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        queue.append(waiter)
+        try:
+            with tracer.span("admission.queue", priority=priority, position=len(queue)):
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # We were granted a slot at the same moment we gave up: hand it on
+                self.active -= 1
+                self._dispatch()
+            else:
+                waiter.cancel()
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.expired[priority] += 1
+            raise AdmissionRejected(
+                f"Search waited more than {timeout:.0f}s in the '{priority}' queue",
+                self.retry_after()
+            )
+
+        wait = time.monotonic() - queued_at
+        self._record_admit(priority, wait)
+        return time.monotonic()
+
+    def release(self, admitted_at: float):
+        self.active -= 1
+        service_time = time.monotonic() - admitted_at
+        self._service_time_ewma = 0.8 * self._service_time_ewma + 0.2 * service_time
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, priority: str):
+        admitted_at = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def _record_admit(self, priority: str, wait: float):
+        ADMISSION_WAIT_SECONDS.labels(priority).observe(wait)
+        self.admitted[priority] += 1
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+
+    def _next_priority(self) -> Optional[str]:
+        """Smooth weighted round-robin over the priorities that have waiters"""
+        candidates = [p for p in PRIORITIES if self._queues[p]]
+        if not candidates:
+            return None
+        total = 0
+        for p in candidates:
+            self._current_weights[p] += self.weights[p]
+            total += self.weights[p]
+        chosen = max(candidates, key=lambda p: self._current_weights[p])
+        self._current_weights[chosen] -= total
+        return chosen
+
+    def _dispatch(self):
+        while self.active < self.max_concurrency:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            waiter = self._queues[priority].popleft()
+            if waiter.done():
+                continue  # gave up while queued
+            self.active += 1
+            waiter.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "maxConcurrency": self.max_concurrency,
+            "retryAfter": self.retry_after(),
+            "priorities": {
+                p: {
+                    "queueDepth": len(self._queues[p]),
+                    "queueSize": self.queue_sizes[p],
+                    "weight": self.weights[p],
+                    "queueDeadlineSeconds": self.deadlines[p],
+                    "admitted": self.admitted[p],
+                    "rejected": self.rejected[p],
+                    "expired": self.expired[p],
+                    "avgWaitSeconds": round(self.total_wait[p] / self.admitted[p], 4) if self.admitted[p] else 0.0,
+                    "maxWaitSeconds": round(self.max_wait[p], 4),
+                }
+                for p in PRIORITIES
+            },
+        }
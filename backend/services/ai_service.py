@@ -6,9 +6,12 @@ Uses OpenAI or Anthropic to generate research summaries
 import os
 import json
 import time
+import asyncio
 import logging
-from typing import List, Dict, Optional
-from openai import OpenAI
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+from openai import AsyncOpenAI, APITimeoutError
+from openai.types import CompletionUsage
 # Alternative: from anthropic import Anthropic
 
 logger = logging.getLogger(__name__)
@@ -20,6 +23,74 @@ from models.search_models import (
     DecisionFactor, 
     SourceLink
 )
+from services.deadline import current_deadline
+from services.json_stream import IncrementalJSONParser
+from services.metrics import OPENAI_SECONDS, OPENAI_TOKENS
+from services.prompt_packing import PromptPacker, PackedSources
+from services.tracing import tracer
+
+
+# Language mapping for better prompts
+LANGUAGE_NAMES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "ru": "Russian",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "zh": "Chinese",
+    "ar": "Arabic",
+    "hi": "Hindi",
+}
+
+
+@lru_cache(maxsize=64)
+def _language_instruction(language: Optional[str]) -> str:
+    if not language or language == "en":
+        return ""
+    language_name = LANGUAGE_NAMES.get(language, "English")
+    return f"IMPORTANT: Respond entirely in {language_name}. All text (summary, steps, decision factors, recommended actions) must be in {language_name}."
+
+
+@lru_cache(maxsize=64)
+def _prompt_instructions(language: Optional[str]) -> str:
+    """The static part of the research prompt after the sources, built once per language"""
+    return f"""
+Generate a comprehensive research result with:
+1. A concise summary (2-3 sentences)
+2. 3-5 actionable steps with clear titles and descriptions
+3. 3-5 key decision factors with details
+4. Estimated time to complete (in minutes)
+5. Difficulty level (easy/medium/hard)
+6. 3-5 recommended next actions
+
+{_language_instruction(language)}
+
+Format your response as JSON matching this structure:
+{{
+  "summary": "...",
+  "steps": [{{"id": "...", "title": "...", "description": "..."}}],
+  "decisionFactors": [{{"id": "...", "label": "...", "detail": "..."}}],
+  "estimatedTimeMinutes": 10,
+  "difficulty": "easy",
+  "recommendedActions": ["..."]
+}}
+"""
+
+
+class AIServiceBusy(Exception):
+    """Raised when the completion queue is full or a slot didn't free up in time"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIServiceTimeout(Exception):
+    """Raised when a completion takes longer than OPENAI_TIMEOUT"""
 
 
 class AIService:
@@ -34,8 +105,79 @@ class AIService:
         if base_url:
             client_kwargs["base_url"] = base_url
         
-        self.client = OpenAI(**client_kwargs)
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "60.0"))
+        client_kwargs["timeout"] = self.timeout
+        
+        self.client = AsyncOpenAI(**client_kwargs)
         self.model = os.getenv("OPENAI_MODEL", "gpt-4-turbo-preview")  # or "gpt-3.5-turbo" for cheaper option
+        self.prompt_packer = PromptPacker(self.model)
+        
+        # Concurrency control: at most max_concurrency completions in flight, with a
+        # bounded FIFO queue of waiters in front of them
+        self.max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        self.max_queue = int(os.getenv("OPENAI_MAX_QUEUE", "64"))
+        self.queue_timeout = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "30.0"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+    
+    async def aclose(self):
+        """Close the underlying HTTP client (called on app shutdown)"""
+        await self.client.close()
+    
+    async def _acquire_slot(self, log_extra: Dict):
+        """Wait in the completion queue for a free slot"""
+        queue_start = time.time()
+        if not self._slots.locked():
+            # A slot is free right now, take it without queueing
+            await self._slots.acquire()
+            self._in_flight += 1
+            return
+        
+        with tracer.span("openai.queue", waiting=self._waiting, in_flight=self._in_flight):
+            if self._waiting >= self.max_queue:
+                logger.warning(
+                    "⚠ OpenAI queue full (%s waiting, %s in flight), rejecting",
+                    self._waiting, self._in_flight,
+                    extra=log_extra
+                )
+                raise AIServiceBusy("AI completion queue is full")
+            
+            # Don't queue past the request's deadline: a slot that frees up after it
+            # can't produce an answer in time anyway
+            deadline = current_deadline()
+            timeout = deadline.cap(self.queue_timeout) if deadline else self.queue_timeout
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if timeout < self.queue_timeout:
+                    raise AIServiceTimeout(f"Request deadline passed after {timeout:.1f}s in the AI completion queue")
+                raise AIServiceBusy(f"No AI completion slot freed up within {self.queue_timeout:.0f}s")
+            finally:
+                self._waiting -= 1
+        
+        self._in_flight += 1
+        queue_time = time.time() - queue_start
+        if queue_time > 0.01:
+            logger.info(
+                "⏳ OpenAI queue: waited %.3fs for a slot (%s/%s in flight)",
+                queue_time, self._in_flight, self.max_concurrency,
+                extra=log_extra
+            )
+    
+    def _release_slot(self):
+        self._in_flight -= 1
+        self._slots.release()
+    
+    def _completion_timeout(self) -> float:
+        """OPENAI_TIMEOUT, shortened to what's left of the request's deadline"""
+        deadline = current_deadline()
+        if deadline is None:
+            return self.timeout
+        if deadline.remaining() <= 0:
+            raise AIServiceTimeout("Request deadline passed before the AI completion started")
+        return deadline.cap(self.timeout)
     
     async def generate_research_result(
         self,
@@ -49,51 +191,54 @@ class AIService:
         log_extra = {"request_id": request_id} if request_id else {}
         
         # Build prompt with sources and request
-        prompt = self._build_research_prompt(request, sources)
+        with tracer.span("prompt.build", sources=len(sources)) as span:
+            prompt, packed = self._build_research_prompt(request, sources)
+            self._record_packing(span, prompt, packed)
         prompt_size = len(prompt)
         
         logger.info(
-            f"🤖 External: OpenAI API | Model: {self.model} | Prompt size: {prompt_size} chars | Sources: {len(sources)}",
+            "🤖 External: OpenAI API | Model: %s | Prompt size: %s chars | "
+            "Sources: %s/%s in %s tokens "
+            "(%s duplicate, %s truncated)",
+            self.model, prompt_size, packed.sources, len(sources), packed.tokens, packed.duplicates, packed.truncated,
             extra=log_extra
         )
         
+        # Wait for a completion slot; the slot is always released below, including
+        # when the request is cancelled because the client disconnected
+        await self._acquire_slot(log_extra)
+        try:
+            timeout = self._completion_timeout()
+        except AIServiceTimeout:
+            self._release_slot()
+            raise
         api_start = time.time()
+        outcome = "error"
+        span = tracer.start_span("openai.completion", {"model": self.model, "stream": False})
         
         try:
-            # Build system message with language context
-            language = request.language or "en"
-            system_message = "You are a research assistant that provides structured, factual research results. Always cite sources and provide actionable recommendations."
-            if language != "en":
-                system_message += f" Respond entirely in the user's language (ISO code: {language})."
-            
             # Call OpenAI API
-            response = self.client.chat.completions.create(
+            response = await asyncio.wait_for(self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_message
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self._build_messages(request, prompt),
                 temperature=0.7,
                 response_format={"type": "json_object"}  # Force JSON response
-            )
+            ), timeout=timeout)
             
             api_time = time.time() - api_start
+            outcome = "ok"
             
             # Extract usage information if available
             usage_info = ""
-            if hasattr(response, 'usage'):
+            if getattr(response, 'usage', None):
                 usage = response.usage
                 usage_info = f" | Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total"
+                self._record_usage(usage, span)
             
             logger.info(
-                f"✓ OpenAI API: Success | Time: {api_time:.3f}s{usage_info}",
-                extra=log_extra
+                "✓ OpenAI API: Success | Time: %.3fs%s",
+                api_time, usage_info,
+                extra={**log_extra, "stage": "openai", "seconds": round(api_time, 3)}
             )
             
             # Parse JSON response
@@ -102,71 +247,235 @@ class AIService:
             # Transform to SearchResultPayload
             return self._parse_ai_response(result_data, sources)
             
+        except (asyncio.TimeoutError, APITimeoutError):
+            api_time = time.time() - api_start
+            logger.error(
+                "✗ OpenAI API: Timed out after %.3fs",
+                api_time,
+                extra=log_extra
+            )
+            outcome = "timeout"
+            raise AIServiceTimeout(f"AI completion timed out after {timeout:.0f}s")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            api_time = time.time() - api_start
+            logger.warning(
+                "⚠ OpenAI API: Cancelled after %.3fs (client disconnected)",
+                api_time,
+                extra=log_extra
+            )
+            raise
         except Exception as e:
             api_time = time.time() - api_start
             logger.error(
-                f"✗ OpenAI API: Failed after {api_time:.3f}s | Error: {str(e)}",
+                "✗ OpenAI API: Failed after %.3fs | Error: %s",
+                api_time, e,
                 extra=log_extra,
                 exc_info=True
             )
             raise
+        finally:
+            OPENAI_SECONDS.labels("complete", outcome).observe(time.time() - api_start)
+            span.set_attribute("outcome", outcome)
+            span.end()
+            self._release_slot()
     
-    def _build_research_prompt(self, request: SearchRequestPayload, sources: List[Dict]) -> str:
+    def _record_usage(self, usage, span):
+        OPENAI_TOKENS.labels("prompt").inc(usage.prompt_tokens or 0)
+        OPENAI_TOKENS.labels("completion").inc(usage.completion_tokens or 0)
+        span.set_attribute("prompt_tokens", usage.prompt_tokens)
+        span.set_attribute("completion_tokens", usage.completion_tokens)
+    
+    def _record_estimated_usage(self, messages: List[Dict], completion: str, span):
+        """Count a completion's tokens locally, with the prompt packer's counter, when the API didn't report them"""
+        counter = self.prompt_packer.counter
+        prompt_tokens = sum(counter.count(m["content"]) for m in messages)
+        completion_tokens = counter.count(completion)
+        OPENAI_TOKENS.labels("prompt").inc(prompt_tokens)
+        OPENAI_TOKENS.labels("completion").inc(completion_tokens)
+        span.set_attribute("prompt_tokens", prompt_tokens)
+        span.set_attribute("completion_tokens", completion_tokens)
+        span.set_attribute("usage_estimated", True)
+    
+    async def stream_research_result(
+        self,
+        request: SearchRequestPayload,
+        sources: List[Dict],
+        request_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate the research result with a streamed completion.
+        Yields ("step", SolutionStep), ("decision_factor", DecisionFactor) and
+        ("recommended_action", str) as soon as each one is complete in the model
+        output, then ("result", SearchResultPayload) once the completion finishes.
+        """
+        log_extra = {"request_id": request_id} if request_id else {}
+        
+        # Spans here are started but never made current: a contextvar set in an
+        # async generator would leak into the consumer across each yield
+        span = tracer.start_span("prompt.build", {"sources": len(sources)})
+        prompt, packed = self._build_research_prompt(request, sources)
+        self._record_packing(span, prompt, packed)
+        span.end()
+        
+        logger.info(
+            "🤖 External: OpenAI API (streaming) | Model: %s | Prompt size: %s chars | "
+            "Sources: %s/%s in %s tokens "
+            "(%s duplicate, %s truncated)",
+            self.model, len(prompt), packed.sources, len(sources), packed.tokens, packed.duplicates, packed.truncated,
+            extra=log_extra
+        )
+        
+        await self._acquire_slot(log_extra)
+        try:
+            timeout = self._completion_timeout()
+        except AIServiceTimeout:
+            self._release_slot()
+            raise
+        api_start = time.time()
+        deadline = api_start + timeout
+        first_token_time = None
+        stream = None
+        outcome = "error"
+        usage_reported = False
+        messages = self._build_messages(request, prompt)
+        parser = IncrementalJSONParser(["steps", "decisionFactors", "recommendedActions"])
+        span = tracer.start_span("openai.completion", {"model": self.model, "stream": True})
+        
+        try:
+            stream = await asyncio.wait_for(self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                response_format={"type": "json_object"},
+                stream=True,
+                # Ask for a final usage chunk (openai==1.10 has no stream_options argument yet)
+                extra_body={"stream_options": {"include_usage": True}}
+            ), timeout=timeout)
+            
+            counts = {"steps": 0, "decisionFactors": 0, "recommendedActions": 0}
+            chunks = stream.__aiter__()
+            while True:
+                # Bound the whole completion, not just the time between chunks
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - time.time()))
+                except StopAsyncIteration:
+                    break
+                
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    # openai==1.10's chunk model has no usage field, so it comes through as a plain dict
+                    self._record_usage(CompletionUsage(**usage) if isinstance(usage, dict) else usage, span)
+                    usage_reported = True
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - api_start
+                    span.set_attribute("first_token_ms", round(first_token_time * 1000, 1))
+                
+                for key, value in parser.feed(chunk.choices[0].delta.content):
+                    index = counts[key]
+                    counts[key] += 1
+                    if key == "steps" and isinstance(value, dict):
+                        yield "step", self._parse_step(index, value)
+                    elif key == "decisionFactors" and isinstance(value, dict):
+                        yield "decision_factor", self._parse_factor(index, value)
+                    elif key == "recommendedActions" and isinstance(value, str):
+                        yield "recommended_action", value
+            
+            api_time = time.time() - api_start
+            outcome = "ok"
+            OPENAI_SECONDS.labels("stream", outcome).observe(api_time)
+            logger.info(
+                "✓ OpenAI API (streaming): Success | First token: %.3fs | "
+                "Time: %.3fs | Output: %s chars",
+                first_token_time or 0, api_time, len(parser.text),
+                extra={**log_extra, "stage": "openai", "seconds": round(api_time, 3), "first_token_seconds": round(first_token_time or 0, 3)}
+            )
+            
+            yield "result", self._parse_ai_response(json.loads(parser.text), sources)
+            
+        except (asyncio.TimeoutError, APITimeoutError):
+            api_time = time.time() - api_start
+            logger.error(
+                "✗ OpenAI API (streaming): Timed out after %.3fs",
+                api_time,
+                extra=log_extra
+            )
+            outcome = "timeout"
+            raise AIServiceTimeout(f"AI completion timed out after {timeout:.0f}s")
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            api_time = time.time() - api_start
+            logger.warning(
+                "⚠ OpenAI API (streaming): Cancelled after %.3fs (client disconnected)",
+                api_time,
+                extra=log_extra
+            )
+            raise
+        except Exception as e:
+            api_time = time.time() - api_start
+            logger.error(
+                "✗ OpenAI API (streaming): Failed after %.3fs | Error: %s",
+                api_time, e,
+                extra=log_extra,
+                exc_info=True
+            )
+            raise
+        finally:
+            if outcome != "ok":
+                OPENAI_SECONDS.labels("stream", outcome).observe(time.time() - api_start)
+            if stream is not None and not usage_reported:
+                # No usage chunk (the endpoint ignores include_usage, or we stopped reading early)
+                self._record_estimated_usage(messages, parser.text, span)
+            span.set_attribute("outcome", outcome)
+            span.end()
+            self._release_slot()
+            if stream is not None:
+                # Drop the upstream connection if we stopped reading early
+                await stream.close()
+    
+    def _record_packing(self, span, prompt: str, packed: PackedSources):
+        span.set_attribute("chars", len(prompt))
+        span.set_attribute("source_tokens", packed.tokens)
+        span.set_attribute("packed_sources", packed.sources)
+        span.set_attribute("duplicates", packed.duplicates)
+        span.set_attribute("truncated", packed.truncated)
+    
+    def _build_messages(self, request: SearchRequestPayload, prompt: str) -> List[Dict]:
+        """System + user messages for a research completion"""
+        # Build system message with language context
+        language = request.language or "en"
+        system_message = "You are a research assistant that provides structured, factual research results. Always cite sources and provide actionable recommendations."
+        if language != "en":
+            system_message += f" Respond entirely in the user's language (ISO code: {language})."
+        
+        return [
+            {
+                "role": "system",
+                "content": system_message
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def _build_research_prompt(self, request: SearchRequestPayload, sources: List[Dict]) -> Tuple[str, PackedSources]:
         """Build the prompt for AI research generation"""
-        sources_text = "\n".join([
-            f"- {s['title']}: {s['snippet']} ({s['url']})"
-            for s in sources[:10]  # Limit to top 10 sources
-        ])
-        
-        # Language mapping for better prompts
-        language_names = {
-            "en": "English",
-            "es": "Spanish",
-            "fr": "French",
-            "de": "German",
-            "it": "Italian",
-            "pt": "Portuguese",
-            "ru": "Russian",
-            "ja": "Japanese",
-            "ko": "Korean",
-            "zh": "Chinese",
-            "ar": "Arabic",
-            "hi": "Hindi",
-        }
-        
-        language_name = language_names.get(request.language or "en", "English")
-        language_instruction = f"IMPORTANT: Respond entirely in {language_name}. All text (summary, steps, decision factors, recommended actions) must be in {language_name}." if request.language and request.language != "en" else ""
+        # Sources are packed into a token budget instead of joining the top 10 whole
+        packed = self.prompt_packer.pack(request.description, sources)
         
         prompt = f"""
 Research Request: {request.description}
 Category: {request.category}
 Priority: {request.priority}
-{language_instruction}
+{_language_instruction(request.language)}
 
 Available Sources:
-{sources_text}
-
-Generate a comprehensive research result with:
-1. A concise summary (2-3 sentences)
-2. 3-5 actionable steps with clear titles and descriptions
-3. 3-5 key decision factors with details
-4. Estimated time to complete (in minutes)
-5. Difficulty level (easy/medium/hard)
-6. 3-5 recommended next actions
-
-{language_instruction}
-
-Format your response as JSON matching this structure:
-{{
-  "summary": "...",
-  "steps": [{{"id": "...", "title": "...", "description": "..."}}],
-  "decisionFactors": [{{"id": "...", "label": "...", "detail": "..."}}],
-  "estimatedTimeMinutes": 10,
-  "difficulty": "easy",
-  "recommendedActions": ["..."]
-}}
-"""
-        return prompt
+{packed.text}
+{_prompt_instructions(request.language)}"""
+        return prompt, packed
     
     def _parse_ai_response(self, data: Dict, sources: List[Dict]) -> SearchResultPayload:
         """Parse AI response and combine with source data"""
@@ -184,24 +493,10 @@ Format your response as JSON matching this structure:
         ]
         
         # Parse steps
-        steps = [
-            SolutionStep(
-                id=f"step-{i}",
-                title=step.get("title", ""),
-                description=step.get("description", "")
-            )
-            for i, step in enumerate(data.get("steps", []))
-        ]
+        steps = [self._parse_step(i, step) for i, step in enumerate(data.get("steps", []))]
         
         # Parse decision factors
-        factors = [
-            DecisionFactor(
-                id=f"factor-{i}",
-                label=factor.get("label", ""),
-                detail=factor.get("detail", "")
-            )
-            for i, factor in enumerate(data.get("decisionFactors", []))
-        ]
+        factors = [self._parse_factor(i, factor) for i, factor in enumerate(data.get("decisionFactors", []))]
         
         return SearchResultPayload(
             summary=data.get("summary", ""),
@@ -212,4 +507,17 @@ Format your response as JSON matching this structure:
             difficulty=data.get("difficulty", "medium"),
             recommendedActions=data.get("recommendedActions", [])
         )
-
+    
+    def _parse_step(self, index: int, step: Dict) -> SolutionStep:
+        return SolutionStep(
+            id=f"step-{index}",
+            title=step.get("title", ""),
+            description=step.get("description", "")
+        )
+    
+    def _parse_factor(self, index: int, factor: Dict) -> DecisionFactor:
+        return DecisionFactor(
+            id=f"factor-{index}",
+            label=factor.get("label", ""),
+            detail=factor.get("detail", "")
+        )
@@ -0,0 +1,66 @@
+"""
+Batch-scoped memoization
+Every item of a /v1/search/batch run shares one memo, so a URL or search query
+that several items need is fetched/searched once for the whole batch
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_current_batch: ContextVar[Optional["BatchMemo"]] = ContextVar("current_batch", default=None)
+
+
+def current_batch() -> Optional["BatchMemo"]:
+    """The memo of the batch this task belongs to, or None outside a batch"""
+    return _current_batch.get()
+
+
+class BatchMemo:
+    """
+    Completed results keyed by (namespace, key), kept for the lifetime of
+    one batch. In-flight duplicates are already coalesced by SingleFlight;
+    the memo covers the items that ask for the same thing later, after the
+    shared call has finished and regardless of whether the caches kept it.
+
+    Tasks created inside activate() inherit the memo through their context,
+    so the batch items (and the pipeline tasks they start) see it without
+    it being threaded through every call.
+    """
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, Hashable], Any] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @contextmanager
+    def activate(self):
+        token = _current_batch.set(self)
+        try:
+            yield self
+        finally:
+            _current_batch.reset(token)
+
+    async def do(
+        self,
+        namespace: str,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        keep: Callable[[Any], bool] = lambda result: True
+    ) -> Any:
+        """Return the memoized result for key, or await fn() and remember it if keep(result)"""
+        entry = (namespace, key)
+        if entry in self._results:
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+            return self._results[entry]
+        self.misses[namespace] = self.misses.get(namespace, 0) + 1
+        result = await fn()
+        if keep(result):
+            self._results[entry] = result
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            namespace: {"hits": self.hits.get(namespace, 0), "misses": self.misses.get(namespace, 0)}
+            for namespace in sorted(set(self.hits) | set(self.misses))
+        }
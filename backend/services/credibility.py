@@ -0,0 +1,342 @@
+"""
+Credibility
+Domain reputation scoring from a suffix list (domains and TLDs -> 0-100 score),
+held in a flat hash table keyed by hashes of the reversed suffix, so a lookup
+is one pass over the reversed host extending a running hash label by label
+
+List files are plain text, one "<domain or TLD> <score>" per line (# comments
+allowed), or a compiled table that is memory-mapped instead of parsed:
+    python -m services.credibility compile big_list.tsv big_list.bin
+    python -m services.credibility score https://en.wikipedia.org/wiki/X [list]
+"""
+
+import os
+import sys
+import mmap
+import time
+import zlib
+import array
+import struct
+import logging
+import ipaddress
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "credibility.tsv")
+
+_MAGIC = b"SBCRED01"
+_HEADER = struct.Struct("<8sIIB7x")  # magic, capacity, count, default score -> 24 bytes, keys stay 8-aligned
+
+# Second-level public suffixes common in search results: the registrable
+# domain is one label to the left of these (bbc.co.uk, not co.uk)
+PUBLIC_SUFFIXES = frozenset("""
+co.uk org.uk ac.uk gov.uk me.uk ltd.uk plc.uk net.uk nhs.uk
+com.au net.au org.au edu.au gov.au asn.au id.au
+co.nz org.nz govt.nz ac.nz net.nz
+co.jp ne.jp or.jp ac.jp go.jp gr.jp
+co.kr or.kr ac.kr go.kr ne.kr
+com.br net.br org.br gov.br edu.br
+com.cn net.cn org.cn gov.cn edu.cn ac.cn
+com.mx org.mx gob.mx edu.mx
+co.in net.in org.in gov.in ac.in edu.in
+com.tr org.tr gov.tr edu.tr
+com.sg edu.sg gov.sg com.hk edu.hk gov.hk com.tw edu.tw gov.tw
+co.za org.za gov.za ac.za com.ar gob.ar com.co gov.co
+com.ua org.ua gov.ua edu.ua com.ru org.ru
+github.io gitlab.io blogspot.com wordpress.com herokuapp.com netlify.app vercel.app
+pages.dev web.app firebaseapp.com azurewebsites.net cloudfront.net appspot.com
+substack.com medium.com tumblr.com
+""".split())
+
+
+def parse_host(url: str) -> Optional[str]:
+    """Lowercased host of url without port, userinfo or trailing dot; IDNs in punycode"""
+    try:
+        host = urlsplit(url if "//" in url else f"//{url}").hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(".")
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    return host or None
+
+
+def is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def registrable_domain(host: str) -> str:
+    """The domain a registrant controls: example.com for a.b.example.com, bbc.co.uk for www.bbc.co.uk"""
+    if is_ip(host):
+        return host
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in PUBLIC_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def suffix_hash(suffix: str) -> int:
+    """
+    64-bit key of a suffix: Adler-32 and CRC-32 of the suffix reversed. Both
+    can be extended with more input, which is what lets a lookup hash every
+    suffix of a host in one pass ("gro", then "gro.aidepikiw", ...)
+    """
+    data = suffix[::-1].encode("ascii")
+    # CRC-32 in the low half picks the slot (Adler-32's low bits barely vary
+    # across short strings); Adler-32 is never 0, so neither is the key, and 0 marks an empty slot
+    return zlib.adler32(data) << 32 | zlib.crc32(data)
+
+
+class SuffixTable:
+    """
+    Open-addressing hash table of suffix keys -> scores in two flat arrays
+    (uint64 keys, uint8 scores). Keys are 64-bit hashes, not strings: ~18
+    bytes per entry at the 0.5 load factor, and the same bytes can be written
+    to disk and memory-mapped. A 64-bit collision between a host suffix and an
+    unrelated listed one is vanishingly unlikely even for million-entry lists.
+    """
+
+    def __init__(self, keys, scores, count: int, default_score: int, source: str, backing=None):
+        self.keys = keys
+        self.scores = scores
+        self.capacity = len(keys)
+        self.mask = self.capacity - 1
+        self.count = count
+        self.default_score = default_score
+        self.source = source
+        self._backing = backing  # keeps an mmap alive
+        # Search results keep coming back to the same hosts; lives and dies with the table
+        self.host_scores: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, int]], default_score: int = 50, source: str = "") -> "SuffixTable":
+        entries = dict(entries)
+        capacity = 8
+        while capacity < len(entries) * 2:
+            capacity *= 2
+        keys = array.array("Q", bytes(8 * capacity))
+        scores = array.array("B", bytes(capacity))
+        mask = capacity - 1
+        for suffix, score in entries.items():
+            h = suffix_hash(suffix)
+            slot = h & mask
+            while keys[slot] and keys[slot] != h:
+                slot = (slot + 1) & mask
+            keys[slot] = h
+            scores[slot] = score
+        return cls(keys, scores, len(entries), default_score, source)
+
+    @classmethod
+    def load(cls, path: str, default_score: int = 50) -> "SuffixTable":
+        """A compiled table (memory-mapped) or a text list (parsed)"""
+        with open(path, "rb") as f:
+            is_compiled = f.read(len(_MAGIC)) == _MAGIC
+        if is_compiled:
+            return cls._load_compiled(path)
+        return cls.build(read_list(path), default_score, source=path)
+
+    @classmethod
+    def _load_compiled(cls, path: str) -> "SuffixTable":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, capacity, count, default_score = _HEADER.unpack_from(mapped, 0)
+        start = _HEADER.size
+        view = memoryview(mapped)
+        if sys.byteorder == "little":
+            keys = view[start:start + 8 * capacity].cast("Q")
+        else:
+            keys = array.array("Q", view[start:start + 8 * capacity].tobytes())
+            keys.byteswap()
+        scores = view[start + 8 * capacity:start + 9 * capacity]
+        return cls(keys, scores, count, default_score, path, backing=mapped)
+
+    def save(self, path: str):
+        keys = array.array("Q", self.keys)
+        if sys.byteorder != "little":
+            keys.byteswap()
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.capacity, self.count, self.default_score))
+            f.write(keys.tobytes())
+            f.write(bytes(self.scores))
+
+    def match(self, host: str) -> Optional[Tuple[int, int]]:
+        """(score, matched suffix length) of the longest listed whole-label suffix of host, in one pass"""
+        reversed_host = host[::-1].encode("ascii")
+        keys = self.keys
+        mask = self.mask
+        best = None
+        crc, adler = 0, 1
+        start = 0
+        end = -1
+        while end < len(reversed_host):
+            end = reversed_host.find(b".", end + 1)
+            if end < 0:
+                end = len(reversed_host)
+            chunk = reversed_host[start:end]
+            crc = zlib.crc32(chunk, crc)
+            adler = zlib.adler32(chunk, adler)
+            start = end
+            h = adler << 32 | crc
+            slot = h & mask
+            while True:
+                key = keys[slot]
+                if key == h:
+                    best = (self.scores[slot], end)
+                    break
+                if not key:
+                    break
+                slot = (slot + 1) & mask
+        return best
+
+
+def read_list(path: str) -> Dict[str, int]:
+    """Parse "<suffix> <score>" lines; bad lines are logged and skipped"""
+    entries: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.replace(",", " ").split()
+            try:
+                suffix, score = parts[0], int(parts[1])
+            except (IndexError, ValueError):
+                logger.warning("⚠ Credibility list %s:%s: expected '<domain> <score>', got %r", path, number, line[:60])
+                continue
+            suffix = suffix.strip(".").lower()
+            if not suffix.isascii():
+                suffix = suffix.encode("idna").decode("ascii")
+            entries[suffix] = max(0, min(100, score))
+    return entries
+
+
+class CredibilityEngine:
+    """
+    Scores a URL by the most specific listed suffix of its host, matched on
+    whole labels only (wikipedia.org matches en.wikipedia.org, never
+    notwikipedia.org or wikipedia.org.evil.xyz), falling back to
+    CREDIBILITY_DEFAULT_SCORE. IP-literal hosts get CREDIBILITY_IP_SCORE.
+
+    The list file is checked for changes at most every
+    CREDIBILITY_RELOAD_INTERVAL seconds during lookups; a changed file is
+    loaded in a background thread and swapped in whole, so lookups never
+    wait on a reload or see a half-built table.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CREDIBILITY_LIST", DEFAULT_LIST)
+        self.default_score = int(os.getenv("CREDIBILITY_DEFAULT_SCORE", "50"))
+        self.ip_score = int(os.getenv("CREDIBILITY_IP_SCORE", "35"))
+        self.reload_interval = float(os.getenv("CREDIBILITY_RELOAD_INTERVAL", "30"))
+        self.host_cache_size = int(os.getenv("CREDIBILITY_HOST_CACHE_SIZE", "10000"))
+
+        self.table = SuffixTable.build({}, self.default_score, source="(empty)")
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._reloading = False
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_load_seconds = 0.0
+        self._load()
+
+    def _load(self, mtime: Optional[int] = None):
+        start = time.perf_counter()
+        try:
+            if mtime is None:
+                mtime = os.stat(self.path).st_mtime_ns
+            table = SuffixTable.load(self.path, self.default_score)
+        except (OSError, ValueError, struct.error) as e:
+            self.reload_errors += 1
+            logger.warning("⚠ Credibility list %s not loaded (%s), keeping %s entries", self.path, e, self.table.count)
+            return
+        finally:
+            self._reloading = False
+        self.table = table
+        self._mtime = mtime
+        self.reloads += 1
+        self.last_load_seconds = time.perf_counter() - start
+        logger.info("🛡 Credibility list loaded: %s entries from %s in %.3fs", table.count, self.path, self.last_load_seconds)
+
+    def _check_reload(self):
+        now = time.monotonic()
+        if now < self._next_check or self._reloading:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._reloading = True
+            threading.Thread(target=self._load, args=(mtime,), daemon=True).start()
+
+    def score_host(self, host: Optional[str]) -> int:
+        if not host:
+            return self.default_score
+        table = self.table
+        score = table.host_scores.get(host)
+        if score is not None:
+            return score
+        if (host[-1].isdigit() or ":" in host) and is_ip(host):
+            score = self.ip_score
+        else:
+            match = table.match(host)
+            score = match[0] if match is not None else self.default_score
+        if len(table.host_scores) >= self.host_cache_size:
+            table.host_scores.clear()
+        table.host_scores[host] = score
+        return score
+
+    def score(self, url: str) -> int:
+        self._check_reload()
+        return self.score_host(parse_host(url))
+
+    def explain(self, url: str) -> Dict:
+        host = parse_host(url)
+        match = self.table.match(host) if host and not is_ip(host) else None
+        return {
+            "host": host,
+            "registrableDomain": registrable_domain(host) if host else None,
+            "matchedSuffix": host[len(host) - match[1]:] if match else None,
+            "score": self.score_host(host),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "source": self.table.source,
+            "entries": self.table.count,
+            "capacity": self.table.capacity,
+            "cachedHosts": len(self.table.host_scores),
+            "defaultScore": self.default_score,
+            "reloads": self.reloads,
+            "reloadErrors": self.reload_errors,
+            "lastLoadSeconds": round(self.last_load_seconds, 4),
+        }
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "compile":
+        table = SuffixTable.build(read_list(argv[1]), int(os.getenv("CREDIBILITY_DEFAULT_SCORE", "50")))
+        table.save(argv[2])
+        print(f"{table.count} entries -> {argv[2]} ({os.path.getsize(argv[2])} bytes)")
+    elif len(argv) >= 2 and argv[0] == "score":
+        engine = CredibilityEngine(argv[2] if len(argv) > 2 else None)
+        print(engine.explain(argv[1]))
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
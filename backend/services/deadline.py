@@ -0,0 +1,117 @@
+"""
+Request Deadlines
+A time budget per search request, carried in a context variable so admission,
+web search, page fetching and the AI completion each bound their waits by
+what's left of it instead of by their own fixed timeouts
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "x-request-deadline"
+
+DEFAULT_BUDGETS = {"urgent": 20.0, "normal": 30.0, "low": 60.0}  # seconds per request
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Optional["Deadline"]:
+    """The deadline of the request this task is working for, or None (no budget: background jobs)"""
+    return _current_deadline.get()
+
+
+class Deadline:
+    """
+    A request's budget, split in two: gathering sources (search plus page
+    fetches) may use up to gather_share of it, counted from the start of the
+    request, and the AI completion gets whatever is left. Stages that stop
+    early to stay within it record why in `degraded`.
+    """
+
+    def __init__(self, budget: float, gather_share: float, source: str = "priority"):
+        self.budget = budget
+        self.source = source
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget
+        self.gather_expires_at = self.started + budget * gather_share
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def gather_remaining(self) -> float:
+        return max(0.0, self.gather_expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def cap(self, timeout: Optional[float]) -> float:
+        """timeout shortened to what's left of the budget"""
+        return self.remaining() if timeout is None else min(timeout, self.remaining())
+
+    def mark_degraded(self, reason: str):
+        if reason not in self.degraded:
+            self.degraded.append(reason)
+
+    @contextmanager
+    def activate(self):
+        token = _current_deadline.set(self)
+        try:
+            yield self
+        finally:
+            _current_deadline.reset(token)
+
+    def to_dict(self) -> Dict:
+        return {
+            "budget": self.budget,
+            "source": self.source,
+            "elapsed": round(self.elapsed(), 3),
+            "degraded": list(self.degraded),
+        }
+
+
+class DeadlinePolicy:
+    """
+    Budgets per priority (DEADLINE_URGENT / _NORMAL / _LOW seconds). A client
+    can ask for a different budget with an X-Request-Deadline header
+    (seconds), clamped to DEADLINE_MIN..DEADLINE_MAX. DEADLINE_ENABLED=false
+    turns budgets off, leaving each stage with its own timeouts.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("DEADLINE_ENABLED", "true").lower() == "true"
+        self.budgets = {
+            p: float(os.getenv(f"DEADLINE_{p.upper()}", str(DEFAULT_BUDGETS[p])))
+            for p in DEFAULT_BUDGETS
+        }
+        self.gather_share = min(0.9, max(0.1, float(os.getenv("DEADLINE_GATHER_SHARE", "0.4"))))
+        self.min_budget = float(os.getenv("DEADLINE_MIN", "2.0"))
+        self.max_budget = float(os.getenv("DEADLINE_MAX", "120.0"))
+
+    def for_request(self, priority: Optional[str], header: Optional[str] = None) -> Optional[Deadline]:
+        if not self.enabled:
+            return None
+        if header:
+            try:
+                budget = min(self.max_budget, max(self.min_budget, float(header)))
+                return Deadline(budget, self.gather_share, source="header")
+            except ValueError:
+                logger.warning("⚠ Ignoring invalid %s header: %r", DEADLINE_HEADER, header[:40])
+        budget = self.budgets.get((priority or "").lower(), self.budgets["normal"])
+        return Deadline(budget, self.gather_share)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """deadline.activate(), or nothing when deadlines are off (deadline is None)"""
+    if deadline is None:
+        yield None
+        return
+    with deadline.activate():
+        yield deadline
@@ -0,0 +1,38 @@
+"""
+Fast JSON
+Response encoding that skips re-validation: pydantic models are serialized by
+their compiled serializer, plain dicts by orjson when it's installed, and
+already-serialized payloads (cached results) are spliced in as-is
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # optional: faster encoding of plain dicts (batch lines, SSE events); stdlib json without it
+
+
+class RawJSON(bytes):
+    """Bytes that are already valid JSON, written into the output unchanged by dump_json()"""
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(obj: Any) -> bytes:
+    """obj as compact UTF-8 JSON (non-ASCII unescaped). Values of a top-level dict may be RawJSON."""
+    if isinstance(obj, RawJSON):
+        return bytes(obj)
+    if hasattr(obj, "__pydantic_serializer__"):
+        # The model was validated when it was built; serialize it without a second pass
+        return obj.__pydantic_serializer__.to_json(obj)
+    if isinstance(obj, dict) and any(isinstance(value, RawJSON) for value in obj.values()):
+        return b"{" + b",".join(dump_json(str(key)) + b":" + dump_json(value) for key, value in obj.items()) + b"}"
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
@@ -0,0 +1,216 @@
+"""
+Host Health
+Per-host record of source fetch outcomes (EWMA latency and error rate, last
+failure) driving a circuit breaker, so hosts that keep timing out or blocking
+us stop costing every request a full FETCH_TIMEOUT
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Decisions returned by HostHealthRegistry.admit()
+CLOSED = "closed"        # healthy: fetch with the normal timeout
+SLOW = "slow"            # healthy but slow: fetch with the short timeout
+OPEN = "open"            # failing: don't fetch
+HALF_OPEN = "half_open"  # cooldown over: one fetch (the probe) decides whether it closes again
+
+# A probe whose outcome never came back (its fetch was cancelled) stops blocking the next one after this
+PROBE_STALE_SECONDS = 30.0
+
+
+class HostHealth:
+    """Fetch statistics and circuit state of one host"""
+
+    __slots__ = (
+        "host", "state", "samples", "latency", "error_rate", "failures", "consecutive_failures",
+        "last_failure", "last_failure_reason", "opened", "open_until", "probing_since", "skipped",
+    )
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.samples = 0
+        self.latency = 0.0      # EWMA, seconds
+        self.error_rate = 0.0   # EWMA of 0 (ok) / 1 (failed)
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_failure: Optional[float] = None  # time.monotonic()
+        self.last_failure_reason: Optional[str] = None
+        self.opened = 0         # times opened since it last closed; sets the cooldown
+        self.open_until = 0.0
+        self.probing_since: Optional[float] = None
+        self.skipped = 0
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "host": self.host,
+            "state": self.state,
+            "samples": self.samples,
+            "latencyEwma": round(self.latency, 3),
+            "errorRateEwma": round(self.error_rate, 3),
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "secondsSinceFailure": round(now - self.last_failure, 1) if self.last_failure is not None else None,
+            "lastFailureReason": self.last_failure_reason,
+            "reopensIn": round(max(0.0, self.open_until - now), 1) if self.state == OPEN else None,
+            "skipped": self.skipped,
+        }
+
+
+class HostHealthRegistry:
+    """
+    Every fetch that reaches the network reports its latency and whether the
+    host failed (timeout, connection error, 403/429 or 5xx - a 404 is the URL's
+    fault, not the host's). A host whose error-rate EWMA reaches
+    HOST_HEALTH_FAILURE_RATE after HOST_HEALTH_MIN_SAMPLES fetches is opened:
+    its pages are skipped for HOST_HEALTH_OPEN_SECONDS, doubling each time it
+    re-opens (up to HOST_HEALTH_MAX_OPEN_SECONDS). When the cooldown ends the
+    next fetch of that host is let through as a probe with the short timeout;
+    success closes the circuit, failure opens it again. Hosts whose latency
+    EWMA is above HOST_HEALTH_SLOW_SECONDS are fetched with the short timeout.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("HOST_HEALTH_ENABLED", "true").lower() == "true"
+        self.alpha = float(os.getenv("HOST_HEALTH_ALPHA", "0.3"))
+        self.min_samples = int(os.getenv("HOST_HEALTH_MIN_SAMPLES", "3"))
+        self.failure_rate = float(os.getenv("HOST_HEALTH_FAILURE_RATE", "0.5"))
+        self.slow_seconds = float(os.getenv("HOST_HEALTH_SLOW_SECONDS", "2.0"))
+        self.short_timeout = float(os.getenv("HOST_HEALTH_SHORT_TIMEOUT", "2.0"))
+        self.open_seconds = float(os.getenv("HOST_HEALTH_OPEN_SECONDS", "30"))
+        self.max_open_seconds = float(os.getenv("HOST_HEALTH_MAX_OPEN_SECONDS", "600"))
+        self.max_hosts = int(os.getenv("HOST_HEALTH_MAX_HOSTS", "10000"))
+
+        self._hosts: "OrderedDict[str, HostHealth]" = OrderedDict()
+        self.skipped = 0
+        self.short_timeouts = 0
+        self.probes = 0
+        self.opens = 0
+        self.recoveries = 0
+
+    def admit(self, host: str) -> str:
+        """How to fetch a page on host now: CLOSED, SLOW, HALF_OPEN (a probe) or OPEN (skip it)"""
+        if not self.enabled:
+            return CLOSED
+        health = self._hosts.get(host)
+        if health is None:
+            return CLOSED
+
+        now = time.monotonic()
+        if health.state == CLOSED:
+            if self._is_slow(health):
+                self.short_timeouts += 1
+                return SLOW
+            return CLOSED
+
+        if health.state == OPEN and now >= health.open_until:
+            health.state = HALF_OPEN
+        if health.state == HALF_OPEN and (
+            health.probing_since is None or now - health.probing_since > PROBE_STALE_SECONDS
+        ):
+            health.probing_since = now
+            self.probes += 1
+            return HALF_OPEN
+
+        # Open, or half-open with a probe already out
+        health.skipped += 1
+        self.skipped += 1
+        return OPEN
+
+    def record(self, host: str, seconds: float, failure: Optional[str] = None):
+        """Outcome of one fetch of host: failure is None on success, else a short reason"""
+        if not self.enabled:
+            return
+        health = self._hosts.get(host)
+        if health is None:
+            health = HostHealth(host)
+            self._hosts[host] = health
+            if len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+
+        now = time.monotonic()
+        health.latency = seconds if health.samples == 0 else (1 - self.alpha) * health.latency + self.alpha * seconds
+        health.error_rate = (1 - self.alpha) * health.error_rate + (self.alpha if failure else 0.0)
+        health.samples += 1
+        if failure:
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_failure = now
+            health.last_failure_reason = failure
+        else:
+            health.consecutive_failures = 0
+
+        if health.state == HALF_OPEN:
+            health.probing_since = None
+            if failure:
+                self._open(health, now)
+            else:
+                health.state = CLOSED
+                health.opened = 0
+                health.error_rate = 0.0
+                self.recoveries += 1
+                logger.info("✓ Host circuit closed: %s answered the probe in %.3fs", host, seconds)
+        elif (
+            health.state == CLOSED and failure
+            and health.samples >= self.min_samples and health.error_rate >= self.failure_rate
+        ):
+            self._open(health, now)
+
+    def _open(self, health: HostHealth, now: float):
+        cooldown = min(self.max_open_seconds, self.open_seconds * 2 ** health.opened)
+        health.state = OPEN
+        health.opened += 1
+        health.open_until = now + cooldown
+        self.opens += 1
+        logger.warning(
+            "⚠ Host circuit opened: %s (%s, "
+            "error rate %.2f), skipping it for %.0fs",
+            health.host, health.last_failure_reason, health.error_rate, cooldown
+        )
+
+    def _is_slow(self, health: HostHealth) -> bool:
+        return health.samples >= self.min_samples and health.latency >= self.slow_seconds
+
+    def _state(self, health: HostHealth) -> str:
+        return SLOW if health.state == CLOSED and self._is_slow(health) else health.state
+
+    def open_hosts(self) -> int:
+        return sum(1 for health in self._hosts.values() if health.state != CLOSED)
+
+    def hosts(self, state: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Tracked hosts, least healthy first; state filters to closed / slow / open / half_open"""
+        now = time.monotonic()
+        selected = []
+        for health in self._hosts.values():
+            current = self._state(health)
+            if state is None or state == current:
+                selected.append((current, health))
+        selected.sort(key=lambda item: (item[0] == CLOSED, item[0] == SLOW, -item[1].error_rate, -item[1].latency))
+        entries = []
+        for current, health in selected[:limit]:
+            entry = health.to_dict(now)
+            entry["state"] = current
+            entries.append(entry)
+        return entries
+
+    def stats(self) -> Dict:
+        states = {CLOSED: 0, SLOW: 0, OPEN: 0, HALF_OPEN: 0}
+        for health in self._hosts.values():
+            states[self._state(health)] += 1
+        return {
+            "enabled": self.enabled,
+            "hosts": len(self._hosts),
+            "states": {"closed": states[CLOSED], "slow": states[SLOW], "open": states[OPEN], "halfOpen": states[HALF_OPEN]},
+            "skipped": self.skipped,
+            "shortTimeouts": self.short_timeouts,
+            "probes": self.probes,
+            "opens": self.opens,
+            "recoveries": self.recoveries,
+        }
@@ -0,0 +1,164 @@
+"""
+Streaming page extraction
+Pulls <title>, meta description and the first <p> out of a page while it
+downloads, and stops as soon as they're known instead of parsing the whole body
+"""
+
+import re
+import codecs
+from html.parser import HTMLParser
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+PRESCAN_BYTES = 1024  # how far into the body to look for <meta charset>, as browsers do
+FIRST_PARAGRAPH_CHARS = 200
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-:.]+)""", re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r"""charset\s*=\s*["']?([a-zA-Z0-9_\-:.]+)""", re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _valid_encoding(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().strip("\"'")).name
+    except LookupError:
+        return None
+
+
+def detect_encoding(content_type: Optional[str], head: bytes) -> str:
+    """
+    Charset from (in order) a byte-order mark, the Content-Type header,
+    <meta charset> / http-equiv in the first PRESCAN_BYTES, else UTF-8
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    if content_type:
+        match = _HEADER_CHARSET_RE.search(content_type)
+        encoding = _valid_encoding(match.group(1) if match else None)
+        if encoding:
+            return encoding
+    match = _META_CHARSET_RE.search(head[:PRESCAN_BYTES])
+    encoding = _valid_encoding(match.group(1).decode("ascii", "ignore") if match else None)
+    return encoding or "utf-8"
+
+
+class _FieldParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title_parts = []
+        self.in_title = False
+        self.title_done = False
+        self.meta_description: Optional[str] = None
+        self.paragraph_parts = []
+        self.paragraph_chars = 0
+        self.paragraph_depth = 0
+        self.paragraph_done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self.title_done:
+            self.in_title = True
+        elif tag == "meta" and self.meta_description is None:
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() == "description":
+                self.meta_description = attrs.get("content") or ""
+        elif tag == "p" and not self.paragraph_done:
+            self.paragraph_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self.in_title:
+            self.in_title = False
+            self.title_done = True
+        elif tag == "p" and self.paragraph_depth:
+            self.paragraph_depth -= 1
+            if self.paragraph_depth == 0:
+                self.paragraph_done = True
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title_parts.append(data)
+        elif self.paragraph_depth and not self.paragraph_done:
+            self.paragraph_parts.append(data)
+            self.paragraph_chars += len(data)
+            if self.paragraph_chars >= FIRST_PARAGRAPH_CHARS:
+                # Only the first 200 characters are ever used
+                self.paragraph_done = True
+
+
+class PageInfoExtractor:
+    """
+    Incremental extractor: feed() raw body bytes as they arrive until it
+    returns True (everything needed has been seen), then read result().
+    Decoding is incremental too, so multi-byte characters split across
+    chunks are handled.
+    """
+
+    def __init__(self, content_type: Optional[str] = None):
+        self.content_type = content_type
+        self.encoding: Optional[str] = None
+        self.bytes_fed = 0
+        self._pending = b""
+        self._decoder = None
+        self._parser = _FieldParser()
+
+    @property
+    def done(self) -> bool:
+        parser = self._parser
+        has_snippet = bool(parser.meta_description) or parser.paragraph_done
+        return parser.title_done and has_snippet
+
+    def feed(self, data: bytes, final: bool = False) -> bool:
+        self.bytes_fed += len(data)
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < PRESCAN_BYTES and not final:
+                return False
+            self.encoding = detect_encoding(self.content_type, self._pending)
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+            data, self._pending = self._pending, b""
+        text = self._decoder.decode(data, final)
+        if text:
+            self._parser.feed(text)
+        if final:
+            self._parser.close()
+        return self.done
+
+    def close(self):
+        """Flush whatever is buffered (end of body or byte cap reached)"""
+        if self._decoder is None or self._pending:
+            self.feed(b"", final=True)
+        else:
+            self._parser.close()
+
+    def result(self) -> Dict[str, Optional[str]]:
+        """{"title": str | None, "snippet": str} with the same precedence as before: meta description, else first <p>"""
+        parser = self._parser
+        title = "".join(parser.title_parts) if parser.title_done or parser.title_parts else None
+        snippet = parser.meta_description or ""
+        if not snippet:
+            snippet = "".join(parser.paragraph_parts)[:FIRST_PARAGRAPH_CHARS]
+        return {"title": title or None, "snippet": snippet}
+
+
+async def extract_page_info(
+    chunks: AsyncIterator[bytes],
+    content_type: Optional[str],
+    max_bytes: int
+) -> Tuple[Dict[str, Optional[str]], int]:
+    """
+    Read the body from chunks until the fields are found or max_bytes have been
+    read. Returns (fields, bytes_read); the caller closes the response, which
+    drops the rest of the body.
+    """
+    extractor = PageInfoExtractor(content_type)
+    async for chunk in chunks:
+        room = max_bytes - extractor.bytes_fed
+        if extractor.feed(chunk[:room]) or extractor.bytes_fed >= max_bytes:
+            break
+    extractor.close()
+    return extractor.result(), extractor.bytes_fed
@@ -0,0 +1,123 @@
+"""
+Incremental JSON parsing for streamed AI output
+Emits elements of selected top-level arrays as soon as each one is complete
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Feed it chunks of a JSON object as they arrive from the model; it returns
+    (key, element) for every element of a watched top-level array that has been
+    closed since the last call, e.g. ("steps", {"id": ..., "title": ...}).
+
+    Only a tiny scanner state is kept (depth, string/escape flags, current key),
+    so each character is looked at once regardless of how the text is chunked.
+    Scanned text is only held on to while an element or key in it is still
+    open; the chunks themselves are kept as a list and joined once, via .text,
+    for the final json.loads.
+    """
+
+    def __init__(self, array_keys: Iterable[str]):
+        self.array_keys = set(array_keys)
+        self._chunks: List[str] = []
+        self._text: Optional[str] = ""
+        # Unconsumed tail of the text: _buffer[0] is the character at absolute offset _base
+        self._buffer = ""
+        self._base = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+        return self._text
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._buffer[start - self._base:end - self._base]
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._chunks.append(chunk)
+        self._text = None
+        self._buffer += chunk
+        events: List[Tuple[str, Any]] = []
+
+        for i, c in enumerate(self._buffer[self._pos - self._base:], self._pos):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+            elif c == '"':
+                self._start_element(i)
+                self._in_string = True
+                self._string_start = i
+            elif c == "{" or c == "[":
+                self._start_element(i)
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = c == "{"
+                elif self._depth == 2 and c == "[" and self._key in self.array_keys:
+                    self._array_key = self._key
+            elif c == "}" or c == "]":
+                self._depth -= 1
+                if self._depth == 2 and self._array_key is not None and self._element_start is not None:
+                    self._emit(self._slice(self._element_start, i + 1), events)
+                elif self._depth == 1 and c == "]":
+                    if self._array_key is not None and self._element_start is not None:
+                        # Trailing scalar element (number/true/null) ends at the bracket
+                        self._emit(self._slice(self._element_start, i), events)
+                    self._array_key = None
+            elif c == ",":
+                if self._depth == 1:
+                    self._expect_key = True
+                elif self._depth == 2 and self._array_key is not None and self._element_start is not None:
+                    self._emit(self._slice(self._element_start, i), events)
+            elif c != ":" and not c.isspace():
+                self._start_element(i)
+
+        self._pos = self._base + len(self._buffer)
+        # Drop the scanned text nothing refers to any more: only an open element
+        # or an open top-level key still needs its characters
+        keep = self._pos
+        if self._element_start is not None:
+            keep = self._element_start
+        elif self._in_string and self._depth == 1 and self._expect_key:
+            keep = self._string_start
+        if keep > self._base:
+            self._buffer = self._buffer[keep - self._base:]
+            self._base = keep
+        return events
+
+    def _start_element(self, i: int):
+        if self._depth == 2 and self._array_key is not None and self._element_start is None:
+            self._element_start = i
+
+    def _end_string(self, i: int, events: List[Tuple[str, Any]]):
+        if self._depth == 1 and self._expect_key:
+            self._key = json.loads(self._slice(self._string_start, i + 1))
+            self._expect_key = False
+        elif self._depth == 2 and self._array_key is not None and self._element_start == self._string_start:
+            self._emit(self._slice(self._string_start, i + 1), events)
+
+    def _emit(self, raw: str, events: List[Tuple[str, Any]]):
+        self._element_start = None
+        try:
+            events.append((self._array_key, json.loads(raw)))
+        except ValueError:
+            # Malformed element - skip it; the final parse decides what survives
+            pass
@@ -0,0 +1,237 @@
+"""
+Language Detection
+Deterministic, cached language detection for search descriptions: a Unicode
+script fast path for non-Latin text, langdetect n-gram scoring for the rest
+"""
+
+import os
+import re
+import math
+import time
+import bisect
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from langdetect import DetectorFactory, LangDetectException
+from langdetect.detector_factory import PROFILES_DIRECTORY
+
+from services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# (first code point, last code point, script) - sorted, non-overlapping
+_SCRIPT_RANGES = sorted([
+    (0x0041, 0x005A, "latin"), (0x0061, 0x007A, "latin"), (0x00C0, 0x024F, "latin"), (0x1E00, 0x1EFF, "latin"),
+    (0x0370, 0x03FF, "greek"), (0x1F00, 0x1FFF, "greek"),
+    (0x0400, 0x04FF, "cyrillic"), (0x0500, 0x052F, "cyrillic"),
+    (0x0530, 0x058F, "armenian"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"), (0x0750, 0x077F, "arabic"), (0xFB50, 0xFDFF, "arabic"), (0xFE70, 0xFEFF, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x10A0, 0x10FF, "georgian"),
+    (0x1100, 0x11FF, "hangul"), (0x3130, 0x318F, "hangul"), (0xAC00, 0xD7AF, "hangul"),
+    (0x3040, 0x309F, "kana"), (0x30A0, 0x30FF, "kana"), (0x31F0, 0x31FF, "kana"), (0xFF66, 0xFF9F, "kana"),
+    (0x3400, 0x4DBF, "han"), (0x4E00, 0x9FFF, "han"), (0xF900, 0xFAFF, "han"),
+])
+_RANGE_STARTS = [start for start, _, _ in _SCRIPT_RANGES]
+
+# Scripts used by exactly one language we care about
+_SCRIPT_LANGUAGES = {
+    "greek": "el",
+    "armenian": "hy",
+    "hebrew": "he",
+    "bengali": "bn",
+    "gurmukhi": "pa",
+    "gujarati": "gu",
+    "tamil": "ta",
+    "telugu": "te",
+    "kannada": "kn",
+    "malayalam": "ml",
+    "thai": "th",
+    "georgian": "ka",
+    "hangul": "ko",
+}
+
+# Letters that only (or almost only) occur in one language of a shared script
+_UKRAINIAN = set("іїєґІЇЄҐ")
+_MACEDONIAN = set("ѓќѕЃЌЅ")
+_SERBIAN = set("ђћЂЋ")
+_RUSSIAN = set("ыэёЫЭЁ")
+_PERSIAN = set("پچژگکی")
+_URDU = set("ٹڈڑںےھ")
+
+# Short function words that tell Russian, Ukrainian and Bulgarian apart when no
+# distinctive letter occurs (e.g. "Як вибрати ..." vs "Как выбрать ...")
+_CYRILLIC_WORDS = {
+    "ru": {"как", "что", "где", "это", "или", "какой", "какая", "какие", "если", "чтобы", "мне", "можно", "почему", "сколько"},
+    "uk": {"як", "що", "де", "це", "або", "та", "чи", "який", "яка", "які", "якщо", "щоб", "мені", "можна", "купити"},
+    "bg": {"да", "се", "ще", "си", "ли", "са", "във", "със", "кой", "коя", "кое", "кои", "какво", "къде", "защо", "този", "тази", "през", "има", "най"},
+}
+_WORD_RE = re.compile(r"\w+")
+
+# langdetect reports Chinese as zh-cn / zh-tw; requests carry ISO 639-1 codes
+_LANGDETECT_CODES = {"zh-cn": "zh", "zh-tw": "zh"}
+
+
+def _script_of(char: str) -> Optional[str]:
+    code = ord(char)
+    index = bisect.bisect_right(_RANGE_STARTS, code) - 1
+    if index >= 0:
+        start, end, script = _SCRIPT_RANGES[index]
+        if code <= end:
+            return script
+    return None
+
+
+def script_language(text: str) -> Optional[str]:
+    """
+    Language implied by the text's dominant non-Latin script, or None when the
+    text is mostly Latin (or Devanagari, shared by Hindi/Marathi/Nepali) and
+    needs n-gram scoring
+    """
+    counts: Dict[str, int] = {}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        script = _script_of(char)
+        if script is not None:
+            counts[script] = counts.get(script, 0) + 1
+    if not letters:
+        return None
+
+    cjk = counts.get("han", 0) + counts.get("kana", 0) + counts.get("hangul", 0)
+    if cjk * 2 >= letters:
+        if counts.get("kana"):
+            return "ja"
+        if counts.get("hangul", 0) >= counts.get("han", 0):
+            return "ko"
+        return "zh"
+
+    script, count = max(counts.items(), key=lambda item: item[1], default=(None, 0))
+    if script in (None, "latin", "devanagari", "han", "kana") or count * 2 < letters:
+        return None
+    if script == "cyrillic":
+        chars = set(text)
+        if chars & _UKRAINIAN:
+            return "uk"
+        if chars & _MACEDONIAN:
+            return "mk"
+        if chars & _SERBIAN:
+            return "sr"
+        if chars & _RUSSIAN:
+            return "ru"
+        words = _WORD_RE.findall(text.lower())
+        scores = {lang: sum(word in vocabulary for word in words) for lang, vocabulary in _CYRILLIC_WORDS.items()}
+        best = max(scores, key=scores.get)
+        if scores[best] > scores["ru"]:
+            return best
+        return "bg" if "ъ" in chars or "Ъ" in chars else "ru"
+    if script == "arabic":
+        chars = set(text)
+        if chars & _URDU:
+            return "ur"
+        if chars & _PERSIAN:
+            return "fa"
+        return "ar"
+    return _SCRIPT_LANGUAGES.get(script)
+
+
+class LanguageDetector:
+    """
+    Detection is deterministic: langdetect's sampling is seeded on a private
+    factory, so the same text always gets the same language (and the result
+    cache, which is keyed on language, doesn't fragment). Profiles are loaded
+    once by load() at startup instead of on the first request. Results are
+    cached in an LRU keyed by a hash of the whitespace-normalized text.
+    """
+
+    def __init__(self):
+        self.cache_size = int(os.getenv("LANGUAGE_DETECT_CACHE_SIZE", "10000"))
+        self.max_text_length = int(os.getenv("LANGUAGE_DETECT_MAX_CHARS", "2000"))
+        self.seed = int(os.getenv("LANGUAGE_DETECT_SEED", "0"))
+
+        self._factory: Optional[DetectorFactory] = None
+        self._cache = LRUCache(max_entries=self.cache_size)
+
+        self.script_hits = 0
+        self.ngram_calls = 0
+        self.ngram_seconds = 0.0
+        self.failures = 0
+        self.load_seconds = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._factory is not None
+
+    def load(self):
+        """Read the n-gram profiles (~0.5 s); call once at startup"""
+        if self._factory is not None:
+            return
+        start = time.perf_counter()
+        factory = DetectorFactory()
+        factory.load_profile(PROFILES_DIRECTORY)
+        factory.set_seed(self.seed)
+        self._factory = factory
+        self.load_seconds = time.perf_counter() - start
+        logger.info("🌐 Language profiles loaded: %s languages in %.3fs", len(factory.get_lang_list()), self.load_seconds)
+
+    def detect(self, text: str) -> Optional[str]:
+        """ISO 639-1 code for text, or None if it has nothing to detect from"""
+        text = " ".join(text.split())[:self.max_text_length]
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached or None
+
+        language = script_language(text)
+        if language is not None:
+            self.script_hits += 1
+        else:
+            language = self._detect_ngrams(text)
+
+        # "" marks text we couldn't detect, so it isn't rescored either
+        self._cache.set(key, language or "", math.inf)
+        return language
+
+    def _detect_ngrams(self, text: str) -> Optional[str]:
+        self.load()
+        start = time.perf_counter()
+        self.ngram_calls += 1
+        try:
+            detector = self._factory.create()
+            detector.set_max_text_length(self.max_text_length)
+            detector.append(text)
+            language = detector.detect()
+        except LangDetectException:
+            self.failures += 1
+            return None
+        finally:
+            self.ngram_seconds += time.perf_counter() - start
+        if language == "unknown":
+            self.failures += 1
+            return None
+        return _LANGDETECT_CODES.get(language, language)
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "loadSeconds": round(self.load_seconds, 3),
+            "cacheEntries": len(self._cache),
+            "cacheHits": self._cache.hits,
+            "cacheMisses": self._cache.misses,
+            "scriptFastPath": self.script_hits,
+            "ngramCalls": self.ngram_calls,
+            "avgNgramMs": round(self.ngram_seconds / self.ngram_calls * 1000, 3) if self.ngram_calls else 0.0,
+            "failures": self.failures,
+        }
@@ -0,0 +1,531 @@
+"""
+Local Index
+On-disk BM25 index over the titles and snippets of fetched sources, searched
+when the web search fails (and optionally before it). New sources collect in
+memory and are flushed as immutable segment files, which are memory-mapped
+for reads and merged in the background once there are too many of them
+"""
+
+import os
+import sys
+import json
+import math
+import heapq
+import mmap
+import time
+import array
+import struct
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.query_index import content_words
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"SBIDX001"
+# magic, docs, terms, total doc length, doc offsets at, terms at, postings at, file size
+_HEADER = struct.Struct("<8sIIQQQQQ")
+_SEGMENT_PREFIX = "seg-"
+_SEGMENT_SUFFIX = ".sbx"
+
+# BM25 parameters (the usual defaults)
+_K1 = 1.2
+_B = 0.75
+
+# Terms in more documents than this are not read from the postings when the
+# query has rarer terms: they're checked only on the best-scoring candidates
+_SCAN_POSTINGS = 5000
+
+
+def _doc_terms(doc: Dict) -> List[str]:
+    return content_words(f"{doc['title']} {doc['snippet']}")
+
+
+def _encode(doc: Dict) -> bytes:
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _view_array(buffer, start: int, count: int, typecode: str):
+    """count items of typecode at start, zero-copy on little-endian machines"""
+    size = array.array(typecode).itemsize
+    view = memoryview(buffer)[start:start + count * size]
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    values = array.array(typecode, view.tobytes())
+    values.byteswap()
+    return values
+
+
+class Segment:
+    """
+    One immutable index file:
+        header | doc offsets (uint64, docs + 1) | doc lengths (uint16) |
+        docs (JSON each) | term dictionary (JSON: term -> [offset, bytes, df]) | postings
+    A term's postings are (doc id delta, term frequency) varint pairs in doc
+    id order. Only the term dictionary is decoded when the segment is opened.
+    """
+
+    def __init__(self, path: str, generation: int):
+        self.path = path
+        self.generation = generation
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, docs, _, total_length, offsets_at, terms_at, postings_at, size = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or size != len(self._map):
+            raise ValueError(f"not a complete index segment: {path}")
+        self.doc_count = docs
+        self.size = size
+        self.total_length = total_length
+        self._offsets = _view_array(self._map, offsets_at, docs + 1, "Q")
+        self.lengths = _view_array(self._map, offsets_at + 8 * (docs + 1), docs, "H")
+        self.terms: Dict[str, List[int]] = json.loads(self._map[terms_at:postings_at])
+        self._postings_at = postings_at
+        self.dead = set()  # doc ids superseded by a newer copy of the same URL
+
+    @property
+    def live_count(self) -> int:
+        return self.doc_count - len(self.dead)
+
+    def raw(self, doc_id: int) -> bytes:
+        return self._map[self._offsets[doc_id]:self._offsets[doc_id + 1]]
+
+    def doc(self, doc_id: int) -> Dict:
+        return json.loads(self.raw(doc_id))
+
+    def docs(self) -> Iterator[Tuple[int, Dict]]:
+        for doc_id in range(self.doc_count):
+            yield doc_id, self.doc(doc_id)
+
+    def document_frequency(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[2] if entry else 0
+
+    def postings(self, term: str) -> Iterator[Tuple[int, int]]:
+        """(doc id, term frequency) for every doc containing term"""
+        entry = self.terms.get(term)
+        if not entry:
+            return
+        data = self._map
+        i = self._postings_at + entry[0]
+        end = i + entry[1]
+        doc_id = 0
+        while i < end:
+            value = shift = 0
+            while True:
+                byte = data[i]
+                i += 1
+                value |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            doc_id += value
+            tf = data[i]
+            i += 1
+            yield doc_id, tf
+
+    def term_counts(self) -> List[Dict[str, int]]:
+        """Term frequencies of every doc, rebuilt from the postings (for merging without re-tokenizing)"""
+        counts: List[Dict[str, int]] = [{} for _ in range(self.doc_count)]
+        for term in self.terms:
+            for doc_id, tf in self.postings(term):
+                counts[doc_id][term] = tf
+        return counts
+
+    @staticmethod
+    def write(path: str, docs: List[Tuple[bytes, Dict[str, int], int]]):
+        """
+        Write (JSON blob, term frequencies, length) docs as a segment at path
+        (atomically: readers see all of it or nothing)
+        """
+        postings: Dict[str, bytearray] = {}
+        last_doc: Dict[str, int] = {}
+        document_frequency: Dict[str, int] = {}
+        lengths = array.array("H")
+        blobs = []
+        for doc_id, (blob, counts, length) in enumerate(docs):
+            lengths.append(length)
+            for term, tf in counts.items():
+                out = postings.setdefault(term, bytearray())
+                _write_varint(out, doc_id - last_doc.get(term, 0))
+                out.append(min(tf, 0xff))
+                last_doc[term] = doc_id
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+            blobs.append(blob)
+
+        offsets_at = _HEADER.size
+        docs_at = offsets_at + 8 * (len(docs) + 1) + 2 * len(docs)
+        offsets = array.array("Q", [docs_at])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        terms = {}
+        position = 0
+        for term in sorted(postings):
+            terms[term] = [position, len(postings[term]), document_frequency[term]]
+            position += len(postings[term])
+        terms_blob = json.dumps(terms, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        terms_at = offsets[-1]
+        postings_at = terms_at + len(terms_blob)
+        size = postings_at + position
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            lengths.byteswap()
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(docs), len(terms), sum(lengths), offsets_at, terms_at, postings_at, size))
+            f.write(offsets.tobytes())
+            f.write(lengths.tobytes())
+            for blob in blobs:
+                f.write(blob)
+            f.write(terms_blob)
+            for term in sorted(postings):
+                f.write(postings[term])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class LocalHit:
+    """A document matching a local search: its source, BM25 score and share of query terms it contains"""
+
+    __slots__ = ("source", "score", "coverage")
+
+    def __init__(self, source: Dict, score: float, coverage: float):
+        self.source = source
+        self.score = score
+        self.coverage = coverage
+
+
+class LocalIndex:
+    """
+    Disabled unless LOCAL_INDEX_DIR is set. Sources are buffered in memory
+    (already searchable) and written out as a segment every
+    LOCAL_INDEX_FLUSH_DOCS sources or LOCAL_INDEX_FLUSH_INTERVAL seconds; past
+    LOCAL_INDEX_MAX_SEGMENTS segments, all are merged into one keeping the
+    newest LOCAL_INDEX_MAX_DOCS sources. A URL indexed again replaces its
+    older copy. Writes happen on a background thread, never on the event loop.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv("LOCAL_INDEX_DIR", "")
+        self.enabled = bool(self.directory) and os.getenv("LOCAL_INDEX_ENABLED", "true").lower() == "true"
+        self.flush_docs = int(os.getenv("LOCAL_INDEX_FLUSH_DOCS", "200"))
+        self.flush_interval = float(os.getenv("LOCAL_INDEX_FLUSH_INTERVAL", "60"))
+        self.max_segments = int(os.getenv("LOCAL_INDEX_MAX_SEGMENTS", "8"))
+        self.max_docs = int(os.getenv("LOCAL_INDEX_MAX_DOCS", "200000"))
+        self.min_match = float(os.getenv("LOCAL_INDEX_MIN_MATCH", "0.5"))
+        self.first_tier = os.getenv("LOCAL_INDEX_FIRST_TIER", "false").lower() == "true"
+        self.first_tier_min_results = int(os.getenv("LOCAL_INDEX_FIRST_TIER_MIN_RESULTS", "5"))
+
+        self._lock = threading.Lock()  # buffer, live map and segment list
+        self._write_lock = threading.Lock()  # one flush or merge at a time
+        self._segments: List[Segment] = []
+        self._live: Dict[str, Tuple[int, int]] = {}  # url -> (generation, doc id) of its current copy
+        self._buffer: Dict[str, Tuple[Dict, Counter, int]] = {}  # url -> (doc, term counts, length)
+        self._next_generation = 1
+        self._last_flush = time.monotonic()
+        self._flushing = False
+
+        self.added = 0
+        self.flushes = 0
+        self.merges = 0
+        self.searches = 0
+        self.write_errors = 0
+
+        if self.enabled:
+            self._open()
+
+    def _segment_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{generation:08d}{_SEGMENT_SUFFIX}")
+
+    def _open(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = sorted(os.listdir(self.directory))
+        except OSError as e:
+            logger.warning("⚠ Local index: cannot use %s (%s), disabled", self.directory, e)
+            self.enabled = False
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # a flush interrupted by a crash
+                continue
+            if not (name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)):
+                continue
+            try:
+                generation = int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                segment = Segment(path, generation)
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning("⚠ Local index: skipping unreadable segment %s (%s)", name, e)
+                continue
+            self._add_segment(segment)
+            self._next_generation = max(self._next_generation, generation + 1)
+        logger.info(
+            "📚 Local index: %s sources in %s segments at %s",
+            len(self._live), len(self._segments), self.directory
+        )
+
+    def _add_segment(self, segment: Segment):
+        """Register a loaded segment (newest so far), superseding older copies of its URLs"""
+        for doc_id, doc in segment.docs():
+            previous = self._live.get(doc["url"])
+            if previous is not None:
+                self._segment(previous[0]).dead.add(previous[1])
+            self._live[doc["url"]] = (segment.generation, doc_id)
+        self._segments.append(segment)
+
+    def _segment(self, generation: int) -> Segment:
+        for segment in self._segments:
+            if segment.generation == generation:
+                return segment
+        raise KeyError(generation)
+
+    def add(self, source: Dict):
+        """Index a fetched source (title, url, snippet); cheap, the disk write happens later"""
+        if not self.enabled or not source.get("url"):
+            return
+        doc = {
+            "url": source["url"],
+            "title": source.get("title") or "",
+            "snippet": source.get("snippet") or "",
+            "indexedAt": int(time.time()),
+        }
+        terms = _doc_terms(doc)
+        if not terms:
+            return
+        with self._lock:
+            buffered = self._buffer.get(doc["url"])
+            current = self._live.get(doc["url"])
+            if buffered is not None:
+                previous = buffered[0]
+            elif current is not None:
+                previous = self._segment(current[0]).doc(current[1])
+            else:
+                previous = None
+            if previous is not None and previous["title"] == doc["title"] and previous["snippet"] == doc["snippet"]:
+                return  # refetched, unchanged
+            if current is not None:
+                self._segment(current[0]).dead.add(current[1])
+                del self._live[doc["url"]]
+            self._buffer[doc["url"]] = (doc, Counter(terms), min(len(terms), 0xffff))
+            self.added += 1
+            due = (
+                len(self._buffer) >= self.flush_docs
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if due and not self._flushing:
+                self._flushing = True
+                threading.Thread(target=self._flush_in_background, daemon=True).start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            self._flushing = False
+
+    def flush(self):
+        """Write buffered sources as a new segment (merging segments if there are too many)"""
+        if not self.enabled:
+            return
+        with self._write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                buffered = list(self._buffer.values())
+                generation = self._next_generation
+                self._next_generation += 1
+            if not buffered:
+                return
+            docs = [doc for doc, _, _ in buffered]
+            try:
+                Segment.write(self._segment_path(generation), [(_encode(doc), counts, length) for doc, counts, length in buffered])
+                segment = Segment(self._segment_path(generation), generation)
+            except (OSError, ValueError) as e:
+                self.write_errors += 1
+                logger.warning("⚠ Local index: flush of %s sources failed (%s), keeping them in memory", len(docs), e)
+                return
+            with self._lock:
+                for doc_id, doc in enumerate(docs):
+                    buffered = self._buffer.get(doc["url"])
+                    if buffered is not None and buffered[0] is doc:
+                        del self._buffer[doc["url"]]
+                        self._live[doc["url"]] = (generation, doc_id)
+                    else:
+                        segment.dead.add(doc_id)  # replaced while being written
+                self._segments = self._segments + [segment]
+            self.flushes += 1
+            logger.debug("📚 Local index: flushed %s sources to segment %s", len(docs), generation)
+            if len(self._segments) > self.max_segments:
+                self._merge()
+
+    def _merge(self):
+        """
+        Rewrite the smaller half of the segments as one, dropping superseded
+        sources, so each source is rewritten a logarithmic number of times as
+        the index grows. Past LOCAL_INDEX_MAX_DOCS, every segment is merged and
+        the oldest sources beyond the limit are dropped
+        """
+        with self._lock:
+            segments = sorted(self._segments, key=lambda s: s.live_count)
+            if sum(s.live_count for s in segments) <= self.max_docs:
+                segments = segments[:max(2, len(segments) // 2)]
+            generation = self._next_generation
+            self._next_generation += 1
+        docs = []
+        for segment in segments:
+            counts = segment.term_counts()
+            for doc_id in range(segment.doc_count):
+                if doc_id not in segment.dead:
+                    docs.append((segment.raw(doc_id), counts[doc_id], segment.lengths[doc_id], segment.generation, doc_id))
+        if len(docs) > self.max_docs:
+            docs.sort(key=lambda item: json.loads(item[0])["indexedAt"], reverse=True)
+        kept, dropped = docs[:self.max_docs], docs[self.max_docs:]
+        try:
+            Segment.write(self._segment_path(generation), [(blob, counts, length) for blob, counts, length, _, _ in kept])
+            merged = Segment(self._segment_path(generation), generation)
+        except (OSError, ValueError) as e:
+            self.write_errors += 1
+            logger.warning("⚠ Local index: merge of %s segments failed (%s)", len(segments), e)
+            return
+        merged_generations = {segment.generation for segment in segments}
+        kept_urls = [merged.doc(doc_id)["url"] for doc_id in range(merged.doc_count)]
+        dropped_urls = [json.loads(blob)["url"] for blob, _, _, _, _ in dropped]
+        with self._lock:
+            for doc_id, (_, _, _, old_generation, old_doc_id) in enumerate(kept):
+                url = kept_urls[doc_id]
+                if self._live.get(url) == (old_generation, old_doc_id):
+                    self._live[url] = (generation, doc_id)
+                else:
+                    merged.dead.add(doc_id)  # replaced during the merge
+            for url, (_, _, _, old_generation, old_doc_id) in zip(dropped_urls, dropped):
+                if self._live.get(url) == (old_generation, old_doc_id):
+                    del self._live[url]
+            self._segments = [merged] + [s for s in self._segments if s.generation not in merged_generations]
+        # Searches still holding the old segments keep their mappings until they finish
+        for segment in segments:
+            try:
+                os.remove(segment.path)
+            except OSError as e:
+                logger.warning("⚠ Local index: could not remove merged segment %s (%s)", segment.path, e)
+        self.merges += 1
+        logger.info(
+            "📚 Local index: merged %s segments into one of %s sources, dropped %s oldest",
+            len(segments), len(kept), len(dropped)
+        )
+
+    def search(self, query: str, limit: int = 10) -> List[LocalHit]:
+        """
+        The best BM25 matches for query that contain at least LOCAL_INDEX_MIN_MATCH
+        of its terms. Terms in over half of a large corpus are ignored when the query
+        has rarer ones, and common terms are only checked on the candidates the rare
+        ones found, so a query costs about as much as its rarest terms' postings
+        """
+        if not self.enabled:
+            return []
+        terms = list(dict.fromkeys(content_words(query)))
+        if not terms:
+            return []
+        self.searches += 1
+        with self._lock:
+            segments = list(self._segments)
+            buffer = list(self._buffer.values())
+
+        total_docs = sum(s.doc_count for s in segments) + len(buffer)
+        live_docs = sum(s.live_count for s in segments) + len(buffer)
+        if not live_docs:
+            return []
+        average_length = (sum(s.total_length for s in segments) + sum(length for _, _, length in buffer)) / total_docs
+        frequencies = {
+            term: sum(s.document_frequency(term) for s in segments) + sum(1 for _, counts, _ in buffer if term in counts)
+            for term in terms
+        }
+        scored_terms = [
+            t for t in terms
+            if frequencies[t] and (len(terms) == 1 or frequencies[t] <= max(live_docs / 2, _SCAN_POSTINGS))
+        ]
+        if not scored_terms:
+            return []
+        idf = {
+            term: math.log(1 + (live_docs - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            for term in scored_terms
+        }
+        scanned = [t for t in scored_terms if frequencies[t] <= _SCAN_POSTINGS] or scored_terms
+        checked = [t for t in scored_terms if t not in scanned]
+
+        scores: Dict[Tuple, List[float]] = {}
+
+        def accumulate(key, term: str, tf: int, length: int):
+            entry = scores.get(key)
+            if entry is None:
+                entry = scores[key] = [0.0, 0]
+            entry[0] += idf[term] * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / average_length))
+            entry[1] += 1
+
+        for term in scanned:
+            for segment in segments:
+                dead = segment.dead
+                lengths = segment.lengths
+                for doc_id, tf in segment.postings(term):
+                    if doc_id not in dead:
+                        accumulate((segment, doc_id), term, tf, lengths[doc_id])
+            for position, (_, counts, length) in enumerate(buffer):
+                tf = counts.get(term)
+                if tf:
+                    accumulate((None, position), term, tf, length)
+
+        if checked:
+            candidates = heapq.nlargest(max(limit * 5, 50), scores.items(), key=lambda item: item[1][0])
+            scores = dict(candidates)
+            for (segment, position) in scores:
+                if segment is None:
+                    _, counts, length = buffer[position]
+                else:
+                    counts, length = Counter(_doc_terms(segment.doc(position))), segment.lengths[position]
+                for term in checked:
+                    tf = counts.get(term)
+                    if tf:
+                        accumulate((segment, position), term, tf, length)
+
+        needed = max(1, math.ceil(self.min_match * len(scored_terms)))
+        ranked = heapq.nlargest(
+            limit,
+            ((score, matched, key) for key, (score, matched) in scores.items() if matched >= needed),
+            key=lambda item: item[0]
+        )
+        hits = []
+        for score, matched, (segment, position) in ranked:
+            doc = buffer[position][0] if segment is None else segment.doc(position)
+            source = {"title": doc["title"], "url": doc["url"], "snippet": doc["snippet"]}
+            hits.append(LocalHit(source, score, matched / len(scored_terms)))
+        return hits
+
+    def close(self):
+        """Flush buffered sources (called on app shutdown)"""
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            segments = list(self._segments)
+            buffered = len(self._buffer)
+        return {
+            "enabled": self.enabled,
+            "sources": sum(s.live_count for s in segments) + buffered,
+            "buffered": buffered,
+            "segments": len(segments),
+            "terms": sum(len(s.terms) for s in segments),
+            "bytes": sum(s.size for s in segments),
+            "added": self.added,
+            "flushes": self.flushes,
+            "merges": self.merges,
+            "searches": self.searches,
+            "writeErrors": self.write_errors,
+        }
@@ -0,0 +1,213 @@
+"""
+Logging
+Root logger setup: a logging call only queues the record, and a listener
+thread formats and writes it, so a slow stdout or log shipper never blocks
+the event loop. Lines are the classic text format or JSON (LOG_FORMAT=json)
+with request_id and any extra= fields, such as stage timings, as keys.
+DEBUG records can be sampled per request.
+"""
+
+import os
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from services.fast_json import dump_json
+from services.metrics import LOG_RECORDS_DROPPED
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else on a record came in through extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+# Argument types a record can carry to the listener thread unformatted: they can't change after the call
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class RequestIDFilter(logging.Filter):
+    def filter(self, record):
+        # Always ensure request_id exists, default to 'system' for non-request logs
+        if not hasattr(record, "request_id"):
+            record.request_id = "system"
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps `rate` of DEBUG records (the per-URL fetch lines are most of them).
+    The choice is made per request_id, so a sampled request keeps all of its
+    debug lines; records from outside a request are sampled one by one.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._threshold = int(rate * 10000)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", "system")
+        if request_id == "system":
+            return random.random() < self.rate
+        return zlib.crc32(request_id.encode("utf-8")) % 10000 < self._threshold
+
+
+# Use a custom formatter that handles missing request_id gracefully
+class SafeFormatter(logging.Formatter):
+    def format(self, record):
+        # Ensure request_id exists before formatting (double-check in case filter didn't run)
+        if not hasattr(record, "request_id"):
+            record.request_id = "system"
+        try:
+            return super().format(record)
+        except (KeyError, ValueError):
+            # Fallback format if request_id still causes issues
+            record.request_id = "system"
+            return f"{self.formatTime(record, self.datefmt)} - {record.name} - {record.levelname} - [system] - {record.getMessage()}"
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request_id, message, then the record's extra= fields"""
+
+    def format(self, record):
+        entry: Dict = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "system"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return dump_json(entry).decode("utf-8")
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread through a lock-free SimpleQueue. When
+    max_size records are waiting (the writer can't keep up) new ones are
+    dropped and counted rather than blocking the caller or growing without bound.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def handle(self, record):
+        # Handler.handle() without the handler lock: the SimpleQueue is already thread-safe
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def prepare(self, record):
+        # The message is merged on the listener thread too, unless an argument is mutable
+        # (a dict or list may change once the call returns): then it's merged here.
+        # This is the root's only handler, so the record is changed in place rather than copied.
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(type(arg) in _IMMUTABLE_ARGS for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+
+
+def lean_log_records():
+    """
+    Stop LogRecords looking up the current thread and process names and ids on
+    every call: neither format uses them, and it's about a fifth of the cost
+    of creating a record.
+    """
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+
+def configure_logging():
+    """
+    Set up the root logger once per process (LOG_LEVEL, LOG_FORMAT=text|json,
+    LOG_QUEUE_ENABLED, LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE_RATE). Handlers that
+    are already installed (e.g. by uvicorn) get our format and move behind the queue.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if _queue_handler is not None and _queue_handler in root.handlers:
+        return
+
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = SafeFormatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)
+    writers = list(root.handlers) or [logging.StreamHandler()]
+    for handler in writers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setFormatter(formatter)
+
+    if os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true":
+        _queue_handler = NonBlockingQueueHandler(queue.SimpleQueue(), int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *writers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        front = [_queue_handler]
+    else:
+        front = writers
+
+    sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    for handler in front:
+        handler.addFilter(RequestIDFilter())
+        handler.addFilter(DebugSampler(sample_rate))
+    root.handlers = front
+    lean_log_records()
+    root.setLevel(getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
+
+    # Suppress verbose httpx/httpcore logging (it's too noisy and causes format errors)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    logging.getLogger("openai").setLevel(logging.WARNING)  # Also suppress OpenAI's verbose logs
+
+
+def stop_logging():
+    """Write out whatever is still queued and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict:
+    return {
+        "queued": _queue_handler is not None,
+        "queueDepth": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped": _queue_handler.dropped if _queue_handler is not None else 0,
+        "format": os.getenv("LOG_FORMAT", "text").lower(),
+        "level": logging.getLevelName(logging.getLogger().level),
+    }
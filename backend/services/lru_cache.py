@@ -0,0 +1,91 @@
+"""
+In-process LRU cache with per-entry TTL and an optional byte budget
+Shared building block for the result, source and search caches
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by entry count and, optionally, by the
+    total size of the stored values. Every entry carries its own expiry time;
+    expired entries are dropped lazily when they're looked up or evicted.
+
+    Not thread-safe - it's meant to be used from the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: len(value))
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, count: bool = True) -> Any:
+        """Return the live value for key (marking it most recently used), or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            if count:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Store value for ttl seconds, evicting least-recently-used entries to make room"""
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would evict everything else and still not fit
+            self.pop(key)
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.bytes_used += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes_used > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._remove(key)
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self.bytes_used -= size
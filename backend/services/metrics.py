@@ -0,0 +1,273 @@
+"""
+Metrics
+Minimal in-process metrics registry (counters, gauges, histograms with labels)
+rendered in the Prometheus text exposition format for GET /metrics
+"""
+
+import os
+import math
+import bisect
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+OVERFLOW_LABEL = "other"
+
+# Seconds; covers everything from a cached response to a slow OpenAI completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0)
+FETCH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), max_series: int = 1000):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._children: Dict[Tuple[str, ...], object] = {}
+        # Label values exactly as passed (e.g. status as int) -> child, so the
+        # common case is a single dict lookup with no string conversion
+        self._lookup: Dict[Tuple, object] = {}
+
+    def labels(self, *values):
+        """The child for these label values, created on first use"""
+        child = self._lookup.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(self._children) >= self.max_series:
+                # Unbounded label values (e.g. hosts) fold into one series instead of growing forever
+                key = (OVERFLOW_LABEL,) * len(self.labelnames)
+                child = self._children.get(key)
+            if child is None:
+                child = self._new_child()
+                self._children[key] = child
+        if len(self._lookup) < 2 * self.max_series:
+            self._lookup[values] = child
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A new series (one set of label values) of this metric's kind"""
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float], *values):
+        """Read the value of the series for these label values (none if unlabelled) from function at scrape time"""
+        self._functions[values] = function
+
+    def render(self) -> List[str]:
+        for values, function in self._functions.items():
+            self.labels(*values).set(function())
+        return super().render()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # One bisect and three adds; buckets are made cumulative only when scraped
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, max_series: int = 1000):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric in registration order. Updates are plain attribute
+    arithmetic on the event loop - no locks, no formatting - and all the
+    string work happens in render() when /metrics is scraped.
+    """
+
+    def __init__(self, prefix: str = "searchbot"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        if not metric.labelnames:
+            metric.labels()  # exported as 0 before the first update
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames, **kwargs))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", documentation, labelnames, **kwargs))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+MAX_HOSTS = int(os.getenv("METRICS_MAX_HOSTS", "200"))
+
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled")
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to response headers per route (streams: until the stream starts)",
+    ["method", "route", "status"])
+PIPELINES_IN_FLIGHT = REGISTRY.gauge(
+    "pipelines_in_flight", "Search pipelines holding an admission slot")
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "admission_queue_depth", "Searches waiting for an admission slot", ["priority"])
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "admission_wait_seconds", "Time a search waited in its priority queue before it was admitted (0 if a slot was free)",
+    ["priority"])
+OPENAI_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "openai_requests_in_flight", "OpenAI completions holding a concurrency slot")
+GATHER_SOURCES_SECONDS = REGISTRY.histogram(
+    "gather_sources_duration_seconds", "Web search plus page fetching for one request", ["mode"])
+FETCH_SECONDS = REGISTRY.histogram(
+    "fetch_duration_seconds", "Outbound HTTP fetch time per host (excludes time queued for a slot)",
+    ["host", "outcome"], buckets=FETCH_BUCKETS, max_series=MAX_HOSTS * 3)
+OPENAI_SECONDS = REGISTRY.histogram(
+    "openai_request_duration_seconds", "OpenAI completion latency (excludes time queued for a slot)",
+    ["mode", "outcome"])
+OPENAI_TOKENS = REGISTRY.counter(
+    "openai_tokens_total", "Tokens used by OpenAI completions (counted locally when a stream reports no usage)", ["type"])
+FALLBACK_SOURCES = REGISTRY.counter(
+    "fallback_sources_total", "Requests answered with placeholder sources because the web search failed", ["reason"])
+LOCAL_INDEX_SOURCES = REGISTRY.counter(
+    "local_index_sources_total", "Requests answered from the local source index instead of the web search", ["reason"])
+DEADLINE_DEGRADED = REGISTRY.counter(
+    "deadline_degraded_total", "Requests that cut a stage short to stay within their deadline", ["stage"])
+HOST_CIRCUIT_DECISIONS = REGISTRY.counter(
+    "host_circuit_decisions_total", "Source fetches skipped, short-timed or let through as probes by the host circuit breaker",
+    ["decision"])
+HOST_CIRCUITS_OPEN = REGISTRY.gauge(
+    "host_circuits_open", "Hosts whose circuit is open or half-open")
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped because the log writer thread fell behind")
+PROVIDER_RATE_LIMITED = REGISTRY.counter(
+    "provider_rate_limited_total", "429 / rate-limit responses from search providers", ["provider"])
@@ -0,0 +1,145 @@
+"""
+Page Fetcher
+Shared, pooled async HTTP client for downloading source pages
+"""
+
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.metrics import FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (compatible; SearchBot/1.0)"
+
+
+class FetchClock:
+    """Started by stream() once the request holds its slots, so callers can time the host rather than the queue"""
+
+    __slots__ = ("started",)
+
+    def __init__(self):
+        self.started: Optional[float] = None
+
+    def elapsed(self) -> Optional[float]:
+        """Seconds since the request got its slots (None if it never did)"""
+        return time.perf_counter() - self.started if self.started is not None else None
+
+
+class PageFetcher:
+    """
+    One keep-alive connection pool shared by every request in the worker.
+    Concurrency is bounded globally and per host so a burst of searches
+    can't open hundreds of sockets or hammer a single site.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("FETCH_MAX_CONCURRENCY", "32"))
+        self.per_host_concurrency = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "4"))
+        self.timeout = float(os.getenv("FETCH_TIMEOUT", "5.0"))
+        self.keepalive_expiry = float(os.getenv("FETCH_KEEPALIVE_EXPIRY", "30.0"))
+        self.max_bytes = int(os.getenv("FETCH_MAX_BYTES", str(512 * 1024)))  # body bytes read per page
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        # host -> [semaphore, number of callers holding or waiting on it]
+        self._host_slots: Dict[str, List] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._host_slots.get(host)
+        if entry is None:
+            entry = [asyncio.Semaphore(self.per_host_concurrency), 0]
+            self._host_slots[host] = entry
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                # Drop idle hosts so the table doesn't grow with every domain we ever saw
+                self._host_slots.pop(host, None)
+
+    @asynccontextmanager
+    async def _slots(self, host: str):
+        # Per-host slot first: a request queued behind a busy host must not sit on a
+        # global slot that a request for another host could be using
+        async with self._host_slot(host):
+            async with self._global_slots:
+                yield
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET a page through the shared pool, waiting for a per-host and a global slot"""
+        return await self.request("GET", url, headers=headers)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Any request through the shared pool and its slots (search provider APIs
+        use this too); kwargs go to httpx.AsyncClient.request
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        async with self._slots(host):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                outcome = f"{response.status_code // 100}xx"
+                return response
+            finally:
+                FETCH_SECONDS.labels(host, outcome).observe(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        clock: Optional[FetchClock] = None
+    ):
+        """
+        Like get(), but yields the response before the body is read so the caller
+        can consume it incrementally; the slots are held until the block exits.
+        timeout overrides FETCH_TIMEOUT for this request; clock, if given, is
+        started when the slots are acquired.
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        request_timeout = httpx.Timeout(timeout) if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        async with self._slots(host):
+            start = time.perf_counter()
+            if clock is not None:
+                clock.started = start
+            outcome = "error"
+            try:
+                async with self.client.stream("GET", url, headers=headers, timeout=request_timeout) as response:
+                    outcome = f"{response.status_code // 100}xx"
+                    yield response
+            finally:
+                FETCH_SECONDS.labels(host, outcome).observe(time.perf_counter() - start)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
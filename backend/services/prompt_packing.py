@@ -0,0 +1,262 @@
+"""
+Prompt Packing
+Fits search sources into a fixed token budget for the research prompt:
+near-duplicate snippets are dropped and the budget is split across sources
+by credibility and relevance to the request
+"""
+
+import os
+import re
+import math
+from functools import lru_cache
+from typing import Dict, List, Set
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts are estimated without it
+    tiktoken = None
+
+# Scripts written without spaces: roughly one token per character
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+_PIECE_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]|\w+|[^\w\s]")
+_LONG_WORD_RE = re.compile(r"[^\W぀-ヿ㐀-䶿一-鿿가-힯]{5,}")
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s*")
+
+
+@lru_cache(maxsize=16)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Unknown or custom model name (e.g. behind OPENAI_BASE_URL): the GPT-4 encoding is close enough
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenCounter:
+    """Token counts for a model: exact with tiktoken installed, a close estimate otherwise"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.encoding = _encoding_for(model)
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        # One token per piece, plus one for every further ~4 characters of a long word
+        return len(_PIECE_RE.findall(text)) + sum((len(word) - 1) // 4 for word in _LONG_WORD_RE.findall(text))
+
+    @staticmethod
+    def _estimate(piece: str) -> int:
+        # BPE vocabularies hold most short words whole and split longer ones every ~4 characters
+        return 1 if len(piece) <= 4 or _CJK_RE.match(piece) else math.ceil(len(piece) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """text cut to at most max_tokens (ending in "…" when cut), at a word boundary where possible"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            cut = self.encoding.decode(tokens[:max_tokens - 1])
+        else:
+            used = 0
+            end = None
+            for match in _PIECE_RE.finditer(text):
+                used += self._estimate(match.group())
+                if used > max_tokens - 1:
+                    end = match.start()
+                    break
+            if end is None:
+                return text
+            cut = text[:end]
+        space = cut.rfind(" ")
+        if space > len(cut) // 2:
+            cut = cut[:space]
+        return cut.rstrip(" ,;:-") + "…"
+
+
+def _terms(text: str) -> Set[str]:
+    """Lowercase words of 3+ characters; character bigrams for text without spaces (CJK)"""
+    text = text.lower()
+    words = [w for w in _WORD_RE.findall(text) if len(w) >= 3 and not _CJK_RE.match(w)]
+    cjk = "".join(_CJK_RE.findall(text))
+    return set(words) | {cjk[i:i + 2] for i in range(len(cjk) - 1)}
+
+
+def _shingles(text: str) -> Set[str]:
+    """Word 3-grams (character 3-grams for CJK), the unit near-duplicate detection compares"""
+    text = text.lower()
+    if _CJK_RE.search(text):
+        chars = "".join(text.split())
+        return {chars[i:i + 3] for i in range(max(1, len(chars) - 2))}
+    words = _WORD_RE.findall(text)
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _new_sentences(text: str, seen: Set[str]) -> str:
+    """text without the sentences already in seen (repeated boilerplate), adding the rest to seen"""
+    kept = []
+    for sentence in _SENTENCE_RE.split(text):
+        key = " ".join(_WORD_RE.findall(sentence.lower()))
+        if not key:
+            continue
+        if key not in seen:
+            seen.add(key)
+            kept.append(sentence.strip())
+    return " ".join(kept)
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PackedSources:
+    """Result of PromptPacker.pack: the prompt's source list and what packing did"""
+
+    __slots__ = ("text", "tokens", "sources", "duplicates", "truncated", "dropped")
+
+    def __init__(self, text: str, tokens: int, sources: int, duplicates: int, truncated: int, dropped: int):
+        self.text = text
+        self.tokens = tokens
+        self.sources = sources
+        self.duplicates = duplicates
+        self.truncated = truncated
+        self.dropped = dropped
+
+
+class PromptPacker:
+    """
+    Each source costs a fixed line (title, capped at PROMPT_TITLE_TOKENS, and
+    URL) plus its snippet. Sentences already seen in a better source are cut,
+    and sources whose snippet nearly repeats a higher-weighted one (fallback
+    boilerplate, syndicated copies) keep their line but lose the snippet. The rest of PROMPT_SOURCE_TOKENS is shared out
+    in proportion to each source's weight - credibility times relevance to
+    the request - and capped at what the snippet actually needs, so a short
+    snippet's leftover goes to the others instead of being wasted.
+    """
+
+    def __init__(self, model: str):
+        self.counter = TokenCounter(model)
+        self.budget = int(os.getenv("PROMPT_SOURCE_TOKENS", "800"))
+        self.max_sources = int(os.getenv("PROMPT_MAX_SOURCES", "10"))
+        self.title_tokens = int(os.getenv("PROMPT_TITLE_TOKENS", "24"))
+        self.min_snippet_tokens = int(os.getenv("PROMPT_MIN_SNIPPET_TOKENS", "24"))
+        self.dedup_threshold = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.6"))
+
+    def weight(self, source: Dict, query_terms: Set[str]) -> float:
+        credibility = max(5, min(100, source.get("credibility", 50))) / 100
+        if not query_terms:
+            return credibility
+        text_terms = _terms(f"{source.get('title', '')} {source.get('snippet', '')}")
+        relevance = len(query_terms & text_terms) / len(query_terms)
+        return credibility * (1 + 2 * relevance)
+
+    def pack(self, query: str, sources: List[Dict]) -> PackedSources:
+        query_terms = _terms(query)
+        ranked = sorted(
+            ((self.weight(s, query_terms), s) for s in sources[:self.max_sources * 2]),
+            key=lambda item: item[0],
+            reverse=True
+        )
+
+        # Near-duplicates are compared against snippets already kept, best first
+        entries = []
+        kept_shingles: List[Set[str]] = []
+        seen_sentences: Set[str] = set()
+        seen_urls = set()
+        duplicates = 0
+        for weight, source in ranked:
+            url = source.get("url", "")
+            if url in seen_urls:
+                duplicates += 1
+                continue
+            seen_urls.add(url)
+            original = " ".join((source.get("snippet") or "").split())
+            snippet = _new_sentences(original, seen_sentences)
+            shingles = _shingles(snippet) if snippet else set()
+            if original and not snippet:
+                duplicates += 1
+            elif shingles and any(_jaccard(shingles, other) >= self.dedup_threshold for other in kept_shingles):
+                duplicates += 1
+                snippet = ""
+            elif shingles:
+                kept_shingles.append(shingles)
+            title = self.counter.truncate(" ".join((source.get("title") or url).split()), self.title_tokens)
+            entries.append({
+                "title": title,
+                "url": url,
+                "snippet": snippet,
+                "weight": weight,
+            })
+        dropped = max(0, len(entries) - self.max_sources)
+        entries = entries[:self.max_sources]
+
+        # Fixed cost of each line first; drop the lowest-weighted sources if even those don't fit
+        for entry in entries:
+            entry["cost"] = self.counter.count(f"- {entry['title']}: ({entry['url']})") + 1
+        while len(entries) > 1 and sum(e["cost"] for e in entries) > self.budget:
+            entries.pop()
+            dropped += 1
+        remaining = self.budget - sum(e["cost"] for e in entries)
+
+        allocation = self._allocate(entries, remaining)
+        lines = []
+        tokens = 0
+        truncated = 0
+        for entry, allotted in zip(entries, allocation):
+            snippet = entry["snippet"]
+            if snippet and allotted < entry["need"]:
+                snippet = self.counter.truncate(snippet, allotted)
+                truncated += 1
+            if snippet:
+                lines.append(f"- {entry['title']}: {snippet} ({entry['url']})")
+            else:
+                lines.append(f"- {entry['title']} ({entry['url']})")
+            tokens += entry["cost"] + (min(allotted, entry["need"]) if snippet else 0)
+        return PackedSources("\n".join(lines), tokens, len(entries), duplicates, truncated, dropped)
+
+    def _allocate(self, entries: List[Dict], budget: int) -> List[int]:
+        """Split budget across snippets by weight, capped at each snippet's need (water-filling)"""
+        for entry in entries:
+            entry["need"] = self.counter.count(entry["snippet"]) + 1 if entry["snippet"] else 0
+        allocation = [0] * len(entries)
+        open_ = [i for i, e in enumerate(entries) if e["need"] > 0]
+        while open_ and budget > 0:
+            # Every open snippet gets at least a token, so with fewer tokens than snippets the lowest-ranked go without
+            open_ = open_[:budget]
+            total_weight = sum(entries[i]["weight"] for i in open_)
+            share = {i: max(1, int(budget * entries[i]["weight"] / total_weight)) for i in open_}
+            # Rounding the smallest shares up to 1 can overshoot: take the excess back from the largest, best first
+            excess = sum(share.values()) - budget
+            for i in open_:
+                if excess <= 0:
+                    break
+                take = min(excess, share[i] - 1)
+                share[i] -= take
+                excess -= take
+            capped = [i for i in open_ if allocation[i] + share[i] >= entries[i]["need"]]
+            if not capped:
+                for i in open_:
+                    allocation[i] += share[i]
+                break
+            # Fully fund the snippets that fit and share what's left among the rest
+            for i in capped:
+                budget -= entries[i]["need"] - allocation[i]
+                allocation[i] = entries[i]["need"]
+            open_ = [i for i in open_ if i not in capped]
+        # A snippet squeezed below the minimum says nothing useful: give its tokens up
+        return [a if a >= min(self.min_snippet_tokens, entries[i]["need"]) else 0 for i, a in enumerate(allocation)]
@@ -0,0 +1,78 @@
+"""
+Query Cache
+Search query -> result URL list, with stale-while-revalidate so popular queries
+rarely have to wait on (or get rate limited by) the search provider
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.lru_cache import LRUCache
+
+
+class QueryCache:
+    """
+    Entries are fresh for SEARCH_CACHE_TTL seconds. For SEARCH_CACHE_STALE_TTL
+    seconds after that they're still served immediately, flagged as stale so
+    the caller can refresh them in the background.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.fresh_ttl = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+        self.stale_ttl = float(os.getenv("SEARCH_CACHE_STALE_TTL", "86400"))
+        self._entries = LRUCache(max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000")))
+        self._refreshing: Set[str] = set()
+
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def make_key(search_query: str, max_results: int) -> str:
+        normalized = " ".join(re.sub(r"[^\w\s]", " ", search_query.casefold()).split())
+        return f"{normalized}\x1f{max_results}"
+
+    def lookup(self, key: str) -> Optional[Tuple[List[str], bool]]:
+        """(urls, is_fresh) for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        urls, fresh_until = entry
+        fresh = fresh_until > time.monotonic()
+        if fresh:
+            self.fresh_hits += 1
+        else:
+            self.stale_hits += 1
+        return list(urls), fresh
+
+    def store(self, key: str, urls: List[str]):
+        if not self.enabled or not urls:
+            return
+        self._entries.set(key, (tuple(urls), time.monotonic() + self.fresh_ttl), ttl=self.fresh_ttl + self.stale_ttl)
+
+    def begin_refresh(self, key: str) -> bool:
+        """Claim the background refresh for key; False if one is already running"""
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        self.refreshes += 1
+        return True
+
+    def end_refresh(self, key: str):
+        self._refreshing.discard(key)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "freshHits": self.fresh_hits,
+            "staleHits": self.stale_hits,
+            "misses": self._entries.misses,
+            "backgroundRefreshes": self.refreshes,
+            "refreshing": len(self._refreshing),
+        }
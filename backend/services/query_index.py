@@ -0,0 +1,320 @@
+"""
+Query Index
+Near-duplicate matching of search descriptions: MinHash signatures over
+word and character shingles, LSH banding to find candidates, and an exact
+Jaccard check plus word-order and opposite-meaning checks before a match
+is accepted
+"""
+
+import re
+import zlib
+import random
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: signatures are computed in pure Python without it
+    np = None
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+_DIGIT_RE = re.compile(r"\d")
+
+# Words that change how a question reads but not what it's about
+STOPWORDS = frozenset("""
+a an the and or of for to in on at by with from about into my your our their his her its this that these those
+is are was were be been being do does did can could should would will shall may might must
+i me we you he she it they them how what which who whom why when where there here
+some any much many more most very so just also too please help need want get getting
+el la los las de del un una y o en para por con que como mi le les des du et ou pour avec une est
+der die das ein eine und oder mit für zu wie ist
+""".split())
+
+# Prefixes that turn a word into its opposite or a different action on the same root:
+# install / uninstall / reinstall, enable / disable, encrypt / decrypt, upgrade / downgrade
+OPPOSING_PREFIXES = ("un", "dis", "de", "re", "en", "in", "im", "ex", "non", "anti", "up", "down", "over", "under")
+
+# Words that negate the question ("charging" / "not charging"), after folding
+NEGATIONS = frozenset("""
+not no never without cant cannot wont dont doesnt didnt isnt arent wasnt werent hasnt havent couldnt wouldnt shouldnt
+nicht kein keine nie pas sin nunca
+""".split())
+
+# Opposites that share no root, as stems
+ANTONYMS = (
+    ("on", "off"), ("add", "remov"), ("open", "clos"), ("start", "stop"), ("show", "hid"), ("rais", "lower"),
+    ("buy", "sell"), ("before", "after"), ("max", "min"), ("best", "worst"), ("cheap", "expensiv"), ("allow", "block"),
+)
+_ANTONYMS = {frozenset(pair) for pair in ANTONYMS}
+
+
+def _fold(text: str) -> str:
+    """Case-fold and drop accents and apostrophes, so "cómo" / "como" and "won't" / "wont" match"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold().replace("'", "").replace("’", ""))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _stem(word: str) -> str:
+    """
+    Crude suffix folding (English-centric; other languages mostly pass through):
+    make / makes / making and noise / noises all end up on one stem
+    """
+    if len(word) > 5 and word.endswith("ing"):
+        word = word[:-3]
+    elif len(word) > 5 and word.endswith("ed"):
+        word = word[:-2]
+    elif len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 4 and word.endswith("es") and not word.endswith("ses"):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def content_words(text: str) -> List[str]:
+    """Stems of the words in text that carry meaning, in order (stopwords dropped)"""
+    return [_stem(w) for w in _WORD_RE.findall(_fold(text)) if w not in STOPWORDS]
+
+
+def features(text: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    (shingles, pinned): content-word stems, their character 3-grams and
+    adjacent stem pairs, so stopwords, plurals and small typos barely move
+    the set; and the tokens containing digits (model numbers, error codes,
+    years), which two queries must share exactly to be considered the same
+    question. Swapped roles ("paris to london" / "london to paris") and
+    opposite actions ("install" / "uninstall") share almost every shingle, so
+    they score high here; different_question() catches them.
+    """
+    words = content_words(text)
+    shingles: Set[str] = set()
+    pinned = set()
+    for i, word in enumerate(words):
+        if _DIGIT_RE.search(word):
+            pinned.add(word)
+        shingles.add(word)
+        padded = f"^{word}$"
+        shingles.update(padded[j:j + 3] for j in range(len(padded) - 2))
+        if i:
+            shingles.add(f"{words[i - 1]} {word}")
+    return frozenset(shingles), frozenset(pinned)
+
+
+def word_order(text: str) -> Tuple[str, ...]:
+    """Every word's stem in order, stopwords included ("to", "from" and "but" are what mark the roles)"""
+    return tuple(_stem(w) for w in _WORD_RE.findall(_fold(text)))
+
+
+def swapped_roles(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """
+    True when two word orders are the same question with two words traded
+    places across at least one other word: "paris to london" / "london to
+    paris", "fridge not cooling but freezer works" / "freezer not cooling but
+    fridge works". Only words occurring once in each query are compared, so
+    added or dropped words don't count; neighbours trading places ("bathroom
+    grout" / "grout in the bathroom") and moving a phrase to the other end
+    ("reset netgear router" / "netgear router reset") are rephrasings, not swaps.
+    """
+    once_a = {w for w in a if a.count(w) == 1}
+    shared = {w for w in b if w in once_a and b.count(w) == 1}
+    seq_a = [w for w in a if w in shared]
+    seq_b = [w for w in b if w in shared]
+    diff = [i for i, (x, y) in enumerate(zip(seq_a, seq_b)) if x != y]
+    return (
+        len(diff) == 2 and diff[1] - diff[0] > 1
+        and seq_a[diff[0]] == seq_b[diff[1]] and seq_a[diff[1]] == seq_b[diff[0]]
+    )
+
+
+def _roots(word: str) -> Set[Tuple[str, str]]:
+    """(prefix, root) readings of a stem: itself with no prefix, and each opposing prefix it starts with"""
+    readings = {("", word)}
+    for prefix in OPPOSING_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+            readings.add((prefix, word[len(prefix):]))
+    return readings
+
+
+def _opposed(x: str, y: str) -> bool:
+    if frozenset((x, y)) in _ANTONYMS:
+        return True
+    roots_y = _roots(y)
+    return any(root == other_root and prefix != other_prefix
+               for prefix, root in _roots(x) for other_prefix, other_root in roots_y)
+
+
+def opposite_meaning(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """
+    True when the words only one of two word orders has include an opposite
+    of a word only the other has: the same root behind different prefixes
+    ("install" / "uninstall", "enable" / "disable", "increase" / "decrease"),
+    or a listed antonym ("turn on" / "turn off"), or when only one of them is
+    negated ("laptop charging" / "laptop not charging"). Such pairs share
+    nearly every character 3-gram, so the Jaccard score alone accepts them.
+    """
+    if any(w in NEGATIONS for w in a) != any(w in NEGATIONS for w in b):
+        return True
+    only_a = set(a).difference(b)
+    only_b = set(b).difference(a)
+    return any(_opposed(x, y) for x in only_a for y in only_b)
+
+
+def different_question(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """The word-order checks a match has to pass on top of the shingle Jaccard"""
+    return swapped_roles(a, b) or opposite_meaning(a, b)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """num_perm universal hash functions (a*x + b) mod p over CRC32 shingle hashes"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, _PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, _PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)
+            self._b = np.array(self.b, dtype=np.uint64)
+
+    def signature(self, shingles: FrozenSet[str]) -> Tuple[int, ...]:
+        if not shingles:
+            return (_PRIME,) * self.num_perm
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+        if np is not None:
+            # (shingles x perms) in one shot; a*x + b < 2^64, so uint64 arithmetic is exact
+            values = (np.array(hashes, dtype=np.uint64)[:, None] * self._a + self._b) % _PRIME
+            return tuple(values.min(axis=0).tolist())
+        return tuple(min((a * x + b) % _PRIME for x in hashes) for a, b in zip(self.a, self.b))
+
+
+class _Entry:
+    __slots__ = ("key", "group", "shingles", "pinned", "order", "bands")
+
+    def __init__(
+        self,
+        key: Hashable,
+        group: Hashable,
+        shingles: FrozenSet[str],
+        pinned: FrozenSet[str],
+        order: Tuple[str, ...],
+        bands: List[Tuple]
+    ):
+        self.key = key
+        self.group = group
+        self.shingles = shingles
+        self.pinned = pinned
+        self.order = order
+        self.bands = bands
+
+
+class QueryIndex:
+    """
+    Maps past queries to their cache keys, within groups (e.g. category and
+    language) that never match each other. A lookup hashes the query into
+    `bands` bands of `rows` MinHash values; entries sharing any band are
+    candidates, and the best candidate whose exact shingle Jaccard reaches
+    `threshold` (with identical digit tokens, no two words that swapped
+    roles and no opposite words) is the match. With 16 x 4 bands, pairs at
+    0.7 similarity become candidates ~99% of the time.
+
+    Bounded to max_entries, least recently matched or added evicted first.
+    """
+
+    def __init__(self, threshold: float = 0.7, max_entries: int = 5000, bands: int = 16, rows: int = 4):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(bands * rows)
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, Set[Hashable]] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _bands(self, group: Hashable, signature: Tuple[int, ...]) -> List[Tuple]:
+        r = self.rows
+        return [(group, i, signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def add(self, key: Hashable, text: str, group: Hashable = None):
+        """Index text under key (replacing whatever key pointed at before)"""
+        shingles, pinned = features(text)
+        if not shingles:
+            return
+        self.remove(key)
+        bands = self._bands(group, self.hasher.signature(shingles))
+        self._entries[key] = _Entry(key, group, shingles, pinned, word_order(text), bands)
+        for band in bands:
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def candidates(self, text: str, group: Hashable = None) -> Set[Hashable]:
+        """Keys sharing at least one LSH band with text (no similarity check)"""
+        shingles, _ = features(text)
+        if not shingles:
+            return set()
+        keys: Set[Hashable] = set()
+        for band in self._bands(group, self.hasher.signature(shingles)):
+            keys.update(self._buckets.get(band, ()))
+        return keys
+
+    def lookup(self, text: str, group: Hashable = None) -> Optional[Tuple[Hashable, float]]:
+        """(key, similarity) of the closest indexed query at or above threshold, or None"""
+        shingles, pinned = features(text)
+        if not shingles:
+            return None
+        order: Optional[Tuple[str, ...]] = None  # only needed once a candidate passes the threshold
+        best: Optional[Tuple[Hashable, float]] = None
+        seen: Set[Hashable] = set()
+        for band in self._bands(group, self.hasher.signature(shingles)):
+            for key in self._buckets.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                entry = self._entries[key]
+                if entry.pinned != pinned:
+                    continue
+                score = jaccard(shingles, entry.shingles)
+                if score < self.threshold or (best is not None and score <= best[1]):
+                    continue
+                if order is None:
+                    order = word_order(text)
+                if not different_question(order, entry.order):
+                    best = (key, score)
+        if best is not None:
+            self._entries.move_to_end(best[0])
+        return best
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "evictions": self.evictions,
+            "threshold": self.threshold,
+            "numpy": np is not None,
+        }
@@ -0,0 +1,159 @@
+"""
+Rate Limiter
+Async token buckets per search provider, with a fair FIFO wait queue and
+adaptive backoff when the provider starts answering 429
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited longer than max_wait for a token"""
+
+
+class TokenBucket:
+    """
+    Holds up to `burst` tokens, refilled at `rate` tokens per second; each
+    provider call takes one. Callers queue on an asyncio.Lock (FIFO), so they
+    are served strictly in arrival order and only the head of the queue sleeps.
+
+    report_rate_limited() empties the bucket and blocks it for an exponentially
+    growing backoff window; report_success() lets the backoff decay again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        initial_backoff: float = 5.0,
+        max_backoff: float = 300.0
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._backoff = 0.0
+        self._lock = asyncio.Lock()
+
+        self.waiting = 0
+        self.acquired = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    async def acquire(self, max_wait: Optional[float] = None) -> float:
+        """Wait for a token; returns seconds waited. Raises RateLimitTimeout after max_wait."""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            if max_wait is None:
+                await self._take()
+            else:
+                try:
+                    await asyncio.wait_for(self._take(), timeout=max_wait)
+                except asyncio.TimeoutError:
+                    raise RateLimitTimeout(
+                        f"{self.name}: no rate-limit token within {max_wait:.1f}s ({self.waiting - 1} others waiting)"
+                    )
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        return waited
+
+    async def _take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+
+    def report_rate_limited(self):
+        """Provider answered 429: back off harder each time it happens in a row"""
+        self.rate_limited += 1
+        self._backoff = min(self.max_backoff, max(self.initial_backoff, self._backoff * 2))
+        now = time.monotonic()
+        self._refill(now)
+        self._blocked_until = max(self._blocked_until, now + self._backoff)
+        # Empty bucket that only starts refilling once the pause is over, so
+        # waiters resume at the steady rate instead of with a full burst
+        self._tokens = 0.0
+        self._updated = self._blocked_until
+        logger.warning("⏳ Rate limiter [%s]: 429 received, pausing calls for %.1fs", self.name, self._backoff)
+
+    def report_success(self):
+        if self._backoff:
+            self._backoff = self._backoff / 2 if self._backoff / 2 >= self.initial_backoff else 0.0
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(min(self.burst, self._tokens + max(0.0, now - self._updated) * self.rate), 3),
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "rateLimited": self.rate_limited,
+            "backoffSeconds": self._backoff,
+            "blockedForSeconds": round(max(0.0, self._blocked_until - now), 3),
+            "avgWaitSeconds": round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+        }
+
+
+class RateLimiterRegistry:
+    """
+    One TokenBucket per provider, configured from the environment:
+    SEARCH_RATE_LIMIT_<PROVIDER>_RATE (calls/second) and _BURST
+    """
+
+    DEFAULTS = {
+        # Same pace as the old fixed 2 s interval between Google searches
+        "google": (0.5, 1),
+        "serpapi": (5.0, 5),
+        "duckduckgo": (1.0, 2),
+    }
+
+    def __init__(self):
+        self.max_wait = float(os.getenv("SEARCH_RATE_LIMIT_MAX_WAIT", "10.0"))
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def get(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            default_rate, default_burst = self.DEFAULTS.get(provider, (1.0, 2))
+            prefix = f"SEARCH_RATE_LIMIT_{provider.upper()}"
+            bucket = TokenBucket(
+                provider,
+                rate=float(os.getenv(f"{prefix}_RATE", str(default_rate))),
+                burst=int(os.getenv(f"{prefix}_BURST", str(default_burst))),
+                initial_backoff=float(os.getenv("SEARCH_RATE_LIMIT_BACKOFF", "5.0")),
+                max_backoff=float(os.getenv("SEARCH_RATE_LIMIT_MAX_BACKOFF", "300.0")),
+            )
+            self._buckets[provider] = bucket
+        return bucket
+
+    def stats(self) -> Dict:
+        return {name: bucket.stats() for name, bucket in self._buckets.items()}
@@ -0,0 +1,255 @@
+"""
+Result Cache
+Two-tier cache of finished SearchResultPayloads in front of the search pipeline:
+an in-process LRU (TTL + byte budget) and an optional SQLite tier that survives
+restarts
+"""
+
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+from models.search_models import SearchRequestPayload, SearchResultPayload
+from services.fast_json import dump_json
+from services.lru_cache import LRUCache
+from services.query_index import QueryIndex
+
+logger = logging.getLogger(__name__)
+
+
+def parse_category_ttls(spec: str) -> Dict[str, float]:
+    """Parse "news=300,shopping=1800" into {"news": 300.0, "shopping": 1800.0}"""
+    ttls = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        category, ttl = item.split("=", 1)
+        try:
+            ttls[category.strip().lower()] = float(ttl)
+        except ValueError:
+            logger.warning("⚠ Ignoring invalid cache TTL for category '%s': %r", category.strip(), ttl)
+    return ttls
+
+
+class SQLiteResultStore:
+    """Persistent tier. Calls are blocking - ResultCache runs them in a worker thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " category TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM result_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, payload: bytes, category: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, payload, category, expires_at) VALUES (?, ?, ?, ?)",
+                (key, payload, category, expires_at)
+            )
+            self._conn.commit()
+
+    def prune(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    Keyed on normalized description + category + priority + resolved language.
+    Results are stored serialized, so the byte budget is the real memory cost
+    and the SQLite tier can hold exactly the same bytes.
+
+    With RESULT_CACHE_SIMILAR_ENABLED=true, an exact-key miss falls back to a
+    similarity index over the descriptions stored since startup (same
+    category and language only), so rephrasings of a cached question are
+    answered from the cache too. It's off by default: a wrong match serves
+    the answer to a different question.
+    """
+
+    PRUNE_EVERY = 500  # persistent-tier writes between expired-row cleanups
+
+    def __init__(self):
+        self.enabled = os.getenv("RESULT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.default_ttl = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+        self.category_ttls = parse_category_ttls(os.getenv("RESULT_CACHE_CATEGORY_TTLS", ""))
+        self.memory = LRUCache(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+
+        self.similar: Optional[QueryIndex] = None
+        if self.enabled and os.getenv("RESULT_CACHE_SIMILAR_ENABLED", "false").lower() in ("1", "true", "yes"):
+            self.similar = QueryIndex(
+                threshold=float(os.getenv("RESULT_CACHE_SIMILARITY_THRESHOLD", "0.7")),
+                max_entries=int(os.getenv("RESULT_CACHE_SIMILAR_MAX_ENTRIES", str(self.memory.max_entries)))
+            )
+        
+        self.store: Optional[SQLiteResultStore] = None
+        sqlite_path = os.getenv("RESULT_CACHE_SQLITE_PATH")
+        if self.enabled and sqlite_path:
+            try:
+                self.store = SQLiteResultStore(sqlite_path)
+                logger.info("💾 Result cache: persistent tier at %s", sqlite_path)
+            except sqlite3.Error as e:
+                logger.warning("⚠ Result cache: could not open %s (%s), running memory-only", sqlite_path, e)
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self._writes_since_prune = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case-fold, strip punctuation and collapse whitespace so trivial rephrasings share a key"""
+        text = re.sub(r"[^\w\s]", " ", text.casefold())
+        return " ".join(text.split())
+
+    def make_key(self, request: SearchRequestPayload) -> str:
+        raw = "\x1f".join([
+            self.normalize(request.description),
+            self.normalize(request.category),
+            (request.priority or "").lower(),
+            (request.language or "").lower(),
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, category: str) -> float:
+        return self.category_ttls.get(self.normalize(category), self.default_ttl)
+
+    def similarity_group(self, request: SearchRequestPayload) -> Tuple[str, str]:
+        return self.normalize(request.category), (request.language or "").lower()
+
+    async def get(self, key: str, request: Optional[SearchRequestPayload] = None) -> Optional[SearchResultPayload]:
+        """Exact-key lookup; with request given, a miss also tries near-duplicate descriptions"""
+        payload = await self.get_raw(key, request)
+        return SearchResultPayload.model_validate_json(payload) if payload is not None else None
+
+    async def get_raw(self, key: str, request: Optional[SearchRequestPayload] = None) -> Optional[bytes]:
+        """Like get(), but the stored JSON as-is - for writing straight into a response without parsing it"""
+        if not self.enabled:
+            return None
+
+        payload = await self._load(key)
+        if payload is not None:
+            return payload
+
+        if request is not None and self.similar is not None:
+            match = self.similar.lookup(request.description, self.similarity_group(request))
+            if match is not None:
+                similar_key, score = match
+                payload = await self._load(similar_key, count=False)
+                if payload is not None:
+                    self.similar_hits += 1
+                    logger.info("⚡ Result cache: similar query hit (similarity %.2f)", score)
+                    return payload
+                # The result behind it expired or was evicted
+                self.similar.remove(similar_key)
+
+        self.misses += 1
+        return None
+
+    async def _load(self, key: str, count: bool = True) -> Optional[bytes]:
+        payload = self.memory.get(key)
+        if payload is not None:
+            if count:
+                self.memory_hits += 1
+            return payload
+
+        if self.store is not None:
+            try:
+                row = await asyncio.to_thread(self.store.get, key)
+            except sqlite3.Error as e:
+                logger.warning("⚠ Result cache: persistent read failed: %s", e)
+                row = None
+            if row is not None:
+                payload, expires_at = row
+                if count:
+                    self.persistent_hits += 1
+                # Promote to the memory tier for the rest of its lifetime
+                self.memory.set(key, payload, ttl=max(0.0, expires_at - time.time()))
+                return payload
+        return None
+
+    async def set(self, key: str, category: str, result: SearchResultPayload, request: Optional[SearchRequestPayload] = None):
+        """Store result under key; with request given, its description is indexed for similar lookups"""
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_for(category)
+        if ttl <= 0:
+            return
+        payload = dump_json(result)
+        self.memory.set(key, payload, ttl=ttl)
+        self.stores += 1
+        if request is not None and self.similar is not None:
+            self.similar.add(key, request.description, self.similarity_group(request))
+
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, payload, self.normalize(category), time.time() + ttl)
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= self.PRUNE_EVERY:
+                    self._writes_since_prune = 0
+                    await asyncio.to_thread(self.store.prune)
+            except sqlite3.Error as e:
+                logger.warning("⚠ Result cache: persistent write failed: %s", e)
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.persistent_hits + self.similar_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memoryHits": self.memory_hits,
+            "persistentHits": self.persistent_hits,
+            "similarHits": self.similar_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "stores": self.stores,
+            "hitRate": round((self.memory_hits + self.persistent_hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "memoryEntries": len(self.memory),
+            "memoryBytes": self.memory.bytes_used,
+            "memoryEvictions": self.memory.evictions,
+            "persistent": self.store is not None,
+            "similarIndex": self.similar.stats() if self.similar is not None else None,
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
@@ -5,239 +5,760 @@ Gathers sources from web searches and scrapes relevant information
 
 import os
 import time
+import asyncio
 import logging
-from typing import List, Dict, Optional
-import requests
-from bs4 import BeautifulSoup
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from typing import AsyncIterator, Callable, List, Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+import httpx
 from googlesearch import search as google_search
-# Alternative: Use SerpAPI, Bing Search API, or DuckDuckGo API
+
+from services.page_fetcher import FetchClock, PageFetcher
+from services.html_extract import extract_page_info
+from services.source_cache import SourceCache
+from services.query_cache import QueryCache
+from services.single_flight import SingleFlight
+from services.batch_memo import current_batch
+from services.deadline import current_deadline
+from services.metrics import (
+    DEADLINE_DEGRADED, FALLBACK_SOURCES, GATHER_SOURCES_SECONDS, HOST_CIRCUIT_DECISIONS, LOCAL_INDEX_SOURCES,
+    PROVIDER_RATE_LIMITED
+)
+from services.tracing import tracer, current_span, NOOP_SPAN
+from services.rate_limiter import RateLimiterRegistry, RateLimitTimeout
+from services.credibility import CredibilityEngine
+from services.local_index import LocalIndex
+from services.host_health import CLOSED, OPEN, HostHealthRegistry
 
 logger = logging.getLogger(__name__)
 
 
+class SearchProviderError(Exception):
+    """A search provider call failed; rate_limited marks 429-style refusals"""
+
+    def __init__(self, message: str, rate_limited: bool = False):
+        super().__init__(message)
+        self.rate_limited = rate_limited
+
+
+class SearchProvider(ABC):
+    """Returns result URLs for a query. Subclasses implement search()."""
+    
+    name = "base"
+    label = "Search"
+    
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> List[str]:
+        """Up to max_results result URLs; raises SearchProviderError"""
+
+
+class GoogleScrapeProvider(SearchProvider):
+    """googlesearch-python scraping (free, but Google rate limits it)"""
+    
+    name = "google"
+    label = "Google Search API"
+    
+    async def search(self, query: str, max_results: int) -> List[str]:
+        return await asyncio.to_thread(lambda: list(google_search(query, num_results=max_results)))
+
+
+class SerpApiProvider(SearchProvider):
+    """SerpAPI JSON API (paid, reliable). SERPAPI_BASE_URL can point at a local stub."""
+    
+    name = "serpapi"
+    label = "SerpAPI"
+    
+    def __init__(self, fetcher: PageFetcher):
+        self.fetcher = fetcher
+        self.api_key = os.getenv("SERP_API_KEY")
+        self.base_url = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
+    
+    async def search(self, query: str, max_results: int) -> List[str]:
+        if not self.api_key:
+            raise SearchProviderError("SERP_API_KEY not set")
+        response = await self.fetcher.request(
+            "GET",
+            f"{self.base_url}/search.json",
+            params={"engine": "google", "q": query, "num": max_results, "api_key": self.api_key}
+        )
+        if response.status_code == 429:
+            raise SearchProviderError("429 Too Many Requests", rate_limited=True)
+        response.raise_for_status()
+        results = response.json().get("organic_results", [])
+        return [r["link"] for r in results if r.get("link")][:max_results]
+
+
+class _DuckDuckGoResultParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.urls: List[str] = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        attrs = dict(attrs)
+        if "result__a" not in (attrs.get("class") or "").split():
+            return
+        href = attrs.get("href") or ""
+        # Results link through a redirect: //duckduckgo.com/l/?uddg=<target>&rut=...
+        target = parse_qs(urlsplit(href).query).get("uddg")
+        url = unquote(target[0]) if target else href
+        if url.startswith("http"):
+            self.urls.append(url)
+
+
+class DuckDuckGoHtmlProvider(SearchProvider):
+    """DuckDuckGo's HTML endpoint (free, no key). DUCKDUCKGO_BASE_URL can point at a local stub."""
+    
+    name = "duckduckgo"
+    label = "DuckDuckGo HTML"
+    
+    def __init__(self, fetcher: PageFetcher):
+        self.fetcher = fetcher
+        self.base_url = os.getenv("DUCKDUCKGO_BASE_URL", "https://html.duckduckgo.com").rstrip("/")
+    
+    async def search(self, query: str, max_results: int) -> List[str]:
+        response = await self.fetcher.request("POST", f"{self.base_url}/html/", data={"q": query})
+        # DuckDuckGo answers 202 with a challenge page when it's throttling us
+        if response.status_code in (202, 429):
+            raise SearchProviderError(f"{response.status_code} throttled", rate_limited=True)
+        response.raise_for_status()
+        parser = _DuckDuckGoResultParser()
+        parser.feed(response.text)
+        return parser.urls[:max_results]
+
+
+PROVIDER_CLASSES = {
+    GoogleScrapeProvider.name: GoogleScrapeProvider,
+    SerpApiProvider.name: SerpApiProvider,
+    DuckDuckGoHtmlProvider.name: DuckDuckGoHtmlProvider,
+}
+
+
+def host_failure(error: httpx.HTTPError) -> Optional[str]:
+    """Why a failed fetch counts against its host, or None if it's the URL's fault (e.g. a 404)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return f"http_{status}" if status in (403, 429) or status >= 500 else None
+    return type(error).__name__
+
+
 class SearchEngine:
     def __init__(self):
-        self.serp_api_key = os.getenv("SERP_API_KEY")  # Optional: for better search results
-        self.last_search_time = 0
-        self.min_search_interval = 2.0  # Minimum seconds between searches to avoid rate limiting
+        self.rate_limiters = RateLimiterRegistry()  # Token bucket per search provider to avoid 429s
+        self.fetcher = PageFetcher()  # Shared keep-alive pool for source page downloads
+        
+        # Search providers in order: primary first, then the ones to fail over (or hedge) to
+        self.providers = self._build_providers(os.getenv("SEARCH_PROVIDERS", "google"))
+        # Off by default: hedging sends a second provider request for every slow search
+        self.hedging = os.getenv("SEARCH_HEDGING_ENABLED", "false").lower() == "true"
+        self.hedge_delay = float(os.getenv("SEARCH_HEDGE_DELAY", "1.5"))
+        self.provider_timeout = float(os.getenv("SEARCH_PROVIDER_TIMEOUT", "10.0"))
+        self.provider_stats = {
+            p.name: {"calls": 0, "wins": 0, "failures": 0, "rateLimited": 0, "failovers": 0, "hedged": 0}
+            for p in self.providers
+        }
+        self.source_cache = SourceCache()  # Per-URL extracts, revalidated with conditional GETs
+        self.query_cache = QueryCache()  # Query -> URL list, served stale while refreshing
+        self.credibility = CredibilityEngine()  # Domain reputation list, reloaded when the file changes
+        self.local_index = LocalIndex()  # On-disk BM25 index of fetched sources, searched when the web search fails
+        self.host_health = HostHealthRegistry()  # Fetch latency / errors per host, skips hosts that keep failing
+        self._background_tasks = set()
+        # Coalesce identical in-flight provider calls and page fetches across requests
+        self.search_flight = SingleFlight("search")
+        self.fetch_flight = SingleFlight("fetch")
+    
+    def _build_providers(self, spec: str) -> List[SearchProvider]:
+        providers = []
+        for name in (n.strip().lower() for n in spec.split(",")):
+            if not name:
+                continue
+            provider_class = PROVIDER_CLASSES.get(name)
+            if provider_class is None:
+                logger.warning("⚠ Unknown search provider '%s' in SEARCH_PROVIDERS, ignoring", name)
+            elif provider_class is GoogleScrapeProvider:
+                providers.append(provider_class())
+            else:
+                providers.append(provider_class(self.fetcher))
+        return providers or [GoogleScrapeProvider()]
+    
+    async def aclose(self):
+        """Cancel background refreshes and release pooled connections (called on app shutdown)"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        await self.fetcher.aclose()
+        await asyncio.to_thread(self.local_index.close)
     
     async def gather_sources(
         self,
         query: str,
         category: str,
         max_results: int = 10,
-        request_id: Optional[str] = None
+        request_id: Optional[str] = None,
+        on_source: Optional[Callable[[Dict], None]] = None
     ) -> List[Dict]:
         """
         Search the web and gather relevant sources
-        Returns list of sources with title, URL, snippet, and credibility score
+        Returns list of sources with title, URL, snippet, and credibility score.
+        on_source, if given, is called with each source as soon as it's fetched
         """
         sources = []
+        log_extra = {"request_id": request_id} if request_id else {}
+        gather_start = time.perf_counter()
         
-        # Build search query
-        search_query = f"{query} {category}"
+        try:
+            with tracer.span("search.gather_sources", category=category) as span:
+                async for source in self.iter_sources(query, category, max_results, request_id=request_id):
+                    sources.append(source)
+                    if on_source is not None:
+                        on_source(source)
+                span.set_attribute("sources", len(sources))
+        except Exception as e:
+            logger.error(
+                "✗ Search error: %s",
+                e,
+                extra=log_extra,
+                exc_info=True
+            )
+            # Fall back to sources fetched for earlier requests, then to placeholders
+            sources = await self._search_local_index(query, max_results, log_extra)
+            if sources:
+                LOCAL_INDEX_SOURCES.labels("error").inc()
+            else:
+                FALLBACK_SOURCES.labels("error").inc()
+                sources = self._get_fallback_sources(query, category)
+        
+        GATHER_SOURCES_SECONDS.labels("gather").observe(time.perf_counter() - gather_start)
+        return self.rank_sources(sources, max_results)
+    
+    def rank_sources(self, sources: List[Dict], max_results: int = 10) -> List[Dict]:
+        """Sort by credibility and keep the top max_results"""
+        return sorted(sources, key=lambda x: x.get("credibility", 0), reverse=True)[:max_results]
+    
+    async def iter_sources(
+        self,
+        query: str,
+        category: str,
+        max_results: int = 10,
+        request_id: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Search the web and yield each source as soon as its page has been fetched
+        and parsed (completion order, not ranked). Falls back to matching sources
+        from the local index, or placeholder sources, when the search itself fails.
+        Within a request deadline, searching and fetching stop when the gather
+        share of the budget runs out, keeping the sources that arrived in time.
+        """
         log_extra = {"request_id": request_id} if request_id else {}
+        deadline = current_deadline()
         
-        # Rate limiting: Add delay between searches to avoid 429 errors
-        import asyncio
-        time_since_last_search = time.time() - self.last_search_time
-        if time_since_last_search < self.min_search_interval:
-            delay = self.min_search_interval - time_since_last_search
-            logger.debug(
-                f"⏳ Rate limiting: Waiting {delay:.2f}s before search to avoid rate limits",
+        if self.local_index.first_tier:
+            # Well-covered topics: answer from the local index without a web search
+            local_sources = await self._search_local_index(query, max_results, log_extra, full_match_only=True)
+            if len(local_sources) >= self.local_index.first_tier_min_results:
+                LOCAL_INDEX_SOURCES.labels("first_tier").inc()
+                for source in local_sources:
+                    yield source
+                return
+        
+        search_results = await self._search_urls_within_deadline(f"{query} {category}", max_results, log_extra)
+        if search_results is None:
+            local_sources = await self._search_local_index(query, max_results, log_extra)
+            if local_sources:
+                LOCAL_INDEX_SOURCES.labels("search_failed").inc()
+                for source in local_sources:
+                    yield source
+                return
+            FALLBACK_SOURCES.labels("search_failed").inc()
+            for source in self._get_fallback_sources(query, category)[:max_results]:
+                yield source
+            return
+        
+        # Fetch and parse all results in parallel (bounded by the shared fetcher)
+        urls = search_results[:max_results]
+        logger.info(
+            "📥 Fetching %s source pages...",
+            len(urls),
+            extra=log_extra
+        )
+        
+        async def fetch(url: str):
+            try:
+                return url, await self._fetch_source_info(url, query, request_id=request_id)
+            except Exception as e:
+                return url, e
+        
+        tasks = [asyncio.ensure_future(fetch(url)) for url in urls]
+        fetched = 0
+        timed_out = False
+        try:
+            budget = deadline.gather_remaining() if deadline is not None else None
+            for idx, next_done in enumerate(asyncio.as_completed(tasks, timeout=budget), 1):
+                try:
+                    url, result = await next_done
+                except asyncio.TimeoutError:
+                    # Out of fetch budget: carry on with the sources that made it
+                    deadline.mark_degraded("fetch")
+                    DEADLINE_DEGRADED.labels("fetch").inc()
+                    logger.warning(
+                        "⏱ Fetch budget used up after %.2fs: "
+                        "continuing with %s/%s sources",
+                        deadline.elapsed(), fetched, len(urls),
+                        extra=log_extra
+                    )
+                    timed_out = True
+                    break
+                if isinstance(result, Exception):
+                    logger.warning(
+                        "  [%s/%s] ✗ Failed to fetch %s...: %s",
+                        idx, len(urls), url[:60], result,
+                        extra=log_extra
+                    )
+                elif result:
+                    logger.debug(
+                        "  [%s/%s] ✓ %s...",
+                        idx, len(urls), url[:60],
+                        extra=log_extra
+                    )
+                    fetched += 1
+                    yield result
+            if timed_out and not fetched:
+                # Nothing arrived in time: pages fetched for earlier requests beat no sources at all
+                for source in await self._search_local_index(query, max_results, log_extra):
+                    yield source
+        finally:
+            # Consumer stopped early (or was cancelled): don't leave fetches running
+            for task in tasks:
+                task.cancel()
+    
+    async def _search_local_index(
+        self,
+        query: str,
+        max_results: int,
+        log_extra: Dict,
+        full_match_only: bool = False
+    ) -> List[Dict]:
+        """Sources from the local index matching query (full_match_only: containing every query term)"""
+        if not self.local_index.enabled:
+            return []
+        with tracer.span("search.local_index", full_match_only=full_match_only) as span:
+            start = time.perf_counter()
+            try:
+                hits = await asyncio.to_thread(self.local_index.search, query, max_results)
+            except Exception as e:
+                logger.warning("⚠ Local index search failed: %s", e, extra=log_extra)
+                return []
+            if full_match_only:
+                hits = [hit for hit in hits if hit.coverage == 1.0]
+            span.set_attribute("sources", len(hits))
+        sources = []
+        for hit in hits:
+            source = dict(hit.source)
+            source["credibility"] = self._calculate_credibility(source["url"], source["title"])
+            sources.append(source)
+        logger.info(
+            "📚 Local index: %s sources for '%s' in %.1fms",
+            len(sources), query, (time.perf_counter() - start) * 1000,
+            extra=log_extra
+        )
+        return sources
+    
+    async def _search_urls_within_deadline(self, search_query: str, max_results: int, log_extra: Dict) -> Optional[List[str]]:
+        """_search_urls, given up on (as a failed search) when the request's gather budget runs out"""
+        deadline = current_deadline()
+        if deadline is None:
+            return await self._search_urls(search_query, max_results, log_extra)
+        try:
+            return await asyncio.wait_for(
+                self._search_urls(search_query, max_results, log_extra),
+                timeout=deadline.gather_remaining()
+            )
+        except asyncio.TimeoutError:
+            deadline.mark_degraded("search")
+            DEADLINE_DEGRADED.labels("search").inc()
+            logger.warning(
+                "⏱ Search budget used up after %.2fs, using fallback sources",
+                deadline.elapsed(),
                 extra=log_extra
             )
-            await asyncio.sleep(delay)
+            return None
+    
+    async def _search_urls(self, search_query: str, max_results: int, log_extra: Dict) -> Optional[List[str]]:
+        """
+        Result URLs for search_query, from the query cache when possible.
+        Stale cache entries are returned immediately and refreshed in the background.
+        Returns None when the search failed and fallback sources should be used
+        """
+        cache_key = self.query_cache.make_key(search_query, max_results)
+        batch = current_batch()
+        if batch is not None:
+            # Inside a batch: one lookup per query for the whole batch (failures aren't memoized)
+            search_results = await batch.do(
+                "search",
+                cache_key,
+                lambda: self._lookup_search_urls(cache_key, search_query, max_results, log_extra),
+                keep=lambda urls: urls is not None
+            )
+        else:
+            search_results = await self._lookup_search_urls(cache_key, search_query, max_results, log_extra)
+        return list(search_results) if search_results is not None else None
+    
+    async def _lookup_search_urls(self, cache_key: str, search_query: str, max_results: int, log_extra: Dict) -> Optional[List[str]]:
+        cached = self.query_cache.lookup(cache_key)
+        if cached is not None:
+            urls, fresh = cached
+            if not fresh and self.query_cache.begin_refresh(cache_key):
+                task = asyncio.create_task(self._refresh_search(cache_key, search_query, max_results))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            logger.info(
+                "⚡ Search cache hit (%s): %s URLs for '%s'",
+                "fresh" if fresh else "stale, refreshing", len(urls), search_query,
+                extra=log_extra
+            )
+            return urls
         
+        # Identical searches already in flight share one provider call
+        return await self.search_flight.do(
+            cache_key,
+            lambda: self._run_search_and_cache(cache_key, search_query, max_results, log_extra)
+        )
+    
+    async def _run_search_and_cache(self, cache_key: str, search_query: str, max_results: int, log_extra: Dict) -> Optional[List[str]]:
+        search_results = await self._run_search(search_query, max_results, log_extra)
+        if search_results:
+            self.query_cache.store(cache_key, search_results)
+        return search_results
+    
+    async def _refresh_search(self, cache_key: str, search_query: str, max_results: int):
+        """Background revalidation of a stale query cache entry (still goes through rate limiting)"""
         try:
-            # Option 1: Use Google Search (free but rate-limited)
-            # Note: Google may rate limit free searches. Consider using SerpAPI for production.
+            await self.search_flight.do(
+                cache_key,
+                lambda: self._run_search_and_cache(cache_key, search_query, max_results, {})
+            )
+        except Exception as e:
+            logger.warning("⚠ Background search refresh failed for '%s': %s", search_query, e)
+        finally:
+            self.query_cache.end_refresh(cache_key)
+    
+    async def _run_search(self, search_query: str, max_results: int, log_extra: Dict) -> Optional[List[str]]:
+        """
+        Run the web search for result URLs: start the primary provider, and when
+        it fails (or comes back empty) fail over to the next one. With
+        SEARCH_HEDGING_ENABLED, the next provider is also started in parallel
+        if no good result has arrived within hedge_delay; the first non-empty
+        result wins and the rest are cancelled.
+        Returns None when every provider failed and fallback sources should be used
+        """
+        pending: Dict[asyncio.Task, SearchProvider] = {}
+        next_provider = 0
+        
+        def start_next(reason: Optional[str] = None):
+            nonlocal next_provider
+            provider = self.providers[next_provider]
+            next_provider += 1
+            if reason is not None:
+                self.provider_stats[provider.name][reason] += 1
+            task = asyncio.create_task(self._call_provider(provider, search_query, max_results, log_extra))
+            pending[task] = provider
+        
+        start_next()
+        try:
+            while pending:
+                can_hedge = self.hedging and next_provider < len(self.providers)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.info(
+                        "⏱ No search result after %.1fs, hedging with %s",
+                        self.hedge_delay, self.providers[next_provider].label,
+                        extra=log_extra
+                    )
+                    start_next("hedged")
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    search_results = task.result()
+                    if search_results:
+                        self.provider_stats[provider.name]["wins"] += 1
+                        return search_results
+                if not pending and next_provider < len(self.providers):
+                    # Everything in flight failed - go straight to the next provider
+                    logger.info(
+                        "↪ Failing over to %s",
+                        self.providers[next_provider].label,
+                        extra=log_extra
+                    )
+                    start_next("failovers")
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _call_provider(
+        self,
+        provider: SearchProvider,
+        search_query: str,
+        max_results: int,
+        log_extra: Dict
+    ) -> Optional[List[str]]:
+        """One provider call behind its rate limiter; returns None (logged) on any failure"""
+        with tracer.span("search.provider", provider=provider.name, query=search_query) as span:
+            stats = self.provider_stats[provider.name]
+            
+            # Rate limiting: take a token from the provider's bucket (FIFO across all requests)
+            rate_limiter = self.rate_limiters.get(provider.name)
+            try:
+                waited = await rate_limiter.acquire(max_wait=self.rate_limiters.max_wait)
+            except RateLimitTimeout as e:
+                stats["failures"] += 1
+                logger.warning(
+                    "⚠ %s: %s",
+                    provider.label, e,
+                    extra=log_extra
+                )
+                span.set_attribute("outcome", "rate_limit_timeout")
+                return None
+            span.set_attribute("rate_limit_wait_ms", round(waited * 1000, 1))
+            if waited > 0.01:
+                logger.debug(
+                    "⏳ Rate limiting: Waited %.2fs for a %s token",
+                    waited, provider.name,
+                    extra=log_extra
+                )
+            
             logger.info(
-                f"🔎 External: Google Search API | Query: '{search_query}' | Max results: {max_results}",
+                "🔎 External: %s | Query: '%s' | Max results: %s",
+                provider.label, search_query, max_results,
                 extra=log_extra
             )
             
+            stats["calls"] += 1
             search_start = time.time()
-            self.last_search_time = search_start
             try:
                 search_results = await asyncio.wait_for(
-                    asyncio.to_thread(lambda: list(google_search(search_query, num_results=max_results))),
-                    timeout=10.0  # 10 second timeout
+                    provider.search(search_query, max_results),
+                    timeout=self.provider_timeout
                 )
                 search_time = time.time() - search_start
+                rate_limiter.report_success()
                 logger.info(
-                    f"✓ Google Search API: Found {len(search_results)} URLs in {search_time:.3f}s",
-                    extra=log_extra
+                    "✓ %s: Found %s URLs in %.3fs",
+                    provider.label, len(search_results), search_time,
+                    extra={**log_extra, "stage": "search", "provider": provider.name, "seconds": round(search_time, 3)}
                 )
+                if not search_results:
+                    stats["failures"] += 1
+                span.set_attribute("outcome", "ok" if search_results else "empty")
+                span.set_attribute("urls", len(search_results))
+                return search_results
             except asyncio.TimeoutError:
                 search_time = time.time() - search_start
+                stats["failures"] += 1
                 logger.warning(
-                    f"⚠ Google Search API: Timeout after {search_time:.3f}s, using fallback sources",
+                    "⚠ %s: Timeout after %.3fs",
+                    provider.label, search_time,
                     extra=log_extra
                 )
-                sources = self._get_fallback_sources(query, category)
-                return sources[:max_results]
+                span.set_attribute("outcome", "timeout")
+                return None
             except Exception as search_error:
                 search_time = time.time() - search_start
+                stats["failures"] += 1
                 # Check if it's a rate limit error (429) or HTTP error
                 error_str = str(search_error)
                 error_type = type(search_error).__name__
-                
+            
                 # Check for HTTPError or rate limiting
                 is_rate_limit = (
+                    getattr(search_error, "rate_limited", False) or
                     "429" in error_str or 
                     "Too Many Requests" in error_str or
                     (hasattr(search_error, 'response') and 
                      hasattr(search_error.response, 'status_code') and 
                      search_error.response.status_code == 429)
                 )
-                
+            
                 if is_rate_limit:
+                    stats["rateLimited"] += 1
+                    PROVIDER_RATE_LIMITED.labels(provider.name).inc()
+                    rate_limiter.report_rate_limited()
                     logger.warning(
-                        f"⚠ Google Search API: Rate limited (429) after {search_time:.3f}s, using fallback sources. "
-                        f"Consider using SerpAPI or increasing min_search_interval.",
+                        "⚠ %s: Rate limited (429) after %.3fs. "
+                        "Consider adding another provider to SEARCH_PROVIDERS or lowering SEARCH_RATE_LIMIT_%s_RATE.",
+                        provider.label, search_time, provider.name.upper(),
                         extra=log_extra
                     )
                 else:
                     logger.warning(
-                        f"⚠ Google Search API: {error_type} after {search_time:.3f}s: {error_str[:150]}, using fallback sources",
+                        "⚠ %s: %s after %.3fs: %s",
+                        provider.label, error_type, search_time, error_str[:150],
                         extra=log_extra
                     )
-                sources = self._get_fallback_sources(query, category)
-                return sources[:max_results]
-            
-            # Option 2: Use SerpAPI (paid but more reliable)
-            # search_results = self._serp_search(search_query, max_results)
-            
-            # Fetch and parse each result
-            logger.info(
-                f"📥 Fetching {len(search_results[:max_results])} source pages...",
-                extra=log_extra
-            )
-            
-            for idx, url in enumerate(search_results[:max_results], 1):
-                try:
-                    source = await self._fetch_source_info(url, query, request_id=request_id)
-                    if source:
-                        sources.append(source)
-                        logger.debug(
-                            f"  [{idx}/{len(search_results[:max_results])}] ✓ {url[:60]}...",
-                            extra=log_extra
-                        )
-                except Exception as e:
-                    logger.warning(
-                        f"  [{idx}/{len(search_results[:max_results])}] ✗ Failed to fetch {url[:60]}...: {str(e)}",
-                        extra=log_extra
-                    )
-                    continue
-                    
-        except Exception as e:
-            logger.error(
-                f"✗ Search error: {str(e)}",
-                extra=log_extra,
-                exc_info=True
-            )
-            # Fallback to mock sources
-            sources = self._get_fallback_sources(query, category)
-        
-        # Sort by credibility
-        sources.sort(key=lambda x: x.get("credibility", 0), reverse=True)
-        
-        return sources[:max_results]
+                span.set_attribute("outcome", "rate_limited" if is_rate_limit else "error")
+                return None
     
     async def _fetch_source_info(self, url: str, query: str, request_id: Optional[str] = None) -> Dict | None:
+        """
+        Fetch and parse a single source (concurrent fetches of the same URL are
+        coalesced, and within a batch each URL is loaded at most once)
+        """
+        with tracer.span("fetch.source", url=url) as span:
+            batch = current_batch()
+            if batch is not None:
+                source = await batch.do("fetch", url, lambda: self.fetch_flight.do(url, lambda: self._load_source(url, request_id)))
+            else:
+                source = await self.fetch_flight.do(url, lambda: self._load_source(url, request_id))
+            span.set_attribute("found", source is not None)
+        if not source:
+            return None
+        source = dict(source)
+        # Scored on every use, not just on fetch, so cached sources follow list reloads
+        source["credibility"] = self._calculate_credibility(url, source["title"])
+        return source
+    
+    async def _load_source(self, url: str, request_id: Optional[str] = None) -> Dict | None:
         """Fetch and parse a single source"""
         log_extra = {"request_id": request_id} if request_id else {}
         fetch_start = time.time()
+        # Runs in the coalesced task, so this is the span of the fetch that started it
+        span = current_span() or NOOP_SPAN
+        
+        failure = self.source_cache.failure_reason(url)
+        if failure is not None:
+            span.set_attribute("cache", "negative")
+            logger.debug(
+                "  ⊘ Skipping recently failed %s... (%s)",
+                url[:60], failure,
+                extra=log_extra
+            )
+            return None
+        
+        cached = self.source_cache.lookup(url)
+        if cached is not None and self.source_cache.is_fresh(cached):
+            span.set_attribute("cache", "fresh")
+            logger.debug(
+                "  ⚡ Source cache hit %s...",
+                url[:60],
+                extra=log_extra
+            )
+            return self.source_cache.serve_fresh(cached)
+        
+        host = (urlsplit(url).hostname or "").lower()
+        decision = self.host_health.admit(host)
+        if decision != CLOSED:
+            span.set_attribute("host_health", decision)
+            HOST_CIRCUIT_DECISIONS.labels(decision).inc()
+        if decision == OPEN:
+            logger.debug(
+                "  ⊘ Skipping %s... (circuit open for %s)",
+                url[:60], host,
+                extra=log_extra
+            )
+            # A stale extract beats nothing while the host is down
+            return dict(cached["source"]) if cached is not None else None
+        # Slow hosts and probes get the short timeout
+        timeout = None if decision == CLOSED else self.host_health.short_timeout
+        # Host latency counts from when the fetch got its slots, not from when it started queueing for them
+        clock = FetchClock()
         
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (compatible; SearchBot/1.0)"
-            }
-            
             logger.debug(
-                f"  → HTTP GET {url[:60]}...",
+                "  → HTTP GET %s...%s",
+                url[:60], " (conditional)" if cached else "",
                 extra=log_extra
             )
             
-            response = requests.get(url, headers=headers, timeout=5)
-            fetch_time = time.time() - fetch_start
-            
-            response.raise_for_status()
+            async with self.fetcher.stream(
+                url, headers=self.source_cache.conditional_headers(cached), timeout=timeout, clock=clock
+            ) as response:
+                fetch_time = time.time() - fetch_start
+                
+                span.set_attribute("http.status_code", response.status_code)
+                if response.status_code == 304 and cached is not None:
+                    span.set_attribute("cache", "revalidated")
+                    logger.debug(
+                        "  ← HTTP 304 Not Modified | Time: %.3fs",
+                        fetch_time,
+                        extra=log_extra
+                    )
+                    self.host_health.record(host, clock.elapsed())
+                    return self.source_cache.mark_revalidated(url, cached)
+                
+                response.raise_for_status()
+                
+                # Read only as much of the body as it takes to find the title,
+                # meta description / first paragraph (capped at FETCH_MAX_BYTES)
+                fields, bytes_read = await extract_page_info(
+                    response.aiter_bytes(),
+                    response.headers.get("content-type"),
+                    self.fetcher.max_bytes
+                )
             
+            self.host_health.record(host, clock.elapsed())
+            span.set_attribute("bytes_read", bytes_read)
             logger.debug(
-                f"  ← HTTP {response.status_code} | Size: {len(response.content)} bytes | Time: {fetch_time:.3f}s",
+                "  ← HTTP %s | Read: %s bytes | Time: %.3fs",
+                response.status_code, bytes_read, time.time() - fetch_start,
                 extra=log_extra
             )
             
-            soup = BeautifulSoup(response.content, "html.parser")
-            
-            # Extract title
-            title = soup.find("title")
-            title_text = title.string if title else url
-            
-            # Extract meta description or first paragraph
-            meta_desc = soup.find("meta", attrs={"name": "description"})
-            snippet = meta_desc.get("content", "") if meta_desc else ""
-            
-            if not snippet:
-                # Fallback to first paragraph
-                first_p = soup.find("p")
-                snippet = first_p.get_text()[:200] if first_p else ""
+            title_text = fields["title"] or url
+            snippet = fields["snippet"]
             
             # Calculate credibility (simplified - could use ML model)
             credibility = self._calculate_credibility(url, title_text)
             
-            return {
+            source = {
                 "title": title_text,
                 "url": url,
                 "snippet": snippet[:300],  # Limit snippet length
                 "credibility": credibility
             }
+            self.source_cache.store(
+                url,
+                source,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified")
+            )
+            self.local_index.add(source)
+            return source
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             fetch_time = time.time() - fetch_start
             logger.debug(
-                f"  ✗ HTTP Error: {type(e).__name__} | Time: {fetch_time:.3f}s",
+                "  ✗ HTTP Error: %s | Time: %.3fs",
+                type(e).__name__, fetch_time,
                 extra=log_extra
             )
+            if clock.started is not None:
+                self.host_health.record(host, clock.elapsed(), host_failure(e))
+            # 4xx/5xx and timeouts: don't retry this URL until the negative entry expires
+            self.source_cache.store_failure(url, type(e).__name__)
             return None
         except Exception as e:
             fetch_time = time.time() - fetch_start
             logger.debug(
-                f"  ✗ Parsing error: {str(e)} | Time: {fetch_time:.3f}s",
+                "  ✗ Parsing error: %s | Time: %.3fs",
+                e, fetch_time,
                 extra=log_extra
             )
+            # The host answered; the page just wasn't usable
+            if clock.started is not None:
+                self.host_health.record(host, clock.elapsed())
             return None
     
     def _calculate_credibility(self, url: str, title: str) -> int:
         """
         Calculate credibility score (0-100)
-        Simple heuristic - could be improved with ML
+        From the domain reputation list (CREDIBILITY_LIST), most specific host suffix wins
         """
-        score = 50  # Base score
-        
-        # Boost for known domains
-        trusted_domains = [
-            "nytimes.com", "washingtonpost.com", "wsj.com",
-            "wikipedia.org", "github.com", "stackoverflow.com",
-            "reddit.com", "medium.com", "techcrunch.com"
-        ]
-        
-        for domain in trusted_domains:
-            if domain in url.lower():
-                score += 20
-                break
-        
-        # Boost for .edu, .gov
-        if ".edu" in url or ".gov" in url:
-            score += 15
-        
-        # Penalize suspicious domains
-        if any(x in url for x in [".xyz", ".tk", ".ml"]):
-            score -= 20
-        
-        return min(100, max(0, score))
+        return self.credibility.score(url)
     
     def _get_fallback_sources(self, query: str, category: str) -> List[Dict]:
         """Return fallback sources when search fails (rate limited or error)"""
@@ -258,20 +779,3 @@ class SearchEngine:
             })
         
         return sources
-    
-    def _serp_search(self, query: str, max_results: int) -> List[str]:
-        """Use SerpAPI for better search results (requires API key)"""
-        if not self.serp_api_key:
-            return []
-        
-        import serpapi
-        
-        search = serpapi.GoogleSearch({
-            "q": query,
-            "api_key": self.serp_api_key,
-            "num": max_results
-        })
-        
-        results = search.get_dict()
-        return [r.get("link", "") for r in results.get("organic_results", [])]
-
@@ -0,0 +1,258 @@
+"""
+Search Jobs
+Asynchronous search jobs: submit returns straight away, a background worker
+pool runs the pipeline, and clients poll for partial and final results
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.search_models import SearchRequestPayload, SearchResultPayload
+from services.tracing import tracer, current_span, NOOP_SPAN
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting for a worker"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobFailed(Exception):
+    """Raised by a job runner to fail the job with a specific HTTP-style status"""
+
+    def __init__(self, message: str, status: int = 500, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _timestamp(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class SearchJob:
+    def __init__(self, job_id: str, request: SearchRequestPayload, request_id: str):
+        self.id = job_id
+        self.request = request
+        self.request_id = request_id
+        self.status = QUEUED
+        self.sources: List[Dict] = []  # partial results, in fetch completion order
+        self.result: Optional[SearchResultPayload] = None
+        self.error: Optional[Dict] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # (trace_id, span_id, sampled) of the submitting request, so the run joins its trace
+        span = current_span()
+        self.trace_parent = (span.trace_id, span.span_id, True) if span is not None and span.sampled else None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def add_source(self, source: Dict):
+        self.sources.append(source)
+
+    def to_dict(self, ttl: float) -> Dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "createdAt": _timestamp(self.created_at),
+            "startedAt": _timestamp(self.started_at),
+            "finishedAt": _timestamp(self.finished_at),
+            "expiresAt": _timestamp(self.finished_at + ttl) if self.finished_at else None,
+            "sources": self.sources,
+            "result": self.result.model_dump() if self.result is not None else None,
+            "error": self.error,
+        }
+
+
+class SearchJobManager:
+    """
+    Jobs are keyed by the payload's `id`, so a client that retries a submit
+    (e.g. after a dropped mobile connection) gets the existing job back
+    instead of starting the pipeline again. Only a failed job is re-run.
+
+    JOBS_WORKERS workers pull from a bounded FIFO queue; finished jobs are
+    kept for JOBS_TTL seconds (and at most JOBS_MAX_RETAINED of them) so
+    clients can come back for the result.
+    """
+
+    def __init__(self, runner: Callable[[SearchJob], Awaitable[SearchResultPayload]]):
+        self.runner = runner
+        self.workers = int(os.getenv("JOBS_WORKERS", "4"))
+        self.max_queued = int(os.getenv("JOBS_MAX_QUEUED", "256"))
+        self.ttl = float(os.getenv("JOBS_TTL", "3600"))
+        self.max_retained = int(os.getenv("JOBS_MAX_RETAINED", "10000"))
+        self.cleanup_interval = float(os.getenv("JOBS_CLEANUP_INTERVAL", "60"))
+        # Runs of a job shed by overload; at least one, or jobs would finish without ever running
+        self.max_attempts = max(1, int(os.getenv("JOBS_MAX_ATTEMPTS", "3")))
+
+        self._jobs: "OrderedDict[str, SearchJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._last_cleanup = time.monotonic()
+        self._avg_run_time = 20.0
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.expired = 0
+
+    def _ensure_workers(self):
+        # Started on first use: there's no running event loop at import time
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._worker_tasks = [t for t in self._worker_tasks if not t.done()]
+        while len(self._worker_tasks) < self.workers:
+            # A fresh context: otherwise every worker inherits the span of the request that started it
+            self._worker_tasks.append(asyncio.create_task(self._worker(), context=contextvars.Context()))
+
+    def submit(self, request: SearchRequestPayload, request_id: str) -> Tuple[SearchJob, bool]:
+        """Returns (job, created). Raises JobQueueFull when the backlog is at max_queued."""
+        self.cleanup()
+        job = self._jobs.get(request.id)
+        if job is not None and job.status != FAILED:
+            self.deduplicated += 1
+            return job, False
+
+        self._ensure_workers()
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} search jobs are already queued", self.retry_after())
+
+        job = SearchJob(request.id, request, request_id)
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job, True
+
+    def get(self, job_id: str) -> Optional[SearchJob]:
+        self.cleanup()
+        return self._jobs.get(job_id)
+
+    def retry_after(self) -> int:
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return max(1, int(self._avg_run_time * (queued + 1) / max(1, self.workers)))
+
+    def cleanup(self, force: bool = False):
+        """Drop finished jobs past their TTL, and the oldest finished ones beyond max_retained"""
+        now = time.monotonic()
+        if not force and now - self._last_cleanup < self.cleanup_interval and len(self._jobs) <= self.max_retained:
+            return
+        self._last_cleanup = now
+
+        cutoff = time.time() - self.ttl
+        overflow = len(self._jobs) - self.max_retained
+        for job_id, job in list(self._jobs.items()):
+            if not job.finished:
+                continue
+            if job.finished_at < cutoff or overflow > 0:
+                del self._jobs[job_id]
+                overflow -= 1
+                self.expired += 1
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: SearchJob):
+        # Unsampled submits stay unsampled: jobs don't start traces of their own
+        span = NOOP_SPAN
+        if job.trace_parent is not None:
+            span = tracer.start_span("search.job", {"job_id": job.id}, traceparent=job.trace_parent)
+        try:
+            with tracer.activate(span):
+                await self._run_job(job)
+        finally:
+            span.set_attribute("status", job.status)
+            span.end()
+
+    async def _run_job(self, job: SearchJob):
+        log_extra = {"request_id": job.request_id}
+        job.status = RUNNING
+        job.started_at = time.time()
+        logger.info(
+            "⚙ Job %s started (waited %.3fs in queue)",
+            job.id, job.started_at - job.created_at,
+            extra=log_extra
+        )
+        try:
+            job.result = await self.runner(job)
+            job.status = SUCCEEDED
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = {"status": 503, "detail": "Server shutting down"}
+            self.failed += 1
+            raise
+        except JobFailed as e:
+            job.status = FAILED
+            job.error = {"status": e.status, "detail": str(e)}
+            if e.retry_after is not None:
+                job.error["retryAfter"] = e.retry_after
+            self.failed += 1
+        except Exception as e:
+            logger.error(
+                "✗ Job %s failed: %s",
+                job.id, e,
+                extra=log_extra,
+                exc_info=True
+            )
+            job.status = FAILED
+            job.error = {"status": 500, "detail": f"Search processing failed: {str(e)}"}
+            self.failed += 1
+        finally:
+            job.finished_at = time.time()
+            run_time = job.finished_at - job.started_at
+            self._avg_run_time = 0.8 * self._avg_run_time + 0.2 * run_time
+            logger.info(
+                "%s Job %s %s in %.3fs",
+                "✓" if job.status == SUCCEEDED else "✗", job.id, job.status, run_time,
+                extra=log_extra
+            )
+
+    async def aclose(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def stats(self) -> Dict:
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "queued": counts[QUEUED],
+            "running": counts[RUNNING],
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "expired": self.expired,
+            "avgRunSeconds": round(self._avg_run_time, 3),
+        }
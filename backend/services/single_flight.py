@@ -0,0 +1,60 @@
+"""
+Single-flight request coalescing
+Concurrent callers asking for the same key share one in-flight computation
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it's running await the same task instead of repeating it.
+
+    Because the work isn't running in the leader's task, the leader's client
+    disconnecting only removes one waiter. The shared task is cancelled once
+    every waiter has gone away, and a cancelled task is forgotten immediately
+    so later callers start fresh instead of inheriting the cancellation.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # key -> [task, number of callers awaiting it]
+        self._calls: Dict[Hashable, List] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = [asyncio.ensure_future(fn()), 0]
+            self._calls[key] = call
+            call[0].add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call[1] += 1
+        try:
+            # shield: cancelling this caller must not cancel the shared task
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                self.abandoned += 1
+                self._forget(key, call)
+                call[0].cancel()
+
+    def _forget(self, key: Hashable, call: List):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "inFlight": len(self._calls),
+        }
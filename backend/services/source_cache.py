@@ -0,0 +1,121 @@
+"""
+Source Cache
+Per-URL cache of extracted {title, snippet, credibility} with HTTP conditional
+revalidation (ETag / Last-Modified) and a negative cache for failing URLs
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+from services.lru_cache import LRUCache
+
+ENTRY_OVERHEAD_BYTES = 256  # rough per-entry cost of the dicts/keys around the strings
+
+
+def _entry_size(entry: Dict) -> int:
+    source = entry["source"]
+    return (
+        ENTRY_OVERHEAD_BYTES
+        + len(source.get("url", ""))
+        + len(source.get("title") or "")
+        + len(source.get("snippet") or "")
+        + len(entry.get("etag") or "")
+        + len(entry.get("last_modified") or "")
+    )
+
+
+class SourceCache:
+    """
+    Entries stay fresh for SOURCE_CACHE_FRESH_TTL seconds and are served without
+    touching the network. After that they're kept (up to SOURCE_CACHE_MAX_AGE)
+    so the next fetch can be a conditional GET - a 304 just renews freshness.
+    URLs that errored or timed out are remembered for SOURCE_CACHE_NEGATIVE_TTL
+    seconds so we don't pay their timeout on every query.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SOURCE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.fresh_ttl = float(os.getenv("SOURCE_CACHE_FRESH_TTL", "900"))
+        self.max_age = float(os.getenv("SOURCE_CACHE_MAX_AGE", "86400"))
+        self.negative_ttl = float(os.getenv("SOURCE_CACHE_NEGATIVE_TTL", "300"))
+        max_entries = int(os.getenv("SOURCE_CACHE_MAX_ENTRIES", "20000"))
+
+        self._entries = LRUCache(
+            max_entries=max_entries,
+            max_bytes=int(os.getenv("SOURCE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            sizeof=_entry_size
+        )
+        self._failures = LRUCache(max_entries=max_entries)
+
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.negative_hits = 0
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Cached entry for url (fresh or due for revalidation), or None"""
+        if not self.enabled:
+            return None
+        return self._entries.get(url)
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return entry["fresh_until"] > time.monotonic()
+
+    def serve_fresh(self, entry: Dict) -> Dict:
+        self.fresh_hits += 1
+        return dict(entry["source"])
+
+    def failure_reason(self, url: str) -> Optional[str]:
+        """Why url is in the negative cache, or None if it isn't"""
+        if not self.enabled:
+            return None
+        reason = self._failures.get(url)
+        if reason is not None:
+            self.negative_hits += 1
+        return reason
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, source: Dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        if not self.enabled:
+            return
+        self._failures.pop(url)
+        self._entries.set(url, {
+            "source": dict(source),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh_until": time.monotonic() + self.fresh_ttl,
+        }, ttl=self.max_age)
+
+    def mark_revalidated(self, url: str, entry: Dict) -> Dict:
+        """Server answered 304 Not Modified - renew freshness and serve the cached extract"""
+        self.revalidated += 1
+        entry["fresh_until"] = time.monotonic() + self.fresh_ttl
+        self._entries.set(url, entry, ttl=self.max_age)
+        return dict(entry["source"])
+
+    def store_failure(self, url: str, reason: str):
+        if not self.enabled:
+            return
+        self._failures.set(url, reason, ttl=self.negative_ttl)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._entries.bytes_used,
+            "evictions": self._entries.evictions,
+            "freshHits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "misses": self._entries.misses,
+            "negativeEntries": len(self._failures),
+            "negativeHits": self.negative_hits,
+        }
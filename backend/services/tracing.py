@@ -0,0 +1,382 @@
+"""
+Tracing
+Lightweight hierarchical spans (middleware -> language detection -> search
+providers -> page fetches -> prompt building -> OpenAI), exported as JSONL or
+OTLP/JSON
+
+The current span lives in a contextvar, so it follows the request into tasks
+created with asyncio.create_task / ensure_future and into asyncio.to_thread
+offloads without being passed around by hand.
+
+View a JSONL export as a timing tree (from backend/):
+    python -m services.tracing traces.jsonl               # slowest 5 traces
+    python -m services.tracing traces.jsonl <trace id>
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "searchbot-backend"
+
+
+class Span:
+    """One timed operation. Only sampled traces create these; the rest get NOOP_SPAN."""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "error")
+
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            self.status = "cancelled"
+        else:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._on_end(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns,
+            "end": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in for spans of unsampled traces: every call is a no-op"""
+
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    """The active span (NOOP_SPAN inside an unsampled trace, None outside any trace)"""
+    return _current_span.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """W3C traceparent "00-<trace id>-<parent id>-<flags>" -> (trace_id, parent_id, sampled)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class Tracer:
+    """
+    Sampling is decided once per trace, at the root span: TRACE_SAMPLE_RATE of
+    root spans record, and every span below an unsampled root is the shared
+    NOOP_SPAN, so tracing costs a contextvar lookup when it's off. The sampled
+    flag of an incoming traceparent header is only followed with
+    TRACE_TRUST_PARENT=true (callers behind a trusted proxy); otherwise any
+    client could make every request it sends write spans.
+
+    Finished spans are buffered in memory (bounded; the oldest are dropped)
+    and written in batches by a background task: appended to TRACE_FILE as
+    JSONL (rotated to TRACE_FILE.1 at TRACE_FILE_MAX_BYTES), or POSTed as
+    OTLP/JSON to TRACE_OTLP_ENDPOINT.
+    """
+
+    def __init__(self):
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.0"))
+        self.trust_parent = os.getenv("TRACE_TRUST_PARENT", "false").lower() == "true"
+        self.exporter = os.getenv("TRACE_EXPORTER", "jsonl").lower()  # jsonl | otlp
+        self.file_path = os.getenv("TRACE_FILE", "traces.jsonl")
+        self.file_max_bytes = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.otlp_endpoint = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+        self.export_interval = float(os.getenv("TRACE_EXPORT_INTERVAL", "2.0"))
+        self.max_queue = int(os.getenv("TRACE_MAX_QUEUE", "10000"))
+        self.batch_size = int(os.getenv("TRACE_BATCH_SIZE", "512"))
+
+        self._buffer: Deque[Span] = deque()
+        self._export_task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.started = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+        self.rotations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.trust_parent
+
+    def start_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Any = None,
+        traceparent: Optional[Tuple[str, str, bool]] = None
+    ):
+        """
+        Start a span without making it current (for async generators, where a
+        contextvar set before a yield would leak into the consumer). parent
+        defaults to the current span; traceparent continues a remote trace.
+        """
+        if parent is None:
+            parent = _current_span.get()
+        if parent is not None and traceparent is None:
+            if not parent.sampled:
+                return NOOP_SPAN
+            return self._new_span(name, parent.trace_id, parent.span_id, attributes)
+
+        # Root span: this is where the sampling decision is made
+        if traceparent is not None:
+            trace_id, parent_id, parent_sampled = traceparent
+        else:
+            trace_id, parent_id, parent_sampled = None, None, False
+        if parent_sampled and self.trust_parent:
+            sampled = True
+        else:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            return NOOP_SPAN
+        return self._new_span(name, trace_id or f"{random.getrandbits(128):032x}", parent_id, attributes)
+
+    def _new_span(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]]) -> Span:
+        self.started += 1
+        return Span(self, name, trace_id, parent_id, dict(attributes) if attributes else {})
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Start a span, make it current for the block, end it (recording any exception) on exit"""
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def activate(self, span):
+        """Make an already-started span current for the block (doesn't end it)"""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    def _on_end(self, span: Span):
+        if len(self._buffer) >= self.max_queue:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(span)
+        if self._export_task is None or self._export_task.done():
+            try:
+                self._export_task = asyncio.get_running_loop().create_task(self._export_loop())
+            except RuntimeError:
+                pass  # no event loop (scripts, threads): flushed by the next span ended on the loop
+
+    async def _export_loop(self):
+        # Its own context copy: spans started while exporting must not join a request's trace
+        _current_span.set(NOOP_SPAN)
+        while self._buffer:
+            await asyncio.sleep(self.export_interval)
+            await self.flush()
+
+    async def flush(self):
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            try:
+                if self.exporter == "otlp":
+                    await self._export_otlp(batch)
+                else:
+                    await asyncio.to_thread(self._export_jsonl, batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                self.dropped += len(batch)
+                logger.warning("⚠ Trace export (%s) failed, dropped %s spans: %s", self.exporter, len(batch), e)
+
+    def _export_jsonl(self, batch: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in batch)
+        try:
+            size = os.path.getsize(self.file_path)
+        except OSError:
+            size = 0
+        if size and size + len(lines) > self.file_max_bytes:
+            # Keep one previous file, so the export never takes more than twice TRACE_FILE_MAX_BYTES
+            os.replace(self.file_path, self.file_path + ".1")
+            self.rotations += 1
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def _export_otlp(self, batch: List[Span]):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+        response = await self._client.post(self.otlp_endpoint, json=to_otlp(batch))
+        response.raise_for_status()
+
+    async def aclose(self):
+        """Export whatever is buffered (called on app shutdown)"""
+        if self._export_task is not None:
+            self._export_task.cancel()
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        return {
+            "sampleRate": self.sample_rate,
+            "trustParent": self.trust_parent,
+            "exporter": self.exporter,
+            "started": self.started,
+            "buffered": len(self._buffer),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "exportErrors": self.export_errors,
+            "fileRotations": self.rotations,
+        }
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(batch: List[Span]) -> Dict:
+    """OTLP/JSON ExportTraceServiceRequest body for a batch of spans"""
+    spans = []
+    for span in batch:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "searchbot"}, "spans": spans}],
+        }]
+    }
+
+
+tracer = Tracer()
+
+
+def format_trace_tree(spans: List[Dict]) -> str:
+    """Indented timing tree of one trace's JSONL span records"""
+    children: Dict[Optional[str], List[Dict]] = {}
+    ids = {span["spanId"] for span in spans}
+    for span in spans:
+        parent = span.get("parentSpanId") if span.get("parentSpanId") in ids else None
+        children.setdefault(parent, []).append(span)
+    start = min(span["start"] for span in spans)
+    lines = []
+
+    def walk(parent: Optional[str], depth: int):
+        for span in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            offset = (span["start"] - start) / 1e6
+            attributes = " ".join(f"{k}={v}" for k, v in span["attributes"].items())
+            status = "" if span["status"] == "ok" else f" [{span['status']}]"
+            lines.append(f"{offset:>9.1f} ms {span['durationMs']:>9.1f} ms  {'  ' * depth}{span['name']}{status}  {attributes}")
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main(argv: List[str]):
+    if not argv:
+        print(__doc__)
+        return
+    traces: Dict[str, List[Dict]] = {}
+    with open(argv[0], encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            traces.setdefault(span["traceId"], []).append(span)
+    if len(argv) > 1:
+        selected = [argv[1]]
+    else:
+        def total(trace_id):
+            spans = traces[trace_id]
+            return max(s["end"] for s in spans) - min(s["start"] for s in spans)
+        selected = sorted(traces, key=total, reverse=True)[:5]
+    for trace_id in selected:
+        print(f"trace {trace_id}")
+        print(format_trace_tree(traces[trace_id]))
+        print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,35 @@
+import os
+import sys
+import asyncio
+import inspect
+
+import pytest
+
+# Tests import the app's packages the way main.py does (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run `async def` tests, each on a fresh event loop"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**kwargs))
+    return True
+
+
+@pytest.fixture
+def configured(monkeypatch):
+    """
+    configured(Service, *args, SETTING=value, ...) sets the environment
+    variables (None unsets one) and returns Service(*args), which reads them
+    """
+    def build(factory, *args, **env):
+        for key, value in env.items():
+            if value is None:
+                monkeypatch.delenv(key, raising=False)
+            else:
+                monkeypatch.setenv(key, str(value))
+        return factory(*args)
+    return build
@@ -0,0 +1,125 @@
+import time
+import asyncio
+from functools import partial
+
+import pytest
+
+from services.admission import PRIORITIES, AdmissionController, AdmissionRejected
+from services.deadline import Deadline, deadline_scope
+from services.metrics import ADMISSION_WAIT_SECONDS, MetricsRegistry
+
+
+async def test_runs_at_most_max_concurrency(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=2)
+    running, peak = 0, 0
+
+    async def search():
+        nonlocal running, peak
+        async with admission.admit("normal"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(search() for _ in range(6)))
+    assert peak == 2
+    assert admission.active == 0
+    assert admission.admitted["normal"] == 6
+
+
+async def test_full_queue_is_rejected_with_retry_after(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_QUEUE_SIZE_LOW=1)
+    held = await admission.acquire("low")
+    queued = asyncio.create_task(admission.acquire("low"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await admission.acquire("low")
+    assert excinfo.value.retry_after >= 1
+    assert admission.rejected["low"] == 1
+    with pytest.raises(AdmissionRejected):
+        admission.check_capacity("low")
+
+    admission.release(held)
+    admission.release(await queued)
+    assert admission.active == 0
+    assert admission.queue_depth("low") == 0
+
+
+async def test_queue_deadline_expires_and_frees_the_place(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_QUEUE_DEADLINE_NORMAL=0.05)
+    held = await admission.acquire("normal")
+    with pytest.raises(AdmissionRejected):
+        await admission.acquire("normal")
+    assert admission.expired["normal"] == 1
+    assert admission.queue_depth("normal") == 0
+    admission.release(held)
+    assert admission.active == 0
+
+
+async def test_queue_wait_is_capped_by_the_request_deadline(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_QUEUE_DEADLINE_LOW=30)
+    held = await admission.acquire("low")
+    start = time.monotonic()
+    with deadline_scope(Deadline(0.05, gather_share=0.4)):
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire("low")
+    assert time.monotonic() - start < 1.0
+    admission.release(held)
+
+
+async def test_cancelled_waiter_leaves_the_queue(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1)
+    held = await admission.acquire("normal")
+    queued = asyncio.create_task(admission.acquire("normal"))
+    await asyncio.sleep(0)
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert admission.queue_depth("normal") == 0
+    admission.release(held)
+    assert admission.active == 0
+
+
+async def test_urgent_goes_first_without_starving_low(configured):
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_WEIGHTS="urgent=3,normal=1,low=1")
+    held = await admission.acquire("normal")
+    order = []
+
+    async def search(priority):
+        async with admission.admit(priority):
+            order.append(priority)
+            await asyncio.sleep(0)
+
+    tasks = []
+    for priority in ["low"] * 4 + ["urgent"] * 4:
+        tasks.append(asyncio.create_task(search(priority)))
+        await asyncio.sleep(0)
+    admission.release(held)
+    await asyncio.gather(*tasks)
+
+    assert order[0] == "urgent"
+    assert order.index("low") < 4  # low gets a turn long before the urgent queue is empty
+    assert sorted(order) == sorted(["low"] * 4 + ["urgent"] * 4)
+
+
+async def test_queue_depth_and_wait_are_exported(configured):
+    registry = MetricsRegistry(prefix="test")
+    depth = registry.gauge("admission_queue_depth", "Queued", ["priority"])
+    admission = configured(AdmissionController, ADMISSION_MAX_CONCURRENCY=1)
+    for priority in PRIORITIES:
+        depth.set_function(partial(admission.queue_depth, priority), priority)
+    waits_before = ADMISSION_WAIT_SECONDS.labels("low").count
+
+    held = await admission.acquire("normal")
+    queued = [asyncio.create_task(admission.acquire("low")) for _ in range(2)]
+    await asyncio.sleep(0)
+    lines = registry.render().splitlines()
+    assert 'test_admission_queue_depth{priority="low"} 2' in lines
+    assert 'test_admission_queue_depth{priority="urgent"} 0' in lines
+
+    admission.release(held)
+    admission.release(await queued[0])
+    admission.release(await queued[1])
+    assert ADMISSION_WAIT_SECONDS.labels("low").count - waits_before == 2
+    assert 'test_admission_queue_depth{priority="low"} 0' in registry.render().splitlines()
@@ -0,0 +1,80 @@
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from models.search_models import SearchRequestPayload
+from services.ai_service import AIService
+from services.metrics import OPENAI_TOKENS
+
+COMPLETION = json.dumps({
+    "summary": "Descale with vinegar",
+    "steps": [{"id": "1", "title": "Fill", "description": "Half vinegar, half water"}],
+    "decisionFactors": [],
+    "recommendedActions": ["Rinse twice"],
+    "estimatedTimeMinutes": 30,
+    "difficulty": "easy",
+})
+
+REQUEST = SearchRequestPayload(id="1", description="how to descale a kettle", category="home", priority="normal",
+                               createdAt="2024-01-01T00:00:00Z")
+
+
+def sse(events) -> bytes:
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode() + b"data: [DONE]\n\n"
+
+
+def openai_stub(report_usage: bool, seen: list) -> AsyncOpenAI:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        seen.append(body)
+        events = [
+            {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+             "choices": [{"index": 0, "delta": {"content": COMPLETION[i:i + 20]}, "finish_reason": None}]}
+            for i in range(0, len(COMPLETION), 20)
+        ]
+        if report_usage and body.get("stream_options", {}).get("include_usage"):
+            events.append({"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "stub", "choices": [],
+                           "usage": {"prompt_tokens": 120, "completion_tokens": 45, "total_tokens": 165}})
+        return httpx.Response(200, content=sse(events), headers={"Content-Type": "text/event-stream"})
+
+    return AsyncOpenAI(api_key="test", base_url="http://openai.test/v1",
+                       http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def tokens(kind: str) -> float:
+    return OPENAI_TOKENS.labels(kind).value
+
+
+@pytest.fixture
+def service(configured):
+    return configured(AIService, OPENAI_API_KEY="test", OPENAI_BASE_URL=None)
+
+
+async def run_stream(service):
+    events = [event async for event in service.stream_research_result(REQUEST, [])]
+    assert events[-1][0] == "result"
+    return events
+
+
+async def test_stream_requests_and_records_usage(service):
+    seen = []
+    service.client = openai_stub(report_usage=True, seen=seen)
+    prompt_before, completion_before = tokens("prompt"), tokens("completion")
+
+    await run_stream(service)
+    assert seen[0]["stream"] is True
+    assert seen[0]["stream_options"] == {"include_usage": True}
+    assert tokens("prompt") - prompt_before == 120
+    assert tokens("completion") - completion_before == 45
+
+
+async def test_stream_without_usage_is_counted_locally(service):
+    service.client = openai_stub(report_usage=False, seen=[])
+    prompt_before, completion_before = tokens("prompt"), tokens("completion")
+
+    await run_stream(service)
+    counter = service.prompt_packer.counter
+    assert tokens("completion") - completion_before == counter.count(COMPLETION)
+    assert tokens("prompt") - prompt_before > 50
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from services.deadline import Deadline, DeadlinePolicy, current_deadline, deadline_scope
+
+
+def test_budget_by_priority(configured):
+    deadlines = configured(DeadlinePolicy, DEADLINE_URGENT=5, DEADLINE_LOW=50)
+    assert deadlines.for_request("urgent").budget == 5
+    assert deadlines.for_request("LOW").budget == 50
+    assert deadlines.for_request("unknown").budget == 30.0
+    assert deadlines.for_request(None).source == "priority"
+
+
+@pytest.mark.parametrize("header, budget", [("10", 10.0), ("0.1", 2.0), ("9999", 120.0), ("soon", 30.0)])
+def test_header_is_clamped(configured, header, budget):
+    deadline = configured(DeadlinePolicy).for_request("normal", header)
+    assert deadline.budget == budget
+    assert deadline.source == ("priority" if header == "soon" else "header")
+
+
+def test_disabled_gives_no_deadline(configured):
+    deadlines = configured(DeadlinePolicy, DEADLINE_ENABLED="false")
+    assert deadlines.for_request("normal", "10") is None
+    with deadline_scope(None) as deadline:
+        assert deadline is None
+        assert current_deadline() is None
+
+
+def test_gather_share_is_bounded(configured):
+    assert configured(DeadlinePolicy, DEADLINE_GATHER_SHARE=5).gather_share == 0.9
+    assert configured(DeadlinePolicy, DEADLINE_GATHER_SHARE=0).gather_share == 0.1
+    deadline = Deadline(10.0, gather_share=0.4)
+    assert 3.9 < deadline.gather_remaining() <= 4.0
+    assert 9.9 < deadline.remaining() <= 10.0
+
+
+def test_cap_and_degraded_reasons():
+    deadline = Deadline(1.0, gather_share=0.5)
+    assert deadline.cap(30) <= 1.0
+    assert deadline.cap(0.2) == 0.2
+    assert deadline.cap(None) <= 1.0
+    deadline.mark_degraded("search_timeout")
+    deadline.mark_degraded("search_timeout")
+    deadline.mark_degraded("fetch_budget")
+    assert deadline.to_dict()["degraded"] == ["search_timeout", "fetch_budget"]
+
+
+async def test_scope_is_per_task():
+    seen = {}
+
+    async def request(name, budget):
+        with deadline_scope(Deadline(budget, gather_share=0.4)):
+            await asyncio.sleep(0)
+            seen[name] = current_deadline().budget
+
+    await asyncio.gather(request("a", 5.0), request("b", 7.0))
+    assert seen == {"a": 5.0, "b": 7.0}
+    assert current_deadline() is None
@@ -0,0 +1,107 @@
+import pytest
+
+import services.host_health as host_health
+from services.host_health import CLOSED, HALF_OPEN, OPEN, SLOW, HostHealthRegistry
+
+HOST = "flaky.example"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(host_health.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def registry(configured):
+    return configured(
+        HostHealthRegistry,
+        HOST_HEALTH_ENABLED="true",
+        HOST_HEALTH_ALPHA=0.3,
+        HOST_HEALTH_MIN_SAMPLES=3,
+        HOST_HEALTH_FAILURE_RATE=0.5,
+        HOST_HEALTH_SLOW_SECONDS=2.0,
+        HOST_HEALTH_OPEN_SECONDS=30,
+        HOST_HEALTH_MAX_OPEN_SECONDS=100,
+    )
+
+
+def open_circuit(registry):
+    for _ in range(3):
+        assert registry.admit(HOST) == CLOSED
+        registry.record(HOST, 0.1, "timeout")
+    assert registry.hosts()[0]["state"] == OPEN
+
+
+def test_unknown_host_is_closed(registry, clock):
+    assert registry.admit(HOST) == CLOSED
+
+
+def test_opens_after_min_samples_of_failures(registry, clock):
+    registry.record(HOST, 0.1, "timeout")
+    registry.record(HOST, 0.1, "timeout")
+    assert registry.admit(HOST) == CLOSED  # not enough samples yet
+    registry.record(HOST, 0.1, "timeout")
+    assert registry.admit(HOST) == OPEN
+    assert registry.stats()["opens"] == 1
+
+
+def test_successes_keep_it_closed(registry, clock):
+    for failure in ("timeout", None, None, "http_503", None, None):
+        registry.record(HOST, 0.1, failure)
+    assert registry.admit(HOST) == CLOSED
+
+
+def test_slow_host_gets_short_timeout(registry, clock):
+    for _ in range(3):
+        registry.record(HOST, 3.0)
+    assert registry.admit(HOST) == SLOW
+    assert registry.stats()["states"]["slow"] == 1
+
+
+def test_single_probe_after_cooldown_then_close(registry, clock):
+    open_circuit(registry)
+    clock.now += 29
+    assert registry.admit(HOST) == OPEN
+    clock.now += 2
+    assert registry.admit(HOST) == HALF_OPEN
+    assert registry.admit(HOST) == OPEN  # only one probe at a time
+    registry.record(HOST, 0.2)
+    assert registry.admit(HOST) == CLOSED
+    assert registry.stats()["recoveries"] == 1
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(registry, clock):
+    open_circuit(registry)
+    clock.now += 31
+    assert registry.admit(HOST) == HALF_OPEN
+    registry.record(HOST, 2.0, "timeout")
+    assert registry.hosts()[0]["reopensIn"] == 60
+    clock.now += 61
+    assert registry.admit(HOST) == HALF_OPEN
+    registry.record(HOST, 2.0, "timeout")
+    assert registry.hosts()[0]["reopensIn"] == 100  # capped at HOST_HEALTH_MAX_OPEN_SECONDS
+
+
+def test_stale_probe_lets_another_through(registry, clock):
+    open_circuit(registry)
+    clock.now += 31
+    assert registry.admit(HOST) == HALF_OPEN
+    clock.now += host_health.PROBE_STALE_SECONDS + 1
+    assert registry.admit(HOST) == HALF_OPEN
+
+
+def test_disabled_registry_always_closed(registry, clock):
+    registry.enabled = False
+    for _ in range(5):
+        registry.record(HOST, 0.1, "timeout")
+    assert registry.admit(HOST) == CLOSED
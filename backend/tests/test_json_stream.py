@@ -0,0 +1,69 @@
+import json
+import random
+
+import pytest
+
+from services.json_stream import IncrementalJSONParser
+
+KEYS = ["steps", "decisionFactors", "recommendedActions"]
+
+DOCUMENT = {
+    "summary": 'A summary with "quotes", a \\ backslash, [brackets] and {braces}. ' * 20,
+    "steps": [{"id": f"step-{i}", "title": f"Step {i}", "description": "Do it, then {check} [it]. " * 5} for i in range(8)],
+    "decisionFactors": [{"id": "f", "label": "Cost", "detail": '"quoted" \\ back'}],
+    "recommendedActions": ["first, do this", 'then "that"', "done"],
+    "estimatedTimeMinutes": 15,
+    "scores": [1, 2.5, True, None],
+}
+
+
+def expected_events():
+    return [(key, value) for key in KEYS for value in DOCUMENT[key]]
+
+
+def chunked(text: str, rng: random.Random):
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        yield text[i:i + size]
+        i += size
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_elements_emitted_regardless_of_chunking(seed):
+    text = json.dumps(DOCUMENT, indent=2 if seed % 2 else None)
+    parser = IncrementalJSONParser(KEYS)
+    events = []
+    for chunk in chunked(text, random.Random(seed)):
+        events.extend(parser.feed(chunk))
+    assert events == expected_events()
+    assert parser.text == text
+    assert json.loads(parser.text) == DOCUMENT
+
+
+def test_character_at_a_time():
+    text = json.dumps(DOCUMENT)
+    parser = IncrementalJSONParser(KEYS)
+    events = []
+    for c in text:
+        events.extend(parser.feed(c))
+    assert events == expected_events()
+
+
+def test_scalar_elements_of_watched_array():
+    parser = IncrementalJSONParser(["scores"])
+    events = []
+    for c in json.dumps({"scores": [1, 2.5, True, None, "x"]}):
+        events.extend(parser.feed(c))
+    assert events == [("scores", 1), ("scores", 2.5), ("scores", True), ("scores", None), ("scores", "x")]
+
+
+def test_buffer_holds_only_the_open_element():
+    parser = IncrementalJSONParser(KEYS)
+    text = json.dumps({"summary": "x" * 100_000, "steps": [{"id": str(i), "title": "t" * 50} for i in range(2000)]})
+    longest = 0
+    for chunk in chunked(text, random.Random(0)):
+        parser.feed(chunk)
+        longest = max(longest, len(parser._buffer))
+    assert longest < 200
+    assert parser.text == text
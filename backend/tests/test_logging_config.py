@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+from services.logging_config import JSONFormatter, NonBlockingQueueHandler, RequestIDFilter
+
+
+def queued_logger(name: str, max_size: int = 100):
+    handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_size=max_size)
+    handler.addFilter(RequestIDFilter())
+    logger = logging.getLogger(f"test.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, handler
+
+
+def drain(handler, formatter=None):
+    stream = io.StringIO()
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(formatter or logging.Formatter("%(request_id)s %(message)s"))
+    listener = logging.handlers.QueueListener(handler.queue, writer)
+    listener.start()
+    listener.stop()
+    return stream.getvalue().splitlines()
+
+
+def test_scalar_args_are_merged_by_the_listener():
+    logger, handler = queued_logger("scalar")
+    logger.info("found %s sources in %.3fs", 3, 1.23456, extra={"request_id": "abc"})
+    record = handler.queue.get_nowait()
+    assert record.args == (3, 1.23456)  # left for the listener thread
+    handler.queue.put(record)
+    assert drain(handler) == ["abc found 3 sources in 1.235s"]
+
+
+def test_mutable_args_are_merged_at_the_call():
+    logger, handler = queued_logger("mutable")
+    sources = ["a"]
+    logger.info("sources: %s", sources)
+    sources.append("b")
+    assert drain(handler) == ["system sources: ['a']"]
+
+
+def test_exceptions_are_formatted_at_the_call():
+    logger, handler = queued_logger("exc")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    record = handler.queue.get_nowait()
+    assert record.exc_info is None and "ValueError: boom" in record.exc_text
+
+
+def test_full_queue_drops_and_counts():
+    logger, handler = queued_logger("full", max_size=2)
+    for i in range(5):
+        logger.info("line %s", i)
+    assert handler.dropped == 3
+    assert drain(handler) == ["system line 0", "system line 1"]
+
+
+def test_json_lines_carry_extra_fields():
+    logger, handler = queued_logger("json")
+    logger.info("gathered %s sources", 4, extra={"request_id": "r1", "stage": "gather", "seconds": 0.5})
+    entry = json.loads(drain(handler, JSONFormatter())[0])
+    assert entry["message"] == "gathered 4 sources"
+    assert (entry["request_id"], entry["stage"], entry["seconds"]) == ("r1", "gather", 0.5)
@@ -0,0 +1,27 @@
+import pytest
+
+from services.metrics import OVERFLOW_LABEL, MetricsRegistry, _Metric
+
+
+def test_metric_kind_must_define_its_series():
+    class Untyped(_Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("untyped", "no series type")
+
+
+def test_render_and_series_cap():
+    registry = MetricsRegistry(prefix="test")
+    requests = registry.counter("requests_total", "Requests", ["host"], max_series=2)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for host in ("a", "b", "c", "d"):
+        requests.labels(host).inc()
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert 'test_requests_total{host="a"} 1' in lines
+    assert f'test_requests_total{{host="{OVERFLOW_LABEL}"}} 2' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 0' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert "test_latency_seconds_count 1" in lines
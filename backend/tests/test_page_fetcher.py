@@ -0,0 +1,68 @@
+import time
+import asyncio
+
+import httpx
+
+from services.page_fetcher import FetchClock, PageFetcher
+
+
+async def test_waiting_on_a_busy_host_does_not_hold_a_global_slot(configured):
+    fetcher = configured(PageFetcher, FETCH_MAX_CONCURRENCY=2, FETCH_PER_HOST_CONCURRENCY=1)
+    release = asyncio.Event()
+
+    async def hold(host):
+        async with fetcher._slots(host):
+            await release.wait()
+
+    busy = asyncio.create_task(hold("busy.example"))
+    queued = [asyncio.create_task(hold("busy.example")) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    # One global slot is left, and the requests queued behind busy.example must not have taken it
+    async def other_host():
+        async with fetcher._slots("other.example"):
+            return True
+
+    assert await asyncio.wait_for(other_host(), timeout=1.0)
+    release.set()
+    await asyncio.gather(busy, *queued)
+    assert fetcher._host_slots == {}
+
+
+async def test_per_host_limit(configured):
+    fetcher = configured(PageFetcher, FETCH_MAX_CONCURRENCY=8, FETCH_PER_HOST_CONCURRENCY=2)
+    active = peak = 0
+
+    async def fetch():
+        nonlocal active, peak
+        async with fetcher._slots("one.example"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(fetch() for _ in range(6)))
+    assert peak == 2
+
+
+async def test_fetch_clock_starts_once_the_slots_are_held(configured):
+    fetcher = configured(PageFetcher, FETCH_MAX_CONCURRENCY=4, FETCH_PER_HOST_CONCURRENCY=1)
+    fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="ok")))
+
+    async def hold():
+        async with fetcher._slots("slow.example"):
+            await asyncio.sleep(0.2)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    clock = FetchClock()
+    start = time.perf_counter()
+    async with fetcher.stream("https://slow.example/page", clock=clock) as response:
+        assert response.status_code == 200
+        queued_and_fetched = time.perf_counter() - start
+        fetched = clock.elapsed()
+    await holder
+    await fetcher.aclose()
+
+    assert queued_and_fetched >= 0.2
+    assert fetched < 0.1
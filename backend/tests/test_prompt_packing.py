@@ -0,0 +1,30 @@
+from services.prompt_packing import PromptPacker
+
+
+def entries(*weights):
+    return [
+        {"title": f"Source {n}", "url": f"https://example.com/{n}", "snippet": f"Descale kettle number {n} with citric acid.", "weight": weight}
+        for n, weight in enumerate(weights)
+    ]
+
+
+def test_allocation_never_exceeds_the_budget_with_more_snippets_than_tokens(configured):
+    packer = configured(PromptPacker, "gpt-4o-mini", PROMPT_MIN_SNIPPET_TOKENS=1)
+    snippets = entries(0.9, 0.8, 0.7, 0.6, 0.5, 0.4)
+
+    allocation = packer._allocate(snippets, 4)
+
+    assert sum(allocation) <= 4
+    # The lowest-ranked snippets are the ones left out
+    assert allocation[:4] == [1, 1, 1, 1] and allocation[4:] == [0, 0]
+
+
+def test_rounding_up_small_shares_stays_within_the_budget(configured):
+    packer = configured(PromptPacker, "gpt-4o-mini", PROMPT_MIN_SNIPPET_TOKENS=1)
+    snippets = entries(0.98, 0.01, 0.01)
+
+    allocation = packer._allocate(snippets, 3)
+
+    assert sum(allocation) <= 3
+    assert all(allocation)
+
@@ -0,0 +1,91 @@
+import pytest
+
+from services.query_index import QueryIndex, opposite_meaning, swapped_roles, word_order
+
+SWAPPED = [
+    ("paris to london train price", "london to paris train price"),
+    ("refrigerator not cooling but freezer works", "freezer not cooling but refrigerator works"),
+    ("convert usd to eur", "convert eur to usd"),
+    ("flights from berlin to rome in may", "flights from rome to berlin in may"),
+]
+
+REPHRASED = [
+    ("best way to remove mold from bathroom grout", "how to remove mold from grout in the bathroom"),
+    ("how to reset a netgear router to factory settings", "netgear router factory settings reset how to"),
+    ("не включается ноутбук после обновления", "ноутбук не включается после обновления"),
+    ("refrigerator not cooling but freezer works", "refrigerator not cooling but the freezer works"),
+]
+
+OPPOSITE = [
+    ("how to enable two factor authentication on gmail", "how to disable two factor authentication on gmail"),
+    ("install python on windows", "uninstall python on windows"),
+    ("how to increase screen brightness on a laptop", "how to decrease screen brightness on a laptop"),
+    ("how to turn on dark mode in chrome", "how to turn off dark mode in chrome"),
+    ("laptop charging when plugged in", "laptop not charging when plugged in"),
+]
+
+
+@pytest.mark.parametrize("a, b", SWAPPED)
+def test_swapped_roles_detected(a, b):
+    assert swapped_roles(word_order(a), word_order(b))
+
+
+@pytest.mark.parametrize("a, b", REPHRASED)
+def test_rephrasings_are_not_swaps(a, b):
+    assert not swapped_roles(word_order(a), word_order(b))
+
+
+@pytest.mark.parametrize("a, b", SWAPPED)
+def test_lookup_rejects_swapped_roles(a, b):
+    index = QueryIndex(threshold=0.7)
+    index.add("cached", a)
+    assert index.lookup(a) == ("cached", 1.0)
+    assert index.lookup(b) is None
+
+
+@pytest.mark.parametrize("a, b", OPPOSITE)
+def test_opposite_actions_detected(a, b):
+    assert opposite_meaning(word_order(a), word_order(b))
+
+
+@pytest.mark.parametrize("a, b", REPHRASED + [("install python on windows", "installing python on windows")])
+def test_rephrasings_are_not_opposites(a, b):
+    assert not opposite_meaning(word_order(a), word_order(b))
+
+
+@pytest.mark.parametrize("a, b", OPPOSITE)
+def test_lookup_rejects_opposites(a, b):
+    index = QueryIndex(threshold=0.7)
+    index.add("cached", a)
+    assert index.lookup(b) is None
+
+
+def test_lookup_matches_rephrasing():
+    index = QueryIndex(threshold=0.7)
+    index.add("cached", "How do I reset my Netgear router to factory settings?")
+    match = index.lookup("reset netgear router factory settings")
+    assert match is not None and match[0] == "cached"
+
+
+def test_lookup_requires_identical_digit_tokens():
+    index = QueryIndex(threshold=0.7)
+    index.add("e21", "washing machine won't drain error E21")
+    assert index.lookup("washing machine wont drain, error E21")[0] == "e21"
+    assert index.lookup("washing machine won't drain error E18") is None
+
+
+def test_groups_never_match_each_other():
+    index = QueryIndex(threshold=0.7)
+    index.add("en", "how to descale a kettle", group=("home", "en"))
+    assert index.lookup("how to descale a kettle", group=("home", "de")) is None
+    assert index.lookup("how to descale kettle", group=("home", "en"))[0] == "en"
+
+
+def test_bounded_lru():
+    index = QueryIndex(threshold=0.7, max_entries=2)
+    index.add(1, "how to descale a kettle")
+    index.add(2, "how to clean a cast iron skillet")
+    index.lookup("how to descale kettle")  # touches 1
+    index.add(3, "how to change a flat tire")
+    assert len(index) == 2 and index.evictions == 1
+    assert index.lookup("how to clean cast iron skillets") is None
@@ -0,0 +1,74 @@
+import time
+import asyncio
+
+import pytest
+
+from services.rate_limiter import RateLimiterRegistry, RateLimitTimeout, TokenBucket
+
+
+async def test_burst_then_steady_rate():
+    bucket = TokenBucket("test", rate=20.0, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        assert await bucket.acquire() < 0.01  # the burst is free
+    await bucket.acquire()  # the fourth waits for a refill (1/20 s)
+    assert time.monotonic() - start >= 0.04
+    assert bucket.acquired == 4
+
+
+async def test_waiters_are_served_in_arrival_order():
+    bucket = TokenBucket("test", rate=50.0, burst=1)
+    order = []
+
+    async def caller(i):
+        await bucket.acquire()
+        order.append(i)
+
+    tasks = []
+    for i in range(5):
+        tasks.append(asyncio.create_task(caller(i)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == list(range(5))
+
+
+async def test_max_wait_raises():
+    bucket = TokenBucket("test", rate=0.1, burst=1)
+    await bucket.acquire()
+    with pytest.raises(RateLimitTimeout):
+        await bucket.acquire(max_wait=0.05)
+    assert bucket.waiting == 0
+
+
+def test_429_blocks_with_growing_backoff_and_success_decays_it():
+    bucket = TokenBucket("test", rate=10.0, burst=5, initial_backoff=1.0, max_backoff=3.0)
+    bucket.report_rate_limited()
+    stats = bucket.stats()
+    assert stats["backoffSeconds"] == 1.0 and stats["tokens"] == 0.0
+    assert 0.9 < stats["blockedForSeconds"] <= 1.0
+
+    bucket.report_rate_limited()
+    assert bucket.stats()["backoffSeconds"] == 2.0
+    bucket.report_rate_limited()
+    assert bucket.stats()["backoffSeconds"] == 3.0  # capped
+
+    bucket.report_success()
+    assert bucket.stats()["backoffSeconds"] == 1.5
+    bucket.report_success()
+    assert bucket.stats()["backoffSeconds"] == 0.0
+
+
+async def test_blocked_bucket_makes_callers_wait():
+    bucket = TokenBucket("test", rate=100.0, burst=5, initial_backoff=0.1)
+    bucket.report_rate_limited()
+    waited = await bucket.acquire()
+    assert waited >= 0.1
+
+
+def test_registry_reads_per_provider_settings(configured):
+    registry = configured(RateLimiterRegistry, SEARCH_RATE_LIMIT_SERPAPI_RATE=2.5, SEARCH_RATE_LIMIT_SERPAPI_BURST=7)
+    serpapi = registry.get("serpapi")
+    assert (serpapi.rate, serpapi.burst) == (2.5, 7)
+    assert registry.get("serpapi") is serpapi
+    google = registry.get("google")
+    assert (google.rate, google.burst) == RateLimiterRegistry.DEFAULTS["google"]
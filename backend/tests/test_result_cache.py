@@ -0,0 +1,99 @@
+from models.search_models import SearchRequestPayload, SearchResultPayload
+from services.result_cache import ResultCache, parse_category_ttls
+
+
+def request(description: str, category: str = "home", language: str = "en") -> SearchRequestPayload:
+    return SearchRequestPayload(id="1", description=description, category=category, priority="normal",
+                                createdAt="2024-01-01T00:00:00Z", language=language)
+
+
+def result(summary: str) -> SearchResultPayload:
+    return SearchResultPayload(summary=summary, steps=[], decisionFactors=[], sources=[],
+                               estimatedTimeMinutes=5, difficulty="easy", recommendedActions=[])
+
+
+def memory_cache(configured, **env) -> ResultCache:
+    return configured(ResultCache, RESULT_CACHE_SQLITE_PATH=None, **env)
+
+
+def test_key_ignores_case_and_punctuation(configured):
+    results = memory_cache(configured)
+    assert results.make_key(request("How to descale a kettle?")) == results.make_key(request("how to  descale a KETTLE"))
+    assert results.make_key(request("how to descale a kettle")) != results.make_key(request("how to descale a kettle", language="de"))
+
+
+async def test_category_ttls(configured):
+    assert parse_category_ttls("news=300, Shopping=1800,bad=soon,junk") == {"news": 300.0, "shopping": 1800.0}
+    results = memory_cache(configured, RESULT_CACHE_TTL=60, RESULT_CACHE_CATEGORY_TTLS="news=0")
+    assert results.ttl_for("News") == 0
+    assert results.ttl_for("home") == 60
+
+    news = request("election results", category="news")
+    await results.set(results.make_key(news), news.category, result("stale"))
+    assert await results.get(results.make_key(news)) is None  # a TTL of 0 is never stored
+
+
+async def test_round_trip(configured):
+    results = memory_cache(configured)
+    stored = request("how to fix a leaking kitchen faucet")
+    await results.set(results.make_key(stored), stored.category, result("tighten it"))
+
+    assert (await results.get(results.make_key(stored))).summary == "tighten it"
+    assert results.memory_hits == 1
+    assert await results.get(results.make_key(request("fix leaking kitchen faucet"))) is None
+    assert results.misses == 1
+
+
+async def test_similar_query_hit(configured):
+    results = memory_cache(configured, RESULT_CACHE_SIMILAR_ENABLED="true")
+    stored = request("how to fix a leaking kitchen faucet")
+    await results.set(results.make_key(stored), stored.category, result("tighten it"), stored)
+
+    rephrased = request("fix leaking kitchen faucet")
+    assert (await results.get(results.make_key(rephrased), rephrased)).summary == "tighten it"
+    assert results.similar_hits == 1
+
+    other_language = request("fix leaking kitchen faucet", language="es")
+    assert await results.get(results.make_key(other_language), other_language) is None
+
+    original = request("flights from berlin to rome")
+    await results.set(results.make_key(original), original.category, result("berlin first"), original)
+    swapped = request("flights from rome to berlin")
+    assert await results.get(results.make_key(swapped), swapped) is None
+
+    enable = request("how to enable two factor authentication on gmail")
+    await results.set(results.make_key(enable), enable.category, result("settings > security"), enable)
+    disable = request("how to disable two factor authentication on gmail")
+    assert await results.get(results.make_key(disable), disable) is None
+
+
+async def test_similar_queries_are_opt_in(configured):
+    results = memory_cache(configured, RESULT_CACHE_SIMILAR_ENABLED=None)
+    assert results.similar is None
+    stored = request("how to fix a leaking kitchen faucet")
+    await results.set(results.make_key(stored), stored.category, result("tighten it"), stored)
+    rephrased = request("fix leaking kitchen faucet")
+    assert await results.get(results.make_key(rephrased), rephrased) is None
+
+
+async def test_persistent_tier_survives_restart(configured, tmp_path):
+    path = str(tmp_path / "results.db")
+    stored = request("how to descale a kettle")
+    first = configured(ResultCache, RESULT_CACHE_SQLITE_PATH=path)
+    await first.set(first.make_key(stored), stored.category, result("vinegar"))
+    first.close()
+
+    second = configured(ResultCache, RESULT_CACHE_SQLITE_PATH=path)
+    assert (await second.get(second.make_key(stored))).summary == "vinegar"
+    assert second.persistent_hits == 1
+    assert (await second.get(second.make_key(stored))).summary == "vinegar"
+    assert second.memory_hits == 1  # promoted to the memory tier
+    second.close()
+
+
+async def test_disabled_cache_stores_nothing(configured):
+    results = memory_cache(configured, RESULT_CACHE_ENABLED="false")
+    stored = request("how to descale a kettle")
+    await results.set(results.make_key(stored), stored.category, result("vinegar"))
+    assert await results.get(results.make_key(stored)) is None
+    assert results.stores == 0
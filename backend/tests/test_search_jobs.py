@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+import main
+from models.search_models import SearchRequestPayload
+from services.admission import AdmissionRejected
+from services.result_cache import ResultCache
+from services.search_jobs import FAILED, SUCCEEDED, JobFailed, SearchJobManager
+
+
+def make_request(request_id: str = "job-1") -> SearchRequestPayload:
+    return SearchRequestPayload(
+        id=request_id,
+        description="how to descale a kettle",
+        category="home",
+        priority="low",
+        createdAt="2024-01-01T00:00:00Z",
+    )
+
+
+@pytest.mark.parametrize("setting, expected", [("0", 1), ("-2", 1), ("1", 1), ("5", 5)])
+def test_max_attempts_is_at_least_one(configured, setting, expected):
+    async def runner(job):
+        return None
+
+    assert configured(SearchJobManager, runner, JOBS_MAX_ATTEMPTS=setting).max_attempts == expected
+
+
+async def test_job_outcomes():
+    async def runner(job):
+        if job.id == "bad":
+            raise JobFailed("shed", status=503, retry_after=7)
+        return "result"
+
+    manager = SearchJobManager(runner)
+    good, created = manager.submit(make_request("good"), "r1")
+    bad, _ = manager.submit(make_request("bad"), "r2")
+    assert created
+    assert manager.submit(make_request("good"), "r3") == (good, False)
+    await manager._queue.join()
+    await manager.aclose()
+
+    assert (good.status, good.result) == (SUCCEEDED, "result")
+    assert bad.status == FAILED
+    assert bad.error == {"status": 503, "detail": "shed", "retryAfter": 7}
+
+
+async def test_job_cancelled_at_shutdown_counts_as_failed():
+    started = asyncio.Event()
+
+    async def runner(job):
+        started.set()
+        await asyncio.sleep(10)
+
+    manager = SearchJobManager(runner)
+    job, _ = manager.submit(make_request(), "r1")
+    await started.wait()
+    await manager.aclose()
+
+    assert job.status == FAILED and job.error["status"] == 503
+    stats = manager.stats()
+    assert stats["failed"] == 1 and stats["running"] == 0
+
+
+async def test_shed_job_retries_then_fails(monkeypatch, configured):
+    runs = 0
+
+    async def shed(request, request_id, cache_key, on_source=None):
+        nonlocal runs
+        runs += 1
+        raise AdmissionRejected("queue full", retry_after=0)
+
+    monkeypatch.setattr(main, "run_and_cache_pipeline", shed)
+    monkeypatch.setattr(main, "search_jobs", configured(SearchJobManager, main.run_search_job, JOBS_MAX_ATTEMPTS=0))
+    job, _ = main.search_jobs.submit(make_request("shed-job"), "r1")
+    await main.search_jobs._queue.join()
+    await main.search_jobs.aclose()
+
+    assert runs == 1
+    assert job.status == FAILED and job.result is None
+    assert job.error["status"] == 503
+
+
+async def test_job_shares_the_run_of_an_identical_request(monkeypatch, configured):
+    release = asyncio.Event()
+    runs = 0
+
+    async def fake_pipeline(request, request_id, cache_key, on_source=None):
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return "result"
+
+    monkeypatch.setattr(main, "run_and_cache_pipeline", fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", configured(ResultCache, RESULT_CACHE_SQLITE_PATH=None))
+    monkeypatch.setattr(main, "search_jobs", SearchJobManager(main.run_search_job))
+    request = make_request()
+    request.language = "en"
+    coalesced = main.pipeline_flight.coalesced
+
+    search = asyncio.create_task(main.run_shared_pipeline(request, "r1", main.result_cache.make_key(request)))
+    job, _ = main.search_jobs.submit(request, "r2")
+    for _ in range(100):
+        if main.pipeline_flight.coalesced > coalesced:
+            break
+        await asyncio.sleep(0.01)
+    release.set()
+
+    assert await search == ("result", [])
+    await main.search_jobs._queue.join()
+    await main.search_jobs.aclose()
+    assert runs == 1
+    assert (job.status, job.result) == (SUCCEEDED, "result")
@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services.search_engine import DuckDuckGoHtmlProvider, SearchEngine, SearchProvider
+
+
+class FakeProvider(SearchProvider):
+    def __init__(self, name: str, urls, delay: float = 0.0):
+        self.name = name
+        self.label = name
+        self.urls = urls
+        self.delay = delay
+        self.calls = 0
+
+    async def search(self, query, max_results):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return list(self.urls)
+
+
+@pytest.fixture
+def engine(configured):
+    return configured(
+        SearchEngine, SEARCH_PROVIDERS=None, SEARCH_HEDGING_ENABLED=None, LOCAL_INDEX_DIR=None, SEARCH_HEDGE_DELAY=0.05
+    )
+
+
+def use_providers(engine, *providers):
+    engine.providers = list(providers)
+    engine.provider_stats = {
+        p.name: {"calls": 0, "wins": 0, "failures": 0, "rateLimited": 0, "failovers": 0, "hedged": 0}
+        for p in providers
+    }
+
+
+def test_provider_without_search_fails_when_created():
+    class Incomplete(SearchProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_defaults_use_google_only_without_hedging(engine):
+    assert [p.name for p in engine.providers] == ["google"]
+    assert engine.hedging is False
+
+
+async def test_slow_primary_is_not_hedged_by_default(engine):
+    primary = FakeProvider("primary", ["https://a.example/"], delay=0.2)
+    secondary = FakeProvider("secondary", ["https://b.example/"])
+    use_providers(engine, primary, secondary)
+
+    assert await engine._run_search("query", 5, {}) == ["https://a.example/"]
+    assert secondary.calls == 0
+    assert engine.provider_stats["secondary"]["hedged"] == 0
+
+
+async def test_failover_counted_separately_from_hedging(engine):
+    primary = FakeProvider("primary", [])
+    secondary = FakeProvider("secondary", ["https://b.example/"])
+    use_providers(engine, primary, secondary)
+
+    assert await engine._run_search("query", 5, {}) == ["https://b.example/"]
+    assert engine.provider_stats["secondary"]["failovers"] == 1
+    assert engine.provider_stats["secondary"]["hedged"] == 0
+
+
+async def test_hedging_when_enabled(engine):
+    engine.hedging = True
+    primary = FakeProvider("primary", ["https://a.example/"], delay=1.0)
+    secondary = FakeProvider("secondary", ["https://b.example/"])
+    use_providers(engine, primary, secondary)
+
+    assert await engine._run_search("query", 5, {}) == ["https://b.example/"]
+    assert engine.provider_stats["secondary"]["hedged"] == 1
+    assert engine.provider_stats["secondary"]["failovers"] == 0
+
+
+async def test_provider_api_calls_take_fetcher_slots(engine):
+    html = '<a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fc.example%2F">C</a>'
+    engine.fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=html)))
+    provider = DuckDuckGoHtmlProvider(engine.fetcher)
+    held = []
+    slots = engine.fetcher._slots
+
+    def recording_slots(host):
+        held.append(host)
+        return slots(host)
+
+    engine.fetcher._slots = recording_slots
+
+    assert await provider.search("query", 5) == ["https://c.example/"]
+    assert held == ["html.duckduckgo.com"]
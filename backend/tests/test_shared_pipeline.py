@@ -0,0 +1,37 @@
+import asyncio
+
+import main
+from services.deadline import Deadline, current_deadline, deadline_scope
+
+
+async def test_followers_get_the_degraded_reasons_of_the_shared_run(monkeypatch):
+    release = asyncio.Event()
+    runs = 0
+
+    async def fake_pipeline(request, request_id, cache_key, on_source=None):
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        # Cut short within the budget of the request that started the run
+        current_deadline().mark_degraded("gather_deadline")
+        return "partial result"
+
+    monkeypatch.setattr(main, "run_and_cache_pipeline", fake_pipeline)
+
+    leader_deadline = Deadline(30.0, 0.4)
+    follower_deadline = Deadline(30.0, 0.4)
+
+    async def call(deadline, request_id):
+        with deadline_scope(deadline):
+            return await main.run_shared_pipeline(None, request_id, "same-key")
+
+    leader = asyncio.create_task(call(leader_deadline, "leader"))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(call(follower_deadline, "follower"))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await leader == ("partial result", ["gather_deadline"])
+    assert await follower == ("partial result", ["gather_deadline"])
+    assert runs == 1
+    assert follower_deadline.degraded == ["gather_deadline"]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_run():
+    flight = SingleFlight("test")
+    runs = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return "result"
+
+    callers = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*callers) == ["result"] * 5
+    assert runs == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "abandoned": 0, "inFlight": 0}
+
+
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "result"
+
+    leader = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    assert leader.cancelled()
+    release.set()
+    assert await follower == "result"
+    assert flight.stats()["abandoned"] == 0
+
+
+async def test_work_cancelled_and_forgotten_once_every_caller_is_gone():
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+    await started.wait()
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), timeout=1.0)
+    assert flight.stats()["abandoned"] == 1
+    assert flight.stats()["inFlight"] == 0
+
+    # A later caller starts fresh instead of inheriting the cancellation
+    async def quick():
+        return "fresh"
+
+    assert await flight.do("key", quick) == "fresh"
+    assert flight.stats()["leaders"] == 2
+
+
+async def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+    runs = 0
+
+    async def failing():
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        raise ValueError("boom")
+
+    callers = [asyncio.create_task(flight.do("key", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    with pytest.raises(ValueError):
+        await flight.do("key", failing)
+    assert runs == 2
@@ -0,0 +1,65 @@
+import json
+
+from services.tracing import NOOP_SPAN, Tracer, parse_traceparent
+
+SAMPLED_PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+UNSAMPLED_PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00"
+
+
+def tracer_with(configured, sample_rate=0.0, trust_parent=None, **env) -> Tracer:
+    return configured(Tracer, TRACE_SAMPLE_RATE=sample_rate, TRACE_TRUST_PARENT=trust_parent, **env)
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(SAMPLED_PARENT) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    assert parse_traceparent(UNSAMPLED_PARENT)[2] is False
+    assert parse_traceparent("00-xyz-b7ad6b7169203331-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_sampled_traceparent_ignored_by_default(configured):
+    tracer = tracer_with(configured)
+    span = tracer.start_span("request", traceparent=parse_traceparent(SAMPLED_PARENT))
+    assert span is NOOP_SPAN
+    assert tracer.started == 0
+
+
+def test_sampled_traceparent_followed_when_trusted(configured):
+    tracer = tracer_with(configured, trust_parent="true")
+    span = tracer.start_span("request", traceparent=parse_traceparent(SAMPLED_PARENT))
+    assert span.sampled
+    assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert span.parent_id == "b7ad6b7169203331"
+
+
+def test_unsampled_traceparent_uses_local_rate(configured):
+    tracer = tracer_with(configured, sample_rate=1.0, trust_parent="true")
+    span = tracer.start_span("request", traceparent=parse_traceparent(UNSAMPLED_PARENT))
+    assert span.sampled
+    assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+
+    tracer = tracer_with(configured, sample_rate=0.0, trust_parent="true")
+    assert tracer.start_span("request", traceparent=parse_traceparent(UNSAMPLED_PARENT)) is NOOP_SPAN
+
+
+def test_children_follow_root_decision(configured):
+    tracer = tracer_with(configured, sample_rate=1.0)
+    root = tracer.start_span("request")
+    child = tracer.start_span("fetch", parent=root)
+    assert child.trace_id == root.trace_id and child.parent_id == root.span_id
+    assert tracer.start_span("fetch", parent=NOOP_SPAN) is NOOP_SPAN
+
+
+def test_jsonl_export_rotates(configured, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = tracer_with(configured, sample_rate=1.0, TRACE_FILE=path, TRACE_FILE_MAX_BYTES=2000)
+    for _ in range(20):
+        span = tracer.start_span("request", {"padding": "x" * 100})
+        span.end_ns = span.start_ns
+        tracer._export_jsonl([span])
+
+    assert tracer.rotations > 0
+    assert path.stat().st_size <= 2000
+    assert (tmp_path / "traces.jsonl.1").stat().st_size <= 2000
+    for line in path.read_text().splitlines():
+        assert json.loads(line)["name"] == "request"